@@ -0,0 +1,129 @@
+"""Background writer for the ActivityLogs sheet"""
+import atexit
+import glob
+import json
+import os
+import threading
+from typing import Dict, List
+from config import Config
+from local_store import data_path, file_lock, pid_alive, write_atomic
+from sheets_quota import BULK, request_priority
+
+class ActivityLogSink:
+    """Queues activity log entries and appends them to ActivityLogs in batches
+    
+    ``log`` only writes the entry to a local journal and returns; a daemon
+    thread assigns IDs and flushes the queue with ``insert_many`` once
+    ``batch_size`` entries are waiting or ``flush_interval`` seconds have
+    passed. Each process keeps its own journal, and journals left behind by a
+    process that died are picked up and flushed on the next start, so queued
+    entries survive a crash. Delivery is at-least-once: a crash between the
+    append and the journal rewrite replays that batch.
+    """
+    def __init__(self, db, sheet_name: str = 'ActivityLogs'):
+        self.db = db
+        self.sheet_name = sheet_name
+        self.batch_size = Config.ACTIVITY_LOG_BATCH_SIZE
+        self.flush_interval = Config.ACTIVITY_LOG_FLUSH_INTERVAL
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = []
+        self._pid = None
+        self._thread = None
+        atexit.register(self.flush)
+    
+    def _journal_path(self, pid: int) -> str:
+        return data_path('activity_log', f'journal-{pid}.jsonl')
+    
+    def _start(self):
+        """Start the flush thread in this process (again after a fork)"""
+        self._pid = os.getpid()
+        self._pending = []
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name='activity-log-sink', daemon=True)
+        self._thread.start()
+    
+    def _recover(self):
+        """Adopt journals of processes that are no longer running"""
+        own_journal = self._journal_path(self._pid)
+        with file_lock(data_path('activity_log', 'recover.lock')):
+            adopted = []
+            for path in glob.glob(self._journal_path('*')):
+                try:
+                    pid = int(os.path.basename(path)[len('journal-'):-len('.jsonl')])
+                except ValueError:
+                    continue
+                if path != own_journal and pid_alive(pid):
+                    continue
+                with open(path, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            self._pending.append(json.loads(line))
+                if path != own_journal:
+                    adopted.append(path)
+            # Persist the adopted entries before deleting their journals; a crash
+            # in between replays them (at-least-once) instead of losing them
+            self._write_journal()
+            for path in adopted:
+                os.remove(path)
+    
+    def _write_journal(self):
+        lines = ''.join(json.dumps(entry) + '\n' for entry in self._pending)
+        write_atomic(self._journal_path(self._pid), lines.encode('utf-8'))
+    
+    def log(self, entry: Dict):
+        """Queue an entry for ActivityLogs; never calls the Sheets API"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._pending.append(entry)
+            with open(self._journal_path(self._pid), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            if len(self._pending) >= self.batch_size:
+                self._wake.set()
+    
+    def pending(self) -> List[Dict]:
+        """Entries queued in this process that have not been written to the sheet yet"""
+        with self._lock:
+            return [dict(entry) for entry in self._pending]
+    
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+    
+    def flush(self):
+        """Write all queued entries to the sheet"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid():
+                    return
+                batch = [dict(entry) for entry in self._pending]
+            if not batch:
+                return
+            
+            try:
+                for entry in batch:
+                    if not entry.get('ID'):
+                        entry['ID'] = self.db.get_next_id(self.sheet_name)
+            except Exception as e:
+                print(f"Error flushing activity logs: {e}")
+                return
+            with self._lock:
+                # Journal the IDs so a retry or a replay reuses them
+                self._pending[:len(batch)] = batch
+                self._write_journal()
+            
+            # Log writes yield the API quota to page loads
+            with request_priority(BULK):
+                results = self.db.insert_many(self.sheet_name, batch, chunk_size=len(batch))
+            if not results or not all(result['success'] for result in results):
+                print(f"Error flushing activity logs: {len(batch)} entries kept for the next flush")
+                return
+            
+            with self._lock:
+                # Entries logged while the batch was being written stay queued
+                self._pending = self._pending[len(batch):]
+                self._write_journal()
@@ -1,13 +1,19 @@
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify, send_file, send_from_directory
+from flask import Flask, Response, render_template, request, redirect, url_for, session, flash, jsonify, send_file, send_from_directory
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
-from google_sheets_db import GoogleSheetsDB
+from db_backend import create_db, decode_cursor, encode_cursor, key_field_for
+from depreciation_engine import METHODS, DepreciationSnapshots, depreciation_schedule, schedule_csv
+from activity_log import ActivityLogSink
+from sheets_quota import BULK, request_priority
+from export_jobs import DONE, ExportJobs
+from report_export import FORMATS, PARQUET_AVAILABLE, Report, csv_chunks, write_report
+from text_search import asset_index
+from movement_store import MovementStore, end_of_day
 from config import Config
-from datetime import datetime
-import io
+from datetime import date, datetime
 import os
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+import numpy as np
+from openpyxl.styles import Alignment
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
 from reportlab.lib.units import inch
@@ -44,8 +50,8 @@ def allowed_file(filename, allowed_extensions):
 
 # Initialize database
 try:
-    db = GoogleSheetsDB()
-    print("[SUCCESS] Google Sheets connection established successfully")
+    db = create_db()
+    print(f"[SUCCESS] Database connection established successfully ({Config.DATABASE_BACKEND})")
 except FileNotFoundError as e:
     print(f"[ERROR] Credentials file not found: {e}")
     print("Please ensure credentials.json exists in the project root directory.")
@@ -60,14 +66,19 @@ except Exception as e:
     traceback.print_exc()
     db = None
 
+# Activity logs are queued and appended in batches off the request thread
+activity_log = ActivityLogSink(db) if db else None
+depreciation_snapshots = DepreciationSnapshots()
+export_jobs = ExportJobs()
+asset_search = asset_index()
+movement_store = MovementStore()
+
 def log_activity(action, entity_type, entity_id, description, details=''):
     """Helper function to log activities"""
-    if not db:
+    if not activity_log:
         return
     try:
-        log_id = db.get_next_id('ActivityLogs')
         log_data = {
-            'ID': log_id,
             'Date & Time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
             'Type': 'Activity',
             'User': session.get('user_id', 'Unknown'),
@@ -77,7 +88,7 @@ def log_activity(action, entity_type, entity_id, description, details=''):
             'Description': description,
             'Details': details
         }
-        db.insert('ActivityLogs', log_data)
+        activity_log.log(log_data)
     except Exception as e:
         print(f"Error logging activity: {e}")
 
@@ -191,9 +202,10 @@ def dashboard():
         flash('Database not configured. Please check your Google Sheets setup.', 'danger')
         return redirect(url_for('login'))
     
-    assets = db.get_all('Assets')
-    categories = db.get_all('Categories')
-    locations = db.get_all('Locations')
+    tables = db.get_many(['Assets', 'Categories', 'Locations'])
+    assets = tables['Assets']
+    categories = tables['Categories']
+    locations = tables['Locations']
     
     # Prepare data for graphs
     # Assets by Category
@@ -310,8 +322,9 @@ def subcategories():
     if not db:
         flash('Database not configured', 'danger')
         return redirect(url_for('dashboard'))
-    subcategories = db.get_all('Subcategories')
-    categories = db.get_all('Categories')
+    tables = db.get_many(['Subcategories', 'Categories'])
+    subcategories = tables['Subcategories']
+    categories = tables['Categories']
     # Map category IDs to names
     category_map = {str(cat.get('ID', '')): cat.get('Category Name', '') for cat in categories}
     for sub in subcategories:
@@ -354,7 +367,8 @@ def asset_types():
         flash('Database not configured', 'danger')
         return redirect(url_for('dashboard'))
     asset_types = db.get_all('AssetTypes')
-    return render_template('asset_types.html', asset_types=asset_types, role=session.get('role'))
+    return render_template('asset_types.html', asset_types=asset_types, depreciation_methods=METHODS,
+                         role=session.get('role'))
 
 @app.route('/asset_types/add', methods=['POST'])
 @login_required
@@ -369,7 +383,11 @@ def add_asset_type():
         db.insert('AssetTypes', {
             'Asset Code': asset_code,
             'Asset Type': asset_type,
-            'Depreciation Value (%)': depreciation_value
+            'Depreciation Value (%)': depreciation_value,
+            'Depreciation Method': request.form.get('depreciation_method', ''),
+            'Useful Life (Years)': request.form.get('useful_life', ''),
+            'Total Units': request.form.get('total_units', ''),
+            'Units Per Year': request.form.get('units_per_year', '')
         })
         flash('Asset Type added successfully', 'success')
     return redirect(url_for('asset_types'))
@@ -416,6 +434,25 @@ def delete_brand(brand_id):
         flash('Brand deleted successfully', 'success')
     return redirect(url_for('brands'))
 
+# Paginated lists
+# The asset, movement and log pages render their first page; the /api/
+# routes serve the following pages as JSON, with the rows' HTML for "Load more".
+MAX_PAGE_SIZE = 500
+
+def page_args():
+    """The limit and cursor query parameters of a paginated list"""
+    try:
+        limit = int(request.args.get('limit') or Config.PAGE_SIZE)
+    except ValueError:
+        limit = Config.PAGE_SIZE
+    return min(max(limit, 1), MAX_PAGE_SIZE), request.args.get('cursor') or None
+
+def page_json(records, total, next_cursor, rows_template, name):
+    """A page as JSON, with its records rendered by the page's row template"""
+    html = render_template(rows_template, role=session.get('role'), **{name: records})
+    return jsonify({'records': [dict(record) for record in records], 'total': total,
+                    'next_cursor': next_cursor, 'html': html})
+
 # Asset Entry Routes
 @app.route('/assets')
 @login_required
@@ -424,12 +461,63 @@ def assets():
         flash('Database not configured', 'danger')
         return redirect(url_for('dashboard'))
     
-    assets_list = db.get_all('Assets')
+    limit, cursor = page_args()
+    try:
+        page = db.get_page('Assets', 'Asset Code', limit, cursor)
+    except ValueError:
+        flash('That page of assets is no longer available, showing the first page', 'warning')
+        page = db.get_page('Assets', 'Asset Code', limit)
     # Debug: Print number of assets retrieved
-    print(f"DEBUG: Retrieved {len(assets_list)} assets from Google Sheets")
-    if assets_list:
-        print(f"DEBUG: First asset: {assets_list[0]}")
-    return render_template('assets.html', assets=assets_list, role=session.get('role'))
+    print(f"DEBUG: Retrieved {len(page.records)} of {page.total} assets")
+    return render_template('assets.html', assets=page.records, total=page.total,
+                           next_cursor=page.next_cursor, role=session.get('role'))
+
+@app.route('/api/assets')
+@login_required
+def api_assets():
+    if not db:
+        return jsonify({'error': 'Database not configured'}), 503
+    limit, cursor = page_args()
+    try:
+        page = db.get_page('Assets', 'Asset Code', limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return page_json(page.records, page.total, page.next_cursor, 'includes/asset_rows.html', 'assets')
+
+@app.route('/api/assets/search')
+@login_required
+def api_search_assets():
+    """Assets matching a search as the user types: by word prefix, with one typo allowed, best first"""
+    if not db:
+        return jsonify({'error': 'Database not configured'}), 503
+    limit, _ = page_args()
+    assets_table = db.get_table('Assets')
+    positions = asset_search.search_table(assets_table, request.args.get('q', ''))
+    records = [assets_table.row(pos) for pos in positions[:limit]]
+    return page_json(records, len(positions), None, 'includes/asset_rows.html', 'assets')
+
+@app.route('/api/assets/<asset_code>/history')
+@login_required
+def api_asset_history(asset_code):
+    """An asset's movements, oldest first, and where it was at the ``at`` date or time (default now)"""
+    if not db:
+        return jsonify({'error': 'Database not configured'}), 503
+    at = request.args.get('at', '').strip()
+    try:
+        moment = datetime.fromisoformat(at) if at else datetime.now()
+    except ValueError:
+        return jsonify({'error': f'Invalid date or time "{at}"'}), 400
+    # Movement Date is written as YYYY-MM-DD HH:MM:SS; a bare date means the end of that day
+    at = at if len(at) == 10 else moment.strftime('%Y-%m-%d %H:%M:%S')
+    asset = db.get_by_id('Assets', 'Asset Code', asset_code)
+    if asset is None:
+        return jsonify({'error': f'Unknown asset {asset_code}'}), 404
+    movements = db.get_table('AssetMovements')
+    history = [dict(movements.row(pos)) for pos in movement_store.timeline(movements, asset_code)]
+    location = movement_store.location_at(movements, asset_code, end_of_day(at))
+    return jsonify({'asset_code': asset_code, 'movements': history, 'at': at,
+                    # Assets never moved are still where they were entered
+                    'location_at': location if location is not None else asset.get('Location', '')})
 
 @app.route('/assets/add', methods=['GET', 'POST'])
 @login_required
@@ -510,10 +598,11 @@ def add_asset():
             flash('Failed to add asset', 'danger')
     
     # Get master data for dropdowns
-    categories = db.get_all('Categories')
-    subcategories = db.get_all('Subcategories')
-    brands = db.get_all('Brands')
-    locations = db.get_all('Locations')
+    tables = db.get_many(['Categories', 'Subcategories', 'Brands', 'Locations'])
+    categories = tables['Categories']
+    subcategories = tables['Subcategories']
+    brands = tables['Brands']
+    locations = tables['Locations']
     
     return render_template('add_asset.html', categories=categories, 
                          subcategories=subcategories, brands=brands, locations=locations)
@@ -602,10 +691,11 @@ def edit_asset(asset_code):
         else:
             flash('Failed to update asset', 'danger')
     
-    categories = db.get_all('Categories')
-    subcategories = db.get_all('Subcategories')
-    brands = db.get_all('Brands')
-    locations = db.get_all('Locations')
+    tables = db.get_many(['Categories', 'Subcategories', 'Brands', 'Locations'])
+    categories = tables['Categories']
+    subcategories = tables['Subcategories']
+    brands = tables['Brands']
+    locations = tables['Locations']
     
     return render_template('edit_asset.html', asset=asset, categories=categories,
                          subcategories=subcategories, brands=brands, locations=locations)
@@ -654,8 +744,27 @@ def asset_movements():
     if not db:
         flash('Database not configured', 'danger')
         return redirect(url_for('login'))
-    movements = db.get_all('AssetMovements')
-    return render_template('asset_movements.html', movements=movements, role=session.get('role'))
+    limit, cursor = page_args()
+    # Newest first
+    try:
+        page = db.get_page('AssetMovements', 'Movement Date', limit, cursor, descending=True)
+    except ValueError:
+        flash('That page of movements is no longer available, showing the first page', 'warning')
+        page = db.get_page('AssetMovements', 'Movement Date', limit, descending=True)
+    return render_template('asset_movements.html', movements=page.records, total=page.total,
+                           next_cursor=page.next_cursor, role=session.get('role'))
+
+@app.route('/api/asset_movements')
+@login_required
+def api_asset_movements():
+    if not db:
+        return jsonify({'error': 'Database not configured'}), 503
+    limit, cursor = page_args()
+    try:
+        page = db.get_page('AssetMovements', 'Movement Date', limit, cursor, descending=True)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return page_json(page.records, page.total, page.next_cursor, 'includes/movement_rows.html', 'movements')
 
 @app.route('/asset_movements/add', methods=['GET', 'POST'])
 @login_required
@@ -686,9 +795,8 @@ def add_asset_movement():
         else:
             flash('Failed to record movement', 'danger')
     
-    assets = db.get_all('Assets')
-    locations = db.get_all('Locations')
-    return render_template('add_movement.html', assets=assets, locations=locations)
+    tables = db.get_many(['Assets', 'Locations'])
+    return render_template('add_movement.html', assets=tables['Assets'], locations=tables['Locations'])
 
 # Barcode Printing Routes
 @app.route('/barcode/print', methods=['POST'])
@@ -753,6 +861,19 @@ def preview_barcodes():
     return render_template('barcode_preview.html', assets=assets)
 
 # Reports Routes
+def select_assets(assets, category, location, department, search):
+    """Positions of the assets matching the asset report filters
+    
+    The equality filters are answered from the table's inverted indexes and
+    ``search`` from the asset text index, so neither reads every asset.
+    """
+    filters = {'Asset Category': category, 'Location': location, 'Department': department}
+    positions = assets.select(filters).tolist()
+    if search:
+        matches = set(asset_search.search_table(assets, search))
+        positions = [pos for pos in positions if pos in matches] if any(filters.values()) else sorted(matches)
+    return positions
+
 @app.route('/reports/assets')
 @login_required
 def asset_report():
@@ -766,35 +887,20 @@ def asset_report():
     department = request.args.get('department', '')
     search = request.args.get('search', '').lower()
     
-    # Get all assets
-    all_assets = db.get_all('Assets')
+    # Get all assets along with the master data for the filters
+    tables = db.get_many(['Categories', 'Locations'])
+    all_assets = db.get_table('Assets')
     
     # Apply filters
-    filtered_assets = []
-    for asset in all_assets:
-        # Category filter
-        if category and asset.get('Asset Category', '') != category:
-            continue
-        # Location filter
-        if location and asset.get('Location', '') != location:
-            continue
-        # Department filter
-        if department and asset.get('Department', '') != department:
-            continue
-        # Search filter
-        if search:
-            searchable_text = f"{asset.get('Asset Code', '')} {asset.get('Item Name', '')} {asset.get('Brand', '')}".lower()
-            if search not in searchable_text:
-                continue
-        filtered_assets.append(asset)
+    positions = select_assets(all_assets, category, location, department, search)
+    filtered_assets = [all_assets.row(pos) for pos in positions]
     
     # Get master data for filters
-    categories = db.get_all('Categories')
-    locations = db.get_all('Locations')
+    categories = tables['Categories']
+    locations = tables['Locations']
     
     # Get unique departments
-    departments = list(set([asset.get('Department', '') for asset in all_assets if asset.get('Department', '')]))
-    departments.sort()
+    departments = all_assets.distinct('Department')
     
     return render_template('reports/asset_report.html', 
                          assets=filtered_assets, 
@@ -807,6 +913,12 @@ def asset_report():
                          current_department=department,
                          current_search=search)
 
+def select_movements(movements, asset_code, from_location, to_location, moved_by, date_from, date_to):
+    """Positions of the movements matching the movement report filters, newest first"""
+    return movement_store.query(movements, {'Asset Code': asset_code, 'From Location': from_location,
+                                            'To Location': to_location, 'Moved By': moved_by},
+                                date_from, date_to)
+
 @app.route('/reports/movements')
 @login_required
 def movement_report():
@@ -822,42 +934,21 @@ def movement_report():
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    # Get all movements
-    all_movements = db.get_all('AssetMovements')
-    
-    # Apply filters
-    filtered_movements = []
-    for movement in all_movements:
-        # Asset code filter
-        if asset_code and movement.get('Asset Code', '') != asset_code:
-            continue
-        # From location filter
-        if from_location and movement.get('From Location', '') != from_location:
-            continue
-        # To location filter
-        if to_location and movement.get('To Location', '') != to_location:
-            continue
-        # Moved by filter
-        if moved_by and movement.get('Moved By', '') != moved_by:
-            continue
-        # Date filters
-        movement_date = movement.get('Movement Date', '')
-        if date_from and movement_date < date_from:
-            continue
-        if date_to and movement_date > date_to:
-            continue
-        filtered_movements.append(movement)
+    # Get all movements along with the master data for the filters
+    tables = db.get_many(['Assets', 'Locations'])
+    all_movements = db.get_table('AssetMovements')
     
-    # Sort by date (newest first)
-    filtered_movements.sort(key=lambda x: x.get('Movement Date', ''), reverse=True)
+    # Apply filters; the store returns them newest first
+    positions = select_movements(all_movements, asset_code, from_location, to_location, moved_by,
+                                 date_from, date_to)
+    filtered_movements = [all_movements.row(pos) for pos in positions]
     
     # Get master data for filters
-    assets = db.get_all('Assets')
-    locations = db.get_all('Locations')
+    assets = tables['Assets']
+    locations = tables['Locations']
     
     # Get unique users
-    users = list(set([movement.get('Moved By', '') for movement in all_movements if movement.get('Moved By', '')]))
-    users.sort()
+    users = movement_store.values(all_movements, 'Moved By')
     
     return render_template('reports/movement_report.html',
                          movements=filtered_movements,
@@ -872,6 +963,110 @@ def movement_report():
                          current_date_from=date_from,
                          current_date_to=date_to)
 
+# The log is the ActivityLogs table and the movements, merged newest first.
+# Its cursor holds one get_page cursor per table: '' before the first page
+# of that table and LOG_SOURCE_DONE once it has been read to the end.
+LOG_SOURCE_DONE = '-'
+
+def activity_log_entry(log_entry):
+    return {
+        'type': log_entry.get('Type', 'Activity'),
+        'date': log_entry.get('Date & Time', ''),
+        'user': log_entry.get('User', ''),
+        'description': log_entry.get('Description', ''),
+        'details': log_entry.get('Details', ''),
+        'action': log_entry.get('Action', ''),
+        'entity_type': log_entry.get('Entity Type', ''),
+        'entity_id': log_entry.get('Entity ID', '')
+    }
+
+def movement_log_entry(movement):
+    return {
+        'type': 'Movement',
+        'date': movement.get('Movement Date', ''),
+        'user': movement.get('Moved By', ''),
+        'description': f"Asset {movement.get('Asset Code', '')} moved from {movement.get('From Location', '')} to {movement.get('To Location', '')}",
+        'details': movement.get('Notes', ''),
+        'action': 'Move',
+        'entity_type': 'Asset',
+        'entity_id': movement.get('Asset Code', '')
+    }
+
+def log_sources(log_type, user):
+    """(table, date column, user column, filters, entry builder) of each table the log is read from"""
+    activity_filters = {}
+    if log_type:
+        activity_filters['Type'] = log_type
+    if user:
+        activity_filters['User'] = user
+    sources = [('ActivityLogs', 'Date & Time', 'User', activity_filters, activity_log_entry)]
+    if not log_type or log_type == 'Movement':
+        sources.append(('AssetMovements', 'Movement Date', 'Moved By',
+                        {'Moved By': user} if user else {}, movement_log_entry))
+    return sources
+
+def pending_log_entries(log_type, user, date_from, date_to):
+    """Activity log entries not written to the sheet yet that pass the filters"""
+    entries = []
+    for entry in map(activity_log_entry, activity_log.pending() if activity_log else []):
+        if log_type and entry['type'] != log_type:
+            continue
+        if user and entry['user'] != user:
+            continue
+        if date_from and entry['date'] < date_from:
+            continue
+        if date_to and entry['date'] > date_to:
+            continue
+        entries.append(entry)
+    return entries
+
+def logs_page(log_type, user, date_from, date_to, limit, cursor):
+    """One page of the merged log, newest first: (entries, total, movement count, next cursor)
+
+    Raises ValueError for a malformed cursor.
+    """
+    sources = log_sources(log_type, user)
+    source_cursors = decode_cursor(cursor) if cursor else ['', '']
+    low, high = date_from or None, date_to or None
+    entries, total, movement_count = [], 0, 0
+    fetched = []
+    for index, (sheet_name, date_field, _, filters, make_entry) in enumerate(sources):
+        done = source_cursors[index] == LOG_SOURCE_DONE
+        page = db.get_page(sheet_name, date_field, 0 if done else limit,
+                           None if done else source_cursors[index] or None,
+                           descending=True, filters=filters, low=low, high=high)
+        total += page.total
+        if sheet_name == 'AssetMovements':
+            movement_count = page.total
+        fetched.append((done, page))
+        entries.extend((make_entry(record), index, position) for position, record in enumerate(page.records))
+    # Stable, so each table's records stay in their order and every page
+    # takes a run from the front of each table's records
+    entries.sort(key=lambda item: item[0]['date'], reverse=True)
+    entries = entries[:limit]
+
+    next_cursors = list(source_cursors)
+    for index, (sheet_name, date_field, _, _, _) in enumerate(sources):
+        done, page = fetched[index]
+        if done:
+            continue
+        taken = [position for _, source, position in entries if source == index]
+        if len(taken) == len(page.records) and not page.next_cursor:
+            next_cursors[index] = LOG_SOURCE_DONE
+        elif taken:
+            last = page.records[taken[-1]]
+            next_cursors[index] = encode_cursor(last[date_field], last[key_field_for(sheet_name)])
+    # The movements are not part of a log filtered to another type
+    if len(sources) == 1:
+        next_cursors[1] = LOG_SOURCE_DONE
+    entries = [entry for entry, _, _ in entries]
+    if not cursor:
+        pending = pending_log_entries(log_type, user, date_from, date_to)
+        total += len(pending)
+        entries = sorted(pending + entries, key=lambda x: x.get('date', ''), reverse=True)
+    more = any(source_cursor != LOG_SOURCE_DONE for source_cursor in next_cursors)
+    return entries, total, movement_count, encode_cursor(*next_cursors) if more else None
+
 @app.route('/logs')
 @login_required
 def logs():
@@ -885,77 +1080,156 @@ def logs():
     date_from = request.args.get('date_from', '')
     date_to = request.args.get('date_to', '')
     
-    # Get all logs (combining movements and other activities)
-    logs = []
-    
-    # Get activity logs from ActivityLogs sheet
+    limit, cursor = page_args()
     try:
-        activity_logs = db.get_all('ActivityLogs')
-        for log_entry in activity_logs:
-            logs.append({
-                'type': log_entry.get('Type', 'Activity'),
-                'date': log_entry.get('Date & Time', ''),
-                'user': log_entry.get('User', ''),
-                'description': log_entry.get('Description', ''),
-                'details': log_entry.get('Details', ''),
-                'action': log_entry.get('Action', ''),
-                'entity_type': log_entry.get('Entity Type', ''),
-                'entity_id': log_entry.get('Entity ID', '')
-            })
-    except Exception as e:
-        print(f"Error loading activity logs: {e}")
-    
-    # Get movements as logs
-    movements = db.get_all('AssetMovements')
-    for movement in movements:
-        logs.append({
-            'type': 'Movement',
-            'date': movement.get('Movement Date', ''),
-            'user': movement.get('Moved By', ''),
-            'description': f"Asset {movement.get('Asset Code', '')} moved from {movement.get('From Location', '')} to {movement.get('To Location', '')}",
-            'details': movement.get('Notes', ''),
-            'action': 'Move',
-            'entity_type': 'Asset',
-            'entity_id': movement.get('Asset Code', '')
-        })
-    
-    # Sort by date (newest first)
-    logs.sort(key=lambda x: x.get('date', ''), reverse=True)
-    
-    # Apply filters
-    filtered_logs = []
-    for log in logs:
-        # Type filter
-        if log_type and log.get('type', '') != log_type:
-            continue
-        # User filter
-        if user and log.get('user', '') != user:
-            continue
-        # Date filters
-        log_date = log.get('date', '')
-        if date_from and log_date < date_from:
-            continue
-        if date_to and log_date > date_to:
-            continue
-        filtered_logs.append(log)
+        page_logs, total, movement_count, next_cursor = logs_page(log_type, user, date_from, date_to,
+                                                                  limit, cursor)
+    except ValueError:
+        flash('That page of the log is no longer available, showing the first page', 'warning')
+        page_logs, total, movement_count, next_cursor = logs_page(log_type, user, date_from, date_to,
+                                                                  limit, None)
     
     # Get unique users and types
-    log_types = list(set([log.get('type', '') for log in logs]))
-    log_types.sort()
-    log_users = list(set([log.get('user', '') for log in logs if log.get('user', '')]))
-    log_users.sort()
+    pending = activity_log.pending() if activity_log else []
+    log_types = set(db.distinct('ActivityLogs', 'Type')) | {entry.get('Type', '') for entry in pending}
+    if db.count('AssetMovements'):
+        log_types.add('Movement')
+    log_users = (set(db.distinct('ActivityLogs', 'User')) | set(db.distinct('AssetMovements', 'Moved By'))
+                 | {entry.get('User', '') for entry in pending})
+    
+    # Users with an entry that passes the filters
+    active_users = {entry['user'] for entry in pending_log_entries(log_type, user, date_from, date_to)}
+    for sheet_name, date_field, user_field, filters, _ in log_sources(log_type, user):
+        active_users.update(db.distinct(sheet_name, user_field, date_field, filters,
+                                        date_from or None, date_to or None))
     
     return render_template('logs.html',
-                         logs=filtered_logs,
-                         log_types=log_types,
-                         users=log_users,
+                         logs=page_logs,
+                         total=total,
+                         next_cursor=next_cursor,
+                         active_users=len(active_users - {''}),
+                         movement_count=movement_count,
+                         log_types=sorted(log_types),
+                         users=sorted(log_users - {''}),
                          role=session.get('role'),
                          current_type=log_type,
                          current_user=user,
                          current_date_from=date_from,
                          current_date_to=date_to)
 
+@app.route('/api/logs')
+@login_required
+def api_logs():
+    if not db:
+        return jsonify({'error': 'Database not configured'}), 503
+    limit, cursor = page_args()
+    try:
+        page_logs, total, _, next_cursor = logs_page(request.args.get('type', ''), request.args.get('user', ''),
+                                                     request.args.get('date_from', ''),
+                                                     request.args.get('date_to', ''), limit, cursor)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return page_json(page_logs, total, next_cursor, 'includes/log_rows.html', 'logs')
+
 # Excel Export Routes
+# Exports are built by export_jobs in the background. Each route submits a
+# job with its filters and answers with the job (JSON) or its progress page.
+def wants_json() -> bool:
+    return request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+
+def export_job_json(job):
+    data = {key: job[key] for key in ('job_id', 'status', 'filename', 'error')}
+    data['status_url'] = url_for('export_status', job_id=job['job_id'])
+    if job['status'] == DONE:
+        data['download_url'] = url_for('download_export', job_id=job['job_id'])
+    return data
+
+def export_job_response(job_id):
+    """The file if it is ready, otherwise its progress page; 202 with the job for JSON clients"""
+    job = export_jobs.status(job_id)
+    if wants_json():
+        return jsonify(export_job_json(job)), 202
+    if job['status'] == DONE:
+        return redirect(url_for('download_export', job_id=job_id))
+    return redirect(url_for('export_status', job_id=job_id))
+
+@app.route('/exports/<job_id>')
+@login_required
+def export_status(job_id):
+    job = export_jobs.status(job_id)
+    if wants_json():
+        if not job:
+            return jsonify({'error': 'Unknown or expired export'}), 404
+        return jsonify(export_job_json(job))
+    if not job:
+        flash('This export has expired, please export again', 'warning')
+        return redirect(url_for('dashboard'))
+    return render_template('export_status.html', job=job, role=session.get('role'))
+
+@app.route('/exports/<job_id>/download')
+@login_required
+def download_export(job_id):
+    job = export_jobs.status(job_id)
+    if job and job['status'] == DONE:
+        try:
+            # Opened before sending, so a prune of the spool can't remove it mid-response
+            artifact = open(export_jobs.path(job_id), 'rb')
+        except OSError:
+            artifact = None
+        if artifact:
+            return send_file(artifact, mimetype=job['mimetype'], as_attachment=True,
+                             download_name=job['filename'])
+    if wants_json():
+        return jsonify({'error': 'Export is not ready'}), 404
+    return redirect(url_for('export_status', job_id=job_id))
+
+def export_report(name, params, build, filename_prefix, page=None):
+    """Send the report ``build(**params)`` in the requested format
+
+    CSV is streamed as it is formatted; XLSX and Parquet are built by an
+    export job. ``page`` is the endpoint of the report page, ``name`` if not given.
+    """
+    fmt = request.args.get('format', 'xlsx')
+    error = None
+    if fmt not in FORMATS:
+        error = f'Unknown export format "{fmt}"'
+    elif fmt == 'parquet' and not PARQUET_AVAILABLE:
+        error = 'Parquet export requires pyarrow: pip install pyarrow'
+    if error:
+        if wants_json():
+            return jsonify({'error': error}), 400
+        flash(error, 'danger')
+        return redirect(url_for(page or name))
+    
+    filename = f'{filename_prefix}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{fmt}'
+    if fmt == 'csv':
+        with request_priority(BULK):
+            report = build(**params)
+        return Response(csv_chunks(report), mimetype=FORMATS[fmt],
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    job_id = export_jobs.submit(name, dict(params, format=fmt),
+                                lambda path: write_report(fmt, path, build(**params)),
+                                filename, FORMATS[fmt])
+    return export_job_response(job_id)
+
+def asset_report_export(category, location, department, search):
+    assets = db.get_table('Assets')
+    
+    # Apply filters
+    positions = select_assets(assets, category, location, department, search)
+    
+    headers = ['Asset Code', 'Item Name', 'Category', 'Subcategory', 'Brand', 
+               'Description', 'Amount', 'Location', 'Date of Purchase', 
+               'Warranty', 'Department', 'Ownership']
+    columns = ['Asset Code', 'Item Name', 'Asset Category', 'Asset SubCategory', 'Brand',
+               'Asset Description', 'Amount', 'Location', 'Date of Purchase',
+               'Warranty', 'Department', 'Ownership']
+    index = np.array(positions, dtype=np.intp)
+    return Report("Asset Report", headers,
+                  [[values[pos] for pos in positions] for values in map(assets.column, columns)],
+                  typed={'Amount': assets.numbers('Amount')[index],
+                         'Date of Purchase': assets.dates('Date of Purchase')[index]})
+
 @app.route('/reports/assets/export')
 @login_required
 def export_asset_report():
@@ -964,102 +1238,29 @@ def export_asset_report():
         return redirect(url_for('login'))
     
     # Get filter parameters (same as report)
-    category = request.args.get('category', '')
-    location = request.args.get('location', '')
-    department = request.args.get('department', '')
-    search = request.args.get('search', '').lower()
-    
-    # Get all assets
-    all_assets = db.get_all('Assets')
-    
-    # Apply filters
-    filtered_assets = []
-    for asset in all_assets:
-        if category and asset.get('Asset Category', '') != category:
-            continue
-        if location and asset.get('Location', '') != location:
-            continue
-        if department and asset.get('Department', '') != department:
-            continue
-        if search:
-            searchable_text = f"{asset.get('Asset Code', '')} {asset.get('Item Name', '')} {asset.get('Brand', '')}".lower()
-            if search not in searchable_text:
-                continue
-        filtered_assets.append(asset)
-    
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Asset Report"
-    
-    # Header style
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Write headers
-    headers = ['Asset Code', 'Item Name', 'Category', 'Subcategory', 'Brand', 
-               'Description', 'Amount', 'Location', 'Date of Purchase', 
-               'Warranty', 'Department', 'Ownership']
-    ws.append(headers)
-    
-    # Style header row
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = border
-    
-    # Write data
-    for asset in filtered_assets:
-        row = [
-            asset.get('Asset Code', ''),
-            asset.get('Item Name', ''),
-            asset.get('Asset Category', ''),
-            asset.get('Asset SubCategory', ''),
-            asset.get('Brand', ''),
-            asset.get('Asset Description', ''),
-            asset.get('Amount', ''),
-            asset.get('Location', ''),
-            asset.get('Date of Purchase', ''),
-            asset.get('Warranty', ''),
-            asset.get('Department', ''),
-            asset.get('Ownership', '')
-        ]
-        ws.append(row)
-    
-    # Apply borders and alignment to data rows
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical='top')
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
+    params = {
+        'category': request.args.get('category', ''),
+        'location': request.args.get('location', ''),
+        'department': request.args.get('department', ''),
+        'search': request.args.get('search', '').lower()
+    }
+    return export_report('asset_report', params, asset_report_export, 'asset_report')
+
+def movement_report_export(asset_code, from_location, to_location, moved_by, date_from, date_to):
+    movements = db.get_table('AssetMovements')
     
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    # Apply filters, newest first
+    positions = select_movements(movements, asset_code, from_location, to_location, moved_by,
+                                 date_from, date_to)
     
-    filename = f'asset_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True, download_name=filename)
+    headers = ['ID', 'Date & Time', 'Asset Code', 'From Location', 'To Location', 
+               'Moved By', 'Notes']
+    columns = ['ID', 'Movement Date', 'Asset Code', 'From Location', 'To Location',
+               'Moved By', 'Notes']
+    index = np.array(positions, dtype=np.intp)
+    return Report("Movement Report", headers,
+                  [[values[pos] for pos in positions] for values in map(movements.column, columns)],
+                  typed={'Date & Time': movements.timestamps('Movement Date')[index]})
 
 @app.route('/reports/movements/export')
 @login_required
@@ -1069,104 +1270,71 @@ def export_movement_report():
         return redirect(url_for('login'))
     
     # Get filter parameters
-    asset_code = request.args.get('asset_code', '')
-    from_location = request.args.get('from_location', '')
-    to_location = request.args.get('to_location', '')
-    moved_by = request.args.get('moved_by', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
-    
-    # Get all movements
-    all_movements = db.get_all('AssetMovements')
-    
-    # Apply filters
-    filtered_movements = []
-    for movement in all_movements:
-        if asset_code and movement.get('Asset Code', '') != asset_code:
-            continue
-        if from_location and movement.get('From Location', '') != from_location:
-            continue
-        if to_location and movement.get('To Location', '') != to_location:
-            continue
-        if moved_by and movement.get('Moved By', '') != moved_by:
-            continue
-        movement_date = movement.get('Movement Date', '')
-        if date_from and movement_date < date_from:
-            continue
-        if date_to and movement_date > date_to:
-            continue
-        filtered_movements.append(movement)
-    
-    # Sort by date
-    filtered_movements.sort(key=lambda x: x.get('Movement Date', ''), reverse=True)
-    
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Movement Report"
-    
-    # Header style
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Write headers
-    headers = ['ID', 'Date & Time', 'Asset Code', 'From Location', 'To Location', 
-               'Moved By', 'Notes']
-    ws.append(headers)
-    
-    # Style header row
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = border
-    
-    # Write data
-    for movement in filtered_movements:
-        row = [
-            movement.get('ID', ''),
-            movement.get('Movement Date', ''),
-            movement.get('Asset Code', ''),
-            movement.get('From Location', ''),
-            movement.get('To Location', ''),
-            movement.get('Moved By', ''),
-            movement.get('Notes', '')
-        ]
-        ws.append(row)
-    
-    # Apply borders and alignment
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical='top')
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    filename = f'movement_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True, download_name=filename)
+    params = {
+        'asset_code': request.args.get('asset_code', ''),
+        'from_location': request.args.get('from_location', ''),
+        'to_location': request.args.get('to_location', ''),
+        'moved_by': request.args.get('moved_by', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', '')
+    }
+    return export_report('movement_report', params, movement_report_export, 'movement_report')
+
+def asset_locations_export(as_of):
+    assets = db.get_table('Assets')
+    movements = db.get_table('AssetMovements')
+    
+    # Where each moved asset was, from one pass over the movement log
+    located = movement_store.locations_as_of(movements, end_of_day(as_of))
+    
+    # Assets bought after the date were not anywhere yet
+    purchased = assets.dates('Date of Purchase')
+    cutoff = np.datetime64(as_of, 'D')
+    positions = [pos for pos in range(len(assets)) if not purchased[pos] > cutoff]
+    
+    codes, current = assets.column('Asset Code'), assets.column('Location')
+    dates, movers = movements.column('Movement Date'), movements.column('Moved By')
+    locations, moved = [], []
+    for pos in positions:
+        # Assets never moved are still where they were entered
+        location, movement = located.get(codes[pos], (current[pos], None))
+        locations.append(location)
+        moved.append(movement)
+    headers = ['Asset Code', 'Item Name', 'Category', 'Location', 'Since', 'Moved By', 'Current Location']
+    columns = [
+        [codes[pos] for pos in positions],
+        [assets.value(pos, 'Item Name') for pos in positions],
+        [assets.value(pos, 'Asset Category') for pos in positions],
+        locations,
+        [dates[movement] if movement is not None else '' for movement in moved],
+        [movers[movement] if movement is not None else '' for movement in moved],
+        [current[pos] for pos in positions]
+    ]
+    timestamps = movements.timestamps('Movement Date')
+    since = np.array([timestamps[movement] if movement is not None else np.datetime64('NaT') for movement in moved],
+                     dtype='datetime64[s]')
+    return Report(f"Asset Locations {as_of}", headers, columns, typed={'Since': since})
+
+@app.route('/reports/movements/locations')
+@login_required
+def export_asset_locations():
+    """Every asset's location at the end of the as_of date, reconstructed from the movements"""
+    if not db:
+        flash('Database not configured', 'danger')
+        return redirect(url_for('login'))
+    params = {'as_of': report_as_of().isoformat()}
+    return export_report('asset_locations', params, asset_locations_export, 'asset_locations',
+                         page='movement_report')
+
+def report_as_of() -> date:
+    """The as_of request argument (YYYY-MM-DD) a report is computed for; today if absent"""
+    as_of = request.args.get('as_of', '').strip()
+    if as_of:
+        try:
+            return date.fromisoformat(as_of)
+        except ValueError:
+            flash(f'Invalid as-of date "{as_of}", showing today instead', 'warning')
+    return date.today()
 
 @app.route('/depreciation')
 @login_required
@@ -1175,310 +1343,146 @@ def depreciation():
         flash('Database not configured', 'danger')
         return redirect(url_for('login'))
     
-    from datetime import datetime
-    
     # Get filter parameters
     category = request.args.get('category', '')
     location = request.args.get('location', '')
     status = request.args.get('status', '')
+    as_of = report_as_of()
     
-    # Get all assets and asset types
-    all_assets = db.get_all('Assets')
-    asset_types = db.get_all('AssetTypes')
-    categories = db.get_all('Categories')
-    locations = db.get_all('Locations')
-    
-    # Create a lookup dictionary for asset types by Asset Type name
-    asset_type_lookup = {}
-    for at in asset_types:
-        asset_type_name = at.get('Asset Type', '')
-        dep_value = at.get('Depreciation Value (%)', '')
-        try:
-            asset_type_lookup[asset_type_name] = float(dep_value) if dep_value else 0
-        except (ValueError, TypeError):
-            asset_type_lookup[asset_type_name] = 0
-    
-    # Calculate depreciation for each asset
-    today = datetime.now().date()
-    processed_assets = []
-    
-    total_purchase_value = 0
-    total_depreciation = 0
-    total_current_value = 0
-    
-    for asset in all_assets:
-        # Apply filters
-        if category and asset.get('Asset Category', '') != category:
-            continue
-        if location and asset.get('Location', '') != location:
-            continue
-        if status and asset.get('Asset Status', '') != status:
-            continue
-        
-        # Get purchase amount
-        purchase_amount_str = asset.get('Amount', '').strip()
-        purchase_amount = 0
-        try:
-            purchase_amount = float(purchase_amount_str) if purchase_amount_str else 0
-        except (ValueError, TypeError):
-            purchase_amount = 0
-        
-        # Get purchase date
-        purchase_date_str = asset.get('Date of Purchase', '').strip()
-        purchase_date = None
-        age_years = 0
-        
-        if purchase_date_str:
-            try:
-                # Try different date formats
-                for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d-%m-%Y', '%m-%d-%Y']:
-                    try:
-                        purchase_date = datetime.strptime(purchase_date_str, fmt).date()
-                        break
-                    except ValueError:
-                        continue
-                
-                if purchase_date:
-                    # Calculate age in years
-                    delta = today - purchase_date
-                    age_years = delta.days / 365.25
-                    if age_years < 0:
-                        age_years = 0
-            except:
-                pass
-        
-        # Get depreciation percentage
-        # Try to match by Asset Type field in Assets (if it exists)
-        # Otherwise, try to match by category or use a default
-        asset_type_name = asset.get('Asset Type', '') or asset.get('Asset Category', '')
-        depreciation_percent = asset_type_lookup.get(asset_type_name, 0)
-        
-        # Calculate depreciation
-        annual_depreciation = 0
-        total_dep = 0
-        current_value = purchase_amount
-        
-        if purchase_amount > 0 and depreciation_percent > 0 and age_years > 0:
-            annual_depreciation = purchase_amount * (depreciation_percent / 100)
-            total_dep = annual_depreciation * age_years
-            current_value = max(0, purchase_amount - total_dep)  # Can't go below 0
-        
-        # Add calculated fields to asset
-        asset['purchase_amount'] = purchase_amount
-        asset['depreciation_percent'] = depreciation_percent
-        asset['age_years'] = age_years
-        asset['annual_depreciation'] = annual_depreciation
-        asset['total_depreciation'] = total_dep
-        asset['current_value'] = current_value
-        
-        processed_assets.append(asset)
-        
-        # Update totals
-        total_purchase_value += purchase_amount
-        total_depreciation += total_dep
-        total_current_value += current_value
-    
-    # Calculate filtered totals
-    filtered_purchase_value = sum(a.get('purchase_amount', 0) for a in processed_assets)
-    filtered_total_depreciation = sum(a.get('total_depreciation', 0) for a in processed_assets)
-    filtered_current_value = sum(a.get('current_value', 0) for a in processed_assets)
-    filtered_annual_depreciation = sum(a.get('annual_depreciation', 0) for a in processed_assets)
+    tables = db.get_tables(['Assets', 'AssetTypes', 'Categories', 'Locations'])
+    result = depreciation_snapshots.compute(tables['Assets'], tables['AssetTypes'], as_of,
+                                            filters={'Asset Category': category, 'Location': location,
+                                                     'Asset Status': status})
+    totals = result.totals()
     
     return render_template('depreciation.html',
-                         filtered_assets=processed_assets,
-                         total_assets=len(all_assets),
-                         total_purchase_value=total_purchase_value,
-                         total_depreciation=total_depreciation,
-                         total_current_value=total_current_value,
-                         filtered_purchase_value=filtered_purchase_value,
-                         filtered_total_depreciation=filtered_total_depreciation,
-                         filtered_current_value=filtered_current_value,
-                         filtered_annual_depreciation=filtered_annual_depreciation,
-                         categories=categories,
-                         locations=locations,
+                         filtered_assets=result.records(),
+                         total_assets=len(tables['Assets']),
+                         total_purchase_value=totals['purchase_amount'],
+                         total_depreciation=totals['total_depreciation'],
+                         total_current_value=totals['current_value'],
+                         filtered_purchase_value=totals['purchase_amount'],
+                         filtered_total_depreciation=totals['total_depreciation'],
+                         filtered_current_value=totals['current_value'],
+                         filtered_annual_depreciation=totals['annual_depreciation'],
+                         categories=tables['Categories'].rows(),
+                         locations=tables['Locations'].rows(),
+                         as_of=result.as_of,
                          role=session.get('role'))
 
-@app.route('/depreciation/export')
+@app.route('/depreciation/schedule')
 @login_required
-def export_depreciation():
+@request_priority(BULK)
+def export_depreciation_schedule():
     if not db:
         flash('Database not configured', 'danger')
         return redirect(url_for('login'))
     
-    from datetime import datetime
-    
-    # Get filter parameters
-    category = request.args.get('category', '')
-    location = request.args.get('location', '')
-    status = request.args.get('status', '')
-    
-    # Get all assets and asset types
-    all_assets = db.get_all('Assets')
-    asset_types = db.get_all('AssetTypes')
-    
-    # Create lookup dictionary
-    asset_type_lookup = {}
-    for at in asset_types:
-        asset_type_name = at.get('Asset Type', '')
-        dep_value = at.get('Depreciation Value (%)', '')
-        try:
-            asset_type_lookup[asset_type_name] = float(dep_value) if dep_value else 0
-        except (ValueError, TypeError):
-            asset_type_lookup[asset_type_name] = 0
-    
-    # Calculate depreciation for each asset
-    today = datetime.now().date()
-    processed_assets = []
+    period = request.args.get('period', 'year')
+    if period not in ('year', 'month'):
+        flash('Schedule period must be year or month', 'danger')
+        return redirect(url_for('depreciation'))
+    filters = {'Asset Category': request.args.get('category', ''),
+               'Location': request.args.get('location', ''),
+               'Asset Status': request.args.get('status', '')}
+    
+    # The tables are frozen copies, so the schedule streams without touching the database
+    tables = db.get_tables(['Assets', 'AssetTypes'])
+    batches = depreciation_schedule(tables['Assets'], tables['AssetTypes'], period, filters=filters)
+    filename = f'depreciation_schedule_{period}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.csv'
+    return Response(schedule_csv(batches), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+def _rounded(values):
+    return [round(value, 2) if value else '' for value in values.tolist()]
+
+def depreciation_export(category, location, status, as_of):
+    tables = db.get_tables(['Assets', 'AssetTypes'])
+    result = depreciation_snapshots.compute(tables['Assets'], tables['AssetTypes'], date.fromisoformat(as_of),
+                                            filters={'Asset Category': category, 'Location': location,
+                                                     'Asset Status': status})
     
-    for asset in all_assets:
-        # Apply filters
-        if category and asset.get('Asset Category', '') != category:
-            continue
-        if location and asset.get('Location', '') != location:
-            continue
-        if status and asset.get('Asset Status', '') != status:
-            continue
-        
-        # Calculate values (same logic as main route)
-        purchase_amount_str = asset.get('Amount', '').strip()
-        purchase_amount = 0
-        try:
-            purchase_amount = float(purchase_amount_str) if purchase_amount_str else 0
-        except (ValueError, TypeError):
-            purchase_amount = 0
-        
-        purchase_date_str = asset.get('Date of Purchase', '').strip()
-        purchase_date = None
-        age_years = 0
-        
-        if purchase_date_str:
-            try:
-                for fmt in ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d-%m-%Y', '%m-%d-%Y']:
-                    try:
-                        purchase_date = datetime.strptime(purchase_date_str, fmt).date()
-                        break
-                    except ValueError:
-                        continue
-                
-                if purchase_date:
-                    delta = today - purchase_date
-                    age_years = delta.days / 365.25
-                    if age_years < 0:
-                        age_years = 0
-            except:
-                pass
-        
-        asset_type_name = asset.get('Asset Type', '') or asset.get('Asset Category', '')
-        depreciation_percent = asset_type_lookup.get(asset_type_name, 0)
-        
-        annual_depreciation = 0
-        total_dep = 0
-        current_value = purchase_amount
-        
-        if purchase_amount > 0 and depreciation_percent > 0 and age_years > 0:
-            annual_depreciation = purchase_amount * (depreciation_percent / 100)
-            total_dep = annual_depreciation * age_years
-            current_value = max(0, purchase_amount - total_dep)
-        
-        asset['purchase_amount'] = purchase_amount
-        asset['depreciation_percent'] = depreciation_percent
-        asset['age_years'] = age_years
-        asset['annual_depreciation'] = annual_depreciation
-        asset['total_depreciation'] = total_dep
-        asset['current_value'] = current_value
-        
-        processed_assets.append(asset)
-    
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Depreciation Report"
-    
-    # Header style
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Write headers
     headers = ['Asset Code', 'Item Name', 'Category', 'Location', 'Purchase Date', 
                'Age (Years)', 'Purchase Amount', 'Depreciation %', 'Annual Depreciation', 
                'Total Depreciation', 'Current Book Value', 'Status']
-    ws.append(headers)
-    
-    # Style header row
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = border
-    
-    # Write data
-    for asset in processed_assets:
-        row = [
-            asset.get('Asset Code', ''),
-            asset.get('Item Name', ''),
-            asset.get('Asset Category', ''),
-            asset.get('Location', ''),
-            asset.get('Date of Purchase', ''),
-            round(asset.get('age_years', 0), 2) if asset.get('age_years') else '',
-            round(asset.get('purchase_amount', 0), 2) if asset.get('purchase_amount') else '',
-            f"{asset.get('depreciation_percent', 0)}%" if asset.get('depreciation_percent') else '',
-            round(asset.get('annual_depreciation', 0), 2) if asset.get('annual_depreciation') else '',
-            round(asset.get('total_depreciation', 0), 2) if asset.get('total_depreciation') else '',
-            round(asset.get('current_value', 0), 2) if asset.get('current_value') is not None else '',
-            asset.get('Asset Status', '')
-        ]
-        ws.append(row)
-    
-    # Add totals row
-    if processed_assets:
-        total_row = ['', '', '', '', '', 'TOTALS:',
-                    sum(a.get('purchase_amount', 0) for a in processed_assets),
-                    '',
-                    sum(a.get('annual_depreciation', 0) for a in processed_assets),
-                    sum(a.get('total_depreciation', 0) for a in processed_assets),
-                    sum(a.get('current_value', 0) for a in processed_assets),
-                    '']
-        ws.append(total_row)
-        
-        # Style totals row
-        for cell in ws[ws.max_row]:
-            if cell.value:
-                cell.font = Font(bold=True)
-                cell.border = border
-    
-    # Apply borders and alignment
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical='top', horizontal='left')
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    columns = [
+        result.column('Asset Code'),
+        result.column('Item Name'),
+        result.column('Asset Category'),
+        result.column('Location'),
+        result.column('Date of Purchase'),
+        _rounded(result.age_years),
+        _rounded(result.purchase_amount),
+        [f"{percent}%" if percent else '' for percent in result.depreciation_percent.tolist()],
+        _rounded(result.annual_depreciation),
+        _rounded(result.total_depreciation),
+        [round(value, 2) for value in result.current_value.tolist()],
+        result.column('Asset Status')
+    ]
+    typed = {
+        'Purchase Date': result.table.dates('Date of Purchase')[result.positions],
+        'Age (Years)': result.age_years,
+        'Purchase Amount': result.purchase_amount,
+        'Depreciation %': result.depreciation_percent,
+        'Annual Depreciation': result.annual_depreciation,
+        'Total Depreciation': result.total_depreciation,
+        'Current Book Value': result.current_value
+    }
+    
+    # Totals row
+    footer = None
+    if len(result):
+        totals = result.totals()
+        footer = ['', '', '', '', '', 'TOTALS:',
+                  totals['purchase_amount'],
+                  '',
+                  totals['annual_depreciation'],
+                  totals['total_depreciation'],
+                  totals['current_value'],
+                  '']
+    
+    return Report("Depreciation Report", headers, columns, typed, footer,
+                  alignment=Alignment(vertical='top', horizontal='left'))
+
+@app.route('/depreciation/export')
+@login_required
+def export_depreciation():
+    if not db:
+        flash('Database not configured', 'danger')
+        return redirect(url_for('login'))
     
-    filename = f'depreciation_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True, download_name=filename)
+    # Get filter parameters
+    params = {
+        'category': request.args.get('category', ''),
+        'location': request.args.get('location', ''),
+        'status': request.args.get('status', ''),
+        'as_of': report_as_of().isoformat()
+    }
+    return export_report('depreciation', params, depreciation_export, 'depreciation_report')
+
+def logs_export(log_type, user, date_from, date_to):
+    # Logs are built from the movements
+    movements = db.get_table('AssetMovements')
+    dates, movers = movements.column('Movement Date'), movements.column('Moved By')
+    
+    # Apply filters, newest first
+    positions = []
+    if not log_type or log_type == 'Movement':
+        positions = movement_store.query(movements, {'Moved By': user}, date_from, date_to)
+    
+    codes, notes = movements.column('Asset Code'), movements.column('Notes')
+    from_locations, to_locations = movements.column('From Location'), movements.column('To Location')
+    headers = ['Date & Time', 'Type', 'User', 'Description', 'Details']
+    columns = [
+        [dates[pos] for pos in positions],
+        ['Movement'] * len(positions),
+        [movers[pos] for pos in positions],
+        [f"Asset {codes[pos]} moved from {from_locations[pos]} to {to_locations[pos]}" for pos in positions],
+        [notes[pos] for pos in positions]
+    ]
+    index = np.array(positions, dtype=np.intp)
+    return Report("Activity Logs", headers, columns,
+                  typed={'Date & Time': movements.timestamps('Movement Date')[index]})
 
 @app.route('/logs/export')
 @login_required
@@ -1488,104 +1492,13 @@ def export_logs():
         return redirect(url_for('login'))
     
     # Get filter parameters
-    log_type = request.args.get('type', '')
-    user = request.args.get('user', '')
-    date_from = request.args.get('date_from', '')
-    date_to = request.args.get('date_to', '')
-    
-    # Get all logs
-    logs = []
-    movements = db.get_all('AssetMovements')
-    for movement in movements:
-        logs.append({
-            'type': 'Movement',
-            'date': movement.get('Movement Date', ''),
-            'user': movement.get('Moved By', ''),
-            'description': f"Asset {movement.get('Asset Code', '')} moved from {movement.get('From Location', '')} to {movement.get('To Location', '')}",
-            'details': movement.get('Notes', '')
-        })
-    
-    # Sort by date
-    logs.sort(key=lambda x: x.get('date', ''), reverse=True)
-    
-    # Apply filters
-    filtered_logs = []
-    for log in logs:
-        if log_type and log.get('type', '') != log_type:
-            continue
-        if user and log.get('user', '') != user:
-            continue
-        log_date = log.get('date', '')
-        if date_from and log_date < date_from:
-            continue
-        if date_to and log_date > date_to:
-            continue
-        filtered_logs.append(log)
-    
-    # Create Excel workbook
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Activity Logs"
-    
-    # Header style
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_font = Font(bold=True, color="FFFFFF", size=12)
-    border = Border(
-        left=Side(style='thin'),
-        right=Side(style='thin'),
-        top=Side(style='thin'),
-        bottom=Side(style='thin')
-    )
-    
-    # Write headers
-    headers = ['Date & Time', 'Type', 'User', 'Description', 'Details']
-    ws.append(headers)
-    
-    # Style header row
-    for cell in ws[1]:
-        cell.fill = header_fill
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal='center', vertical='center')
-        cell.border = border
-    
-    # Write data
-    for log in filtered_logs:
-        row = [
-            log.get('date', ''),
-            log.get('type', ''),
-            log.get('user', ''),
-            log.get('description', ''),
-            log.get('details', '')
-        ]
-        ws.append(row)
-    
-    # Apply borders and alignment
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = border
-            cell.alignment = Alignment(vertical='top')
-    
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = column[0].column_letter
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
-    # Save to BytesIO
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
-    filename = f'activity_logs_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-                    as_attachment=True, download_name=filename)
+    params = {
+        'log_type': request.args.get('type', ''),
+        'user': request.args.get('user', ''),
+        'date_from': request.args.get('date_from', ''),
+        'date_to': request.args.get('date_to', '')
+    }
+    return export_report('logs', params, logs_export, 'activity_logs')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -174,7 +174,8 @@ class GoogleSheetsDB:
             'Locations': ['ID', 'Location Name'],
             'Categories': ['ID', 'Category Name'],
             'Subcategories': ['ID', 'Subcategory Name', 'Category ID'],
-            'AssetTypes': ['Asset Code', 'Asset Type', 'Depreciation Value (%)'],
+            'AssetTypes': ['Asset Code', 'Asset Type', 'Depreciation Value (%)', 'Depreciation Method',
+                           'Useful Life (Years)', 'Total Units', 'Units Per Year'],
             'Brands': ['ID', 'Brand Name'],
             'Assets': ['Asset Code', 'Item Name', 'Asset Category', 'Asset SubCategory', 
                       'Brand', 'Asset Description', 'Amount', 'Location', 
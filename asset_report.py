@@ -1,9 +1,18 @@
 """Asset Report page for Streamlit"""
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl import Workbook
 from datetime import datetime
+from column_table import ColumnTable
+from db_backend import SHEET_HEADERS
+from export_jobs import DONE, FAILED, ExportJobs
+from text_search import asset_index
+from xlsx_export import XLSX_MIMETYPE, write_xlsx
+
+# Exports are built in the background; seconds the page waits for one before asking to retry
+EXPORT_WAIT = 60
+
+export_jobs = ExportJobs()
+asset_search = asset_index()
 
 def show(db, role):
     """Display asset report page"""
@@ -23,21 +32,16 @@ def show(db, role):
         with col3:
             status_filter = st.selectbox("Status", ["", "Active", "Inactive", "Under Maintenance", "Disposed"])
         
-        search = st.text_input("Search", placeholder="Search by Asset Code or Item Name...")
-    
-    # Get and filter assets
-    assets = db.get_all('Assets')
+        search = st.text_input("Search", placeholder="Search by Asset Code, Item Name or Brand...")
     
-    if category_filter:
-        assets = [a for a in assets if a.get('Asset Category') == category_filter]
-    if location_filter:
-        assets = [a for a in assets if a.get('Location') == location_filter]
-    if status_filter:
-        assets = [a for a in assets if a.get('Asset Status') == status_filter]
+    # Get and filter assets; the equality filters come from the table's indexes
+    table = ColumnTable.from_records(db.get_all('Assets'), SHEET_HEADERS['Assets'])
+    positions = table.select({'Asset Category': category_filter, 'Location': location_filter,
+                              'Asset Status': status_filter}).tolist()
     if search:
-        search_lower = search.lower()
-        assets = [a for a in assets if search_lower in a.get('Asset Code', '').lower() or 
-                 search_lower in a.get('Item Name', '').lower()]
+        matches = set(asset_search.search_table(table, search))
+        positions = [pos for pos in positions if pos in matches]
+    assets = [table.row(pos).copy() for pos in positions]
     
     # Summary
     st.metric("Total Assets", len(assets))
@@ -49,32 +53,31 @@ def show(db, role):
         
         # Export button
         if st.button("📥 Export to Excel"):
-            excel_buffer = create_excel_export(assets)
-            st.download_button(
-                label="Download Excel File",
-                data=excel_buffer,
-                file_name=f"asset_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            job_id = create_excel_export(assets, {'category': category_filter, 'location': location_filter, 'status': status_filter, 'search': search})
+            with st.spinner("Preparing export..."):
+                job = export_jobs.wait(job_id, timeout=EXPORT_WAIT)
+            if job and job['status'] == DONE:
+                with open(export_jobs.path(job_id), 'rb') as f:
+                    st.download_button(
+                        label="Download Excel File",
+                        data=f.read(),
+                        file_name=job['filename'],
+                        mime=job['mimetype']
+                    )
+            elif job and job['status'] == FAILED:
+                st.error(f"Export failed: {job['error']}")
+            else:
+                st.info("The export is still being prepared. Click Export again in a moment to download it.")
     else:
         st.info("No assets found matching the filters.")
 
-def create_excel_export(assets):
-    """Create Excel export"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Asset Report"
+def create_excel_export(assets, params):
+    """Queue an Excel export of the assets shown with these filters; returns the job id"""
+    headers = list(assets[0].keys()) if assets else []
     
-    if assets:
-        headers = list(assets[0].keys())
-        ws.append(headers)
-        
-        for asset in assets:
-            row = [asset.get(header, '') for header in headers]
-            ws.append(row)
+    def build(path):
+        rows = ([asset.get(header, '') for header in headers] for asset in assets)
+        write_xlsx(path, "Asset Report", headers, rows)
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
-
+    filename = f"asset_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return export_jobs.submit('streamlit_asset_report', params, build, filename, XLSX_MIMETYPE)
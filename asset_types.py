@@ -1,6 +1,7 @@
 """Asset Types page for Streamlit"""
 import streamlit as st
 import pandas as pd
+from depreciation_engine import METHODS
 
 def show(db, role):
     """Display asset types page"""
@@ -17,6 +18,15 @@ def show(db, role):
                 asset_type = st.text_input("Asset Type *", required=True)
             with col3:
                 depreciation_value = st.number_input("Depreciation Value (%) *", min_value=0.0, max_value=100.0, step=0.01, required=True)
+            col4, col5, col6, col7 = st.columns(4)
+            with col4:
+                depreciation_method = st.selectbox("Depreciation Method", METHODS)
+            with col5:
+                useful_life = st.number_input("Useful Life (Years)", min_value=0, step=1)
+            with col6:
+                total_units = st.number_input("Total Units", min_value=0.0)
+            with col7:
+                units_per_year = st.number_input("Units Per Year", min_value=0.0)
             
             submitted = st.form_submit_button("💾 Add Asset Type", use_container_width=True)
             
@@ -25,7 +35,11 @@ def show(db, role):
                     if db.insert('AssetTypes', {
                         'Asset Code': asset_code,
                         'Asset Type': asset_type,
-                        'Depreciation Value (%)': str(depreciation_value)
+                        'Depreciation Value (%)': str(depreciation_value),
+                        'Depreciation Method': depreciation_method,
+                        'Useful Life (Years)': str(useful_life) if useful_life else '',
+                        'Total Units': str(total_units) if total_units else '',
+                        'Units Per Year': str(units_per_year) if units_per_year else ''
                     }):
                         st.success("Asset Type added successfully!")
                         st.rerun()
@@ -3,6 +3,11 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 import os
+from column_table import ColumnTable
+from db_backend import SHEET_HEADERS
+from text_search import asset_index
+
+asset_search = asset_index()
 
 def show(db, role):
     """Display assets page"""
@@ -12,18 +17,17 @@ def show(db, role):
     # Add Asset button
     col1, col2 = st.columns([3, 1])
     with col1:
-        search_term = st.text_input("🔍 Search by Asset Code or Item Name", placeholder="Type to search...")
+        search_term = st.text_input("🔍 Search by Asset Code, Item Name or Brand", placeholder="Type to search...")
     with col2:
         if st.button("➕ Add Asset", use_container_width=True):
             st.session_state.show_add_asset = True
     
-    # Get assets
-    assets = db.get_all('Assets')
-    
-    # Filter assets
+    # Get assets, best matches first when searching
     if search_term:
-        assets = [a for a in assets if search_term.lower() in a.get('Asset Code', '').lower() or 
-                 search_term.lower() in a.get('Item Name', '').lower()]
+        table = ColumnTable.from_records(db.get_all('Assets'), SHEET_HEADERS['Assets'])
+        assets = [table.row(pos).copy() for pos in asset_search.search_table(table, search_term)]
+    else:
+        assets = db.get_all('Assets')
     
     # Show add asset form
     if st.session_state.get('show_add_asset', False):
@@ -0,0 +1,307 @@
+"""Column-oriented storage for parsed sheets"""
+import itertools
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+# Date formats seen in the Date of Purchase and Movement Date columns, tried in order
+DATE_FORMATS = ['%Y-%m-%d', '%d/%m/%Y', '%m/%d/%Y', '%Y/%m/%d', '%d-%m-%Y', '%m-%d-%Y']
+
+# Time of day that may follow the date, as in Movement Date
+TIME_FORMATS = ['%H:%M:%S', '%H:%M']
+
+_DELETED = object()
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+# Source of ColumnTable.version numbers, unique within the process
+_versions = itertools.count()
+
+def parse_date(text: str) -> Optional[datetime]:
+    """Parse a date cell in any of DATE_FORMATS, ignoring a trailing time; None if it doesn't parse"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    candidates = [text, text.split(' ')[0]] if ' ' in text else [text]
+    for candidate in candidates:
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(candidate, fmt)
+            except ValueError:
+                continue
+    return None
+
+def parse_timestamp(text: str) -> Optional[datetime]:
+    """Parse a date cell with an optional time of day after it; None if it doesn't parse"""
+    text = (text or '').strip()
+    if ' ' in text:
+        for date_format in DATE_FORMATS:
+            for time_format in TIME_FORMATS:
+                try:
+                    return datetime.strptime(text, f'{date_format} {time_format}')
+                except ValueError:
+                    continue
+    return parse_date(text)
+
+class RowView(MutableMapping):
+    """One row of a ColumnTable that reads like the record dict it replaces
+
+    Values are read from the table's columns on access. Keys set on the view
+    (routes annotate records before rendering) live on the view only and
+    never reach the table.
+    """
+    __slots__ = ('_columns', '_headers', '_pos', '_extra')
+
+    def __init__(self, columns: Dict[str, List[str]], headers: List[str], pos: int):
+        self._columns = columns
+        self._headers = headers
+        self._pos = pos
+        self._extra = None
+
+    def __getitem__(self, key):
+        if self._extra is not None and key in self._extra:
+            value = self._extra[key]
+            if value is _DELETED:
+                raise KeyError(key)
+            return value
+        column = self._columns.get(key)
+        if column is None:
+            raise KeyError(key)
+        return column[self._pos]
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key):
+        self[key]
+        if key in self._columns:
+            self[key] = _DELETED
+        else:
+            del self._extra[key]
+
+    def __iter__(self):
+        extra = self._extra or {}
+        for header in self._headers:
+            if extra.get(header) is not _DELETED:
+                yield header
+        for key, value in extra.items():
+            if key not in self._columns and value is not _DELETED:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self) -> Dict:
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+class ColumnTable:
+    """Rows of a sheet stored column by column
+
+    Header strings are interned and each column is a list of cell strings in
+    which equal values share one string object, so a table costs a list per
+    column instead of a dict per row. ``numbers``, ``dates`` and ``timestamps``
+    parse a column once into a NumPy array, cached until the table changes.
+    ``postings`` is a cached inverted index of a column, which ``select``
+    intersects to answer equality filters in time proportional to the
+    matches rather than the table. ``version`` changes with every change, so
+    it identifies the table's contents.
+
+    ``rows`` hands out RowView mappings. The first change after that copies
+    the column lists, so views already handed out keep showing the rows as
+    they were when they were read.
+    """
+    def __init__(self, headers: List[str], columns: Optional[Dict[str, List[str]]] = None):
+        self.headers = [sys.intern(h) for h in dict.fromkeys(headers)]
+        self.columns = columns if columns is not None else {h: [] for h in self.headers}
+        self._length = len(self.columns[self.headers[0]]) if self.headers else 0
+        self._arrays = {}
+        self._shared = False
+        self.version = next(_versions)
+
+    @classmethod
+    def from_values(cls, headers: List[str], values: Iterable[List[str]]) -> 'ColumnTable':
+        """Build a table from raw rows of cells; every row must already be non-empty"""
+        table = cls(headers)
+        # When a header repeats, the last such column wins, as it did in a record dict
+        sources = {h: i for i, h in enumerate(headers)}
+        slots = [(sources[h], table.columns[h], {}) for h in table.headers]
+        for row in values:
+            width = len(row)
+            for i, column, distinct in slots:
+                raw = row[i] if i < width else ''
+                value = distinct.get(raw)
+                if value is None:
+                    # Strip each distinct cell value once and share the result
+                    value = distinct[raw] = raw.strip() if raw else ''
+                column.append(value)
+            table._length += 1
+        return table
+
+    @classmethod
+    def from_records(cls, records: List[Dict], headers: Iterable[str] = ()) -> 'ColumnTable':
+        """Build a table from record dicts; columns follow ``headers``, then any other keys"""
+        headers = list(dict.fromkeys(list(headers) + [key for record in records for key in record]))
+        columns = {}
+        for header in headers:
+            column = columns[sys.intern(header)] = []
+            for record in records:
+                value = record.get(header)
+                column.append('' if value is None else value if isinstance(value, str) else str(value))
+        return cls(headers, columns)
+
+    def __len__(self):
+        return self._length
+
+    def __getstate__(self):
+        return {'headers': self.headers, 'columns': self.columns}
+
+    def __setstate__(self, state):
+        self.__init__(state['headers'], state['columns'])
+
+    def column(self, header: str) -> List[str]:
+        """Cell values of one column; treat as read-only"""
+        column = self.columns.get(header)
+        return column if column is not None else [''] * self._length
+
+    def value(self, pos: int, header: str) -> str:
+        column = self.columns.get(header)
+        return column[pos] if column is not None else ''
+
+    def row(self, pos: int) -> RowView:
+        self._shared = True
+        return RowView(self.columns, self.headers, pos)
+
+    def rows(self) -> List[RowView]:
+        self._shared = True
+        columns, headers = self.columns, self.headers
+        return [RowView(columns, headers, pos) for pos in range(self._length)]
+
+    def frozen(self) -> 'ColumnTable':
+        """Read-only table over the current rows, safe to use while this one changes
+
+        It shares the parsed arrays with this table until this table changes.
+        """
+        self._shared = True
+        frozen = ColumnTable.__new__(ColumnTable)
+        frozen.headers = self.headers
+        frozen.columns = self.columns
+        frozen._length = self._length
+        frozen._arrays = self._arrays
+        frozen._shared = True
+        frozen.version = self.version
+        return frozen
+
+    def numbers(self, header: str) -> np.ndarray:
+        """Column parsed as float64, NaN where a cell is blank or not a number"""
+        key = ('numbers', header)
+        if key not in self._arrays:
+            parsed = {}
+            for text in set(self.column(header)):
+                try:
+                    parsed[text] = float(text) if text else np.nan
+                except ValueError:
+                    parsed[text] = np.nan
+            self._arrays[key] = np.array([parsed[text] for text in self.column(header)], dtype='float64')
+        return self._arrays[key]
+
+    def dates(self, header: str) -> np.ndarray:
+        """Column parsed as datetime64[D], NaT where a cell is blank or not a date"""
+        key = ('dates', header)
+        if key not in self._arrays:
+            parsed = {}
+            for text in set(self.column(header)):
+                value = parse_date(text)
+                parsed[text] = np.datetime64(value.date(), 'D') if value else np.datetime64('NaT', 'D')
+            self._arrays[key] = np.array([parsed[text] for text in self.column(header)], dtype='datetime64[D]')
+        return self._arrays[key]
+
+    def timestamps(self, header: str) -> np.ndarray:
+        """Column parsed as datetime64[s], keeping any time of day; NaT where a cell is not a date"""
+        key = ('timestamps', header)
+        if key not in self._arrays:
+            parsed = {}
+            for text in set(self.column(header)):
+                value = parse_timestamp(text)
+                parsed[text] = np.datetime64(value, 's') if value else np.datetime64('NaT', 's')
+            self._arrays[key] = np.array([parsed[text] for text in self.column(header)], dtype='datetime64[s]')
+        return self._arrays[key]
+
+    def order(self, header: str, tiebreak: str) -> Tuple[List[Tuple[str, str]], List[int]]:
+        """Row positions sorted by one column, then another, with each row's (value, tiebreak) key
+
+        Both lists are cached until the table changes; treat them as read-only.
+        """
+        key = ('order', header, tiebreak)
+        if key not in self._arrays:
+            ordered = sorted(zip(self.column(header), self.column(tiebreak), range(self._length)))
+            self._arrays[key] = ([(value, tie) for value, tie, _ in ordered], [pos for _, _, pos in ordered])
+        return self._arrays[key]
+
+    def postings(self, header: str) -> Dict[str, np.ndarray]:
+        """Inverted index of a column: each value's row positions, ascending
+
+        Cached until the table changes; treat as read-only.
+        """
+        key = ('postings', header)
+        if key not in self._arrays:
+            positions = {}
+            for pos, value in enumerate(self.column(header)):
+                positions.setdefault(value, []).append(pos)
+            self._arrays[key] = {value: np.array(rows, dtype=np.intp) for value, rows in positions.items()}
+        return self._arrays[key]
+
+    def distinct(self, header: str) -> List[str]:
+        """Sorted non-empty values of a column, from its postings"""
+        key = ('distinct', header)
+        if key not in self._arrays:
+            self._arrays[key] = sorted(value for value in self.postings(header) if value)
+        return self._arrays[key]
+
+    def select(self, filters: Optional[Dict[str, str]] = None) -> np.ndarray:
+        """Positions of the rows equal to every non-empty filter value, ascending
+
+        Starts from the shortest posting list and checks the other filters on
+        its rows only.
+        """
+        lists = sorted(((self.postings(header).get(value, _NO_ROWS), header, value)
+                        for header, value in (filters or {}).items() if value), key=lambda item: len(item[0]))
+        if not lists:
+            return np.arange(self._length, dtype=np.intp)
+        shortest = lists[0][0]
+        rest = [(self.column(header), value) for _, header, value in lists[1:]]
+        if not rest:
+            return shortest.copy()
+        return np.array([pos for pos in shortest.tolist() if all(column[pos] == value for column, value in rest)],
+                        dtype=np.intp)
+
+    def _before_change(self):
+        self._arrays = {}
+        self.version = next(_versions)
+        if self._shared:
+            self.columns = {h: list(column) for h, column in self.columns.items()}
+            self._shared = False
+
+    def append(self, record: Dict):
+        self._before_change()
+        for header in self.headers:
+            value = record.get(header, '')
+            self.columns[header].append(sys.intern(value) if len(value) < 32 else value)
+        self._length += 1
+
+    def set(self, pos: int, header: str, value: str):
+        if header in self.columns:
+            self._before_change()
+            self.columns[header][pos] = value
+
+    def remove(self, pos: int):
+        self._before_change()
+        for column in self.columns.values():
+            del column[pos]
+        self._length -= 1
@@ -9,3 +9,33 @@ class Config:
     # Default to Teddybuddies Asset Database Sheet ID
     GOOGLE_SHEET_ID = os.environ.get('GOOGLE_SHEET_ID') or '1q9jfezVWpFYAmvjo81Lk788kf9DNwqvSx7yxHWRGkec'
 
+    # Seconds a cached sheet snapshot is served before it is re-read (0 disables the cache)
+    CACHE_TTL = int(os.environ.get('CACHE_TTL') or 60)
+
+    # Directory for local state: ID sequences, journals and caches
+    LOCAL_DATA_DIR = os.environ.get('LOCAL_DATA_DIR') or 'data'
+
+    # Activity log entries are appended in batches of this size, or after this many seconds
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE') or 50)
+    ACTIVITY_LOG_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_LOG_FLUSH_INTERVAL') or 5)
+
+    # Storage backend: 'sheets' (Google Sheets), 'sqlite' (local database at SQLITE_PATH)
+    # or 'replica' (SQLite replica kept in sync with Google Sheets)
+    DATABASE_BACKEND = os.environ.get('DATABASE_BACKEND') or 'sheets'
+    SQLITE_PATH = os.environ.get('SQLITE_PATH') or os.path.join(LOCAL_DATA_DIR, 'assets.db')
+
+    # Replica backend: seconds between sync cycles, and which side wins a conflicting edit ('sheet' or 'local')
+    SYNC_INTERVAL = float(os.environ.get('SYNC_INTERVAL') or 30)
+    SYNC_CONFLICT_POLICY = os.environ.get('SYNC_CONFLICT_POLICY') or 'sheet'
+
+    # Google Sheets API calls allowed per minute by each process, and retries of a 429 response
+    SHEETS_READS_PER_MINUTE = int(os.environ.get('SHEETS_READS_PER_MINUTE') or 60)
+    SHEETS_WRITES_PER_MINUTE = int(os.environ.get('SHEETS_WRITES_PER_MINUTE') or 60)
+    SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES') or 5)
+
+    # Export files are built by this many background threads per process and kept for this many seconds
+    EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS') or 2)
+    EXPORT_TTL = int(os.environ.get('EXPORT_TTL') or 600)
+
+    # Records per page on the asset, movement and log lists
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE') or 50)
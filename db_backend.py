@@ -0,0 +1,251 @@
+"""Storage backend interface shared by the Google Sheets and SQLite databases"""
+import base64
+import json
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from typing import List, Dict, Optional, Sequence
+from column_table import ColumnTable
+from config import Config
+
+# Columns of every table, in sheet order
+SHEET_HEADERS = {
+    'Users': ['Username', 'Email', 'Password', 'Role'],
+    'Locations': ['ID', 'Location Name'],
+    'Categories': ['ID', 'Category Name'],
+    'Subcategories': ['ID', 'Subcategory Name', 'Category ID'],
+    'AssetTypes': ['Asset Code', 'Asset Type', 'Depreciation Value (%)', 'Depreciation Method',
+                   'Useful Life (Years)', 'Total Units', 'Units Per Year'],
+    'Brands': ['ID', 'Brand Name'],
+    'Assets': ['Asset Code', 'Item Name', 'Asset Category', 'Asset SubCategory',
+              'Brand', 'Asset Description', 'Amount', 'Location',
+              'Date of Purchase', 'Warranty', 'Department', 'Ownership',
+              'Asset Status', 'Image Attachment', 'Document Attachment'],
+    'AssetMovements': ['ID', 'Asset Code', 'From Location', 'To Location',
+                      'Movement Date', 'Moved By', 'Notes'],
+    'ActivityLogs': ['ID', 'Date & Time', 'Type', 'User', 'Action', 'Entity Type',
+                   'Entity ID', 'Description', 'Details']
+}
+
+# Column each table is keyed on
+KEY_FIELDS = {
+    'Users': 'Username',
+    'AssetTypes': 'Asset Code',
+    'Assets': 'Asset Code',
+}
+DEFAULT_KEY_FIELD = 'ID'
+
+# Columns that hold another table's key, per referenced table. Activity log
+# Entity IDs only ever point at assets, whose Asset Code key never changes.
+KEY_REFERENCES = {
+    'Categories': [('Subcategories', 'Category ID')],
+}
+
+def key_field_for(sheet_name: str) -> str:
+    return KEY_FIELDS.get(sheet_name, DEFAULT_KEY_FIELD)
+
+def cell_text(value) -> str:
+    """Text a stored value reads back as"""
+    if value is None:
+        return ''
+    return str(value).strip()
+
+def encode_cursor(*values: str) -> str:
+    """Opaque, URL-safe cursor holding the sort value and key of the last record read"""
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, size: int = 2) -> List[str]:
+    """Values of an encode_cursor cursor; raises ValueError if it is not one"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return values
+
+class Page:
+    """One page of records in sort order, as returned by DatabaseBackend.get_page
+    
+    ``total`` counts every record matching the query, not just this page.
+    ``next_cursor`` reads on after the last record; it is None on the last page.
+    """
+    def __init__(self, records: List[Dict], total: int, next_cursor: Optional[str] = None):
+        self.records = records
+        self.total = total
+        self.next_cursor = next_cursor
+
+def _matching(table: ColumnTable, key_field: str, order_by: str, filters: Optional[Dict[str, str]],
+              low: Optional[str], high: Optional[str]) -> Sequence[int]:
+    """Indexes into ``table.order(order_by, key_field)`` of the rows a query selects, ascending"""
+    keys, positions = table.order(order_by, key_field)
+    start = bisect_left(keys, low, key=lambda k: k[0]) if low is not None else 0
+    end = bisect_right(keys, high, key=lambda k: k[0]) if high is not None else len(keys)
+    selected = range(start, end)
+    if filters:
+        columns = [(table.column(column), value) for column, value in filters.items()]
+        selected = [i for i in selected if all(column[positions[i]] == value for column, value in columns)]
+    return selected
+
+def table_page(table: ColumnTable, key_field: str, order_by: str, limit: int, cursor: Optional[str] = None,
+               offset: int = 0, descending: bool = False, filters: Optional[Dict[str, str]] = None,
+               low: Optional[str] = None, high: Optional[str] = None) -> Page:
+    """get_page over a ColumnTable, using its cached sort order"""
+    keys, positions = table.order(order_by, key_field)
+    selected = _matching(table, key_field, order_by, filters, low, high)
+    if cursor:
+        after = tuple(decode_cursor(cursor))
+        # Index into ``selected`` of the first row past the cursor in reading order
+        boundary = bisect_left(keys, after) if descending else bisect_right(keys, after)
+        cut = bisect_left(selected, boundary)
+    else:
+        cut = len(selected) if descending else 0
+    if descending:
+        stop = max(cut - offset, 0)
+        start = max(stop - limit, 0)
+        chosen = list(reversed(selected[start:stop]))
+        more = start > 0
+    else:
+        start = cut + offset
+        chosen = list(selected[start:start + limit])
+        more = start + limit < len(selected)
+    records = [table.row(positions[i]) for i in chosen]
+    next_cursor = encode_cursor(*keys[chosen[-1]]) if more and chosen else None
+    return Page(records, len(selected), next_cursor)
+
+def table_distinct(table: ColumnTable, key_field: str, column: str, order_by: Optional[str] = None,
+                   filters: Optional[Dict[str, str]] = None, low: Optional[str] = None,
+                   high: Optional[str] = None) -> List[str]:
+    """distinct over a ColumnTable"""
+    values = table.column(column)
+    if not filters and low is None and high is None:
+        return sorted(set(values))
+    _, positions = table.order(order_by or key_field, key_field)
+    return sorted({values[positions[i]] for i in _matching(table, key_field, order_by or key_field,
+                                                          filters, low, high)})
+
+class DatabaseBackend(ABC):
+    """Record-level API every route and page uses to read and write tables
+    
+    Records are dict-like mappings keyed by column header with string values.
+    Setting keys on a returned record never changes the stored table.
+    """
+    @abstractmethod
+    def get_all(self, sheet_name: str) -> List[Dict]:
+        """Get all records from a table"""
+    
+    def get_many(self, sheet_names: List[str]) -> Dict[str, List[Dict]]:
+        """Get all records of several tables, keyed by table name"""
+        return {name: self.get_all(name) for name in sheet_names}
+    
+    def get_table(self, sheet_name: str) -> ColumnTable:
+        """All records of a table column by column, for column-wise computation; treat as read-only"""
+        return ColumnTable.from_records(self.get_all(sheet_name), SHEET_HEADERS.get(sheet_name, []))
+    
+    def get_tables(self, sheet_names: List[str]) -> Dict[str, ColumnTable]:
+        """get_table for several tables, keyed by table name"""
+        return {name: self.get_table(name) for name in sheet_names}
+    
+    def count(self, sheet_name: str) -> int:
+        """Number of records in a table, without reading them where the backend keeps it"""
+        return len(self.get_table(sheet_name))
+    
+    def get_page(self, sheet_name: str, order_by: str, limit: int, cursor: Optional[str] = None,
+                 offset: int = 0, descending: bool = False, filters: Optional[Dict[str, str]] = None,
+                 low: Optional[str] = None, high: Optional[str] = None) -> Page:
+        """Up to ``limit`` records in ``order_by`` order, ties broken by the key column
+        
+        Pass a page's ``next_cursor`` to read on after it, and ``offset`` to
+        skip records. ``filters`` keep records whose columns equal the given
+        values; ``low`` and ``high`` bound ``order_by`` (inclusive, compared
+        as text). Raises ValueError for a malformed cursor.
+        """
+        return table_page(self.get_table(sheet_name), key_field_for(sheet_name), order_by, limit,
+                          cursor, offset, descending, filters, low, high)
+    
+    def distinct(self, sheet_name: str, column: str, order_by: Optional[str] = None,
+                 filters: Optional[Dict[str, str]] = None, low: Optional[str] = None,
+                 high: Optional[str] = None) -> List[str]:
+        """Sorted distinct values of a column over the records a get_page query selects"""
+        return table_distinct(self.get_table(sheet_name), key_field_for(sheet_name), column,
+                              order_by, filters, low, high)
+    
+    @abstractmethod
+    def get_by_id(self, sheet_name: str, id_field: str, id_value: str) -> Optional[Dict]:
+        """Get the first record whose id_field equals id_value"""
+    
+    @abstractmethod
+    def insert(self, sheet_name: str, data: Dict) -> bool:
+        """Insert a new record"""
+    
+    @abstractmethod
+    def insert_many(self, sheet_name: str, records: List[Dict], chunk_size: int = 500,
+                    max_retries: int = 3) -> List[Dict]:
+        """Insert many records; returns one report dict per chunk"""
+    
+    @abstractmethod
+    def update(self, sheet_name: str, id_field: str, id_value: str, data: Dict) -> bool:
+        """Update the given columns of a record"""
+    
+    @abstractmethod
+    def update_many(self, sheet_name: str, id_field: str, updates: Dict[str, Dict]) -> int:
+        """Update several records; returns the number updated"""
+    
+    @abstractmethod
+    def delete(self, sheet_name: str, id_field: str, id_value: str) -> bool:
+        """Delete a record"""
+    
+    @abstractmethod
+    def get_next_id(self, sheet_name: str, id_field: str = 'ID') -> int:
+        """Allocate the next numeric ID for a table"""
+    
+    def invalidate(self, sheet_name: Optional[str] = None):
+        """Drop any cached copy of a table; backends without a cache ignore this"""
+
+def create_db(backend: Optional[str] = None) -> DatabaseBackend:
+    """Open the database selected by Config.DATABASE_BACKEND ('sheets', 'sqlite' or 'replica')"""
+    backend = (backend or Config.DATABASE_BACKEND).lower()
+    if backend == 'replica':
+        # Routes read the local replica; a background thread syncs it with the sheet
+        from google_sheets_db import GoogleSheetsDB
+        from sheets_sync import ReplicaDB, SheetsSync
+        replica = ReplicaDB()
+        sync = SheetsSync(replica, GoogleSheetsDB())
+        sync.sync()
+        sync.start()
+        return replica
+    if backend == 'sqlite':
+        from sqlite_db import SQLiteDB
+        return SQLiteDB()
+    if backend == 'sheets':
+        from google_sheets_db import GoogleSheetsDB
+        return GoogleSheetsDB()
+    raise ValueError(f"Unknown DATABASE_BACKEND: {backend}")
+
+def copy_tables(source: DatabaseBackend, target: DatabaseBackend,
+                sheet_names: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Upsert every record of ``source`` into ``target`` by key column
+    
+    Records missing from the target are inserted in bulk, records whose values
+    differ are updated in bulk. Nothing is deleted. Returns the inserted and
+    updated counts per table.
+    """
+    summary = {}
+    for sheet_name in sheet_names or list(SHEET_HEADERS):
+        key_field = key_field_for(sheet_name)
+        existing = {r.get(key_field, ''): r for r in target.get_all(sheet_name)}
+        to_insert = []
+        to_update = {}
+        for record in source.get_all(sheet_name):
+            key = record.get(key_field, '')
+            current = existing.get(key)
+            if current is None or not key:
+                to_insert.append(record)
+            elif any(current.get(h, '') != v for h, v in record.items()):
+                to_update[key] = record
+        inserted = 0
+        if to_insert:
+            results = target.insert_many(sheet_name, to_insert)
+            inserted = sum(r['rows'] for r in results if r['success'])
+        updated = target.update_many(sheet_name, key_field, to_update) if to_update else 0
+        summary[sheet_name] = {'inserted': inserted, 'updated': updated}
+    return summary
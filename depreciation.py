@@ -2,6 +2,14 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from depreciation_engine import compute_depreciation
+from export_jobs import DONE, FAILED, ExportJobs
+from xlsx_export import XLSX_MIMETYPE, write_xlsx
+
+# Exports are built in the background; seconds the page waits for one before asking to retry
+EXPORT_WAIT = 60
+
+export_jobs = ExportJobs()
 
 def show(db, role):
     """Display depreciation page"""
@@ -9,109 +17,64 @@ def show(db, role):
     st.markdown('<p class="sub-header">View asset depreciation calculations and current values</p>', unsafe_allow_html=True)
     
     # Get data
-    assets = db.get_all('Assets')
-    asset_types = db.get_all('AssetTypes')
-    
-    # Create lookup for depreciation
-    dep_lookup = {}
-    for at in asset_types:
-        dep_lookup[at.get('Asset Type', '')] = float(at.get('Depreciation Value (%)', 0) or 0)
-    
-    # Calculate depreciation
-    today = datetime.now().date()
-    processed_assets = []
-    
-    for asset in assets:
-        # Get purchase amount
-        try:
-            purchase_amount = float(asset.get('Amount', 0) or 0)
-        except:
-            purchase_amount = 0
-        
-        # Get purchase date
-        purchase_date_str = asset.get('Date of Purchase', '')
-        age_years = 0
-        if purchase_date_str:
-            try:
-                purchase_date = datetime.strptime(purchase_date_str, '%Y-%m-%d').date()
-                delta = today - purchase_date
-                age_years = delta.days / 365.25
-                if age_years < 0:
-                    age_years = 0
-            except:
-                pass
-        
-        # Get depreciation %
-        asset_category = asset.get('Asset Category', '')
-        depreciation_percent = dep_lookup.get(asset_category, 0)
-        
-        # Calculate
-        annual_dep = 0
-        total_dep = 0
-        current_value = purchase_amount
-        
-        if purchase_amount > 0 and depreciation_percent > 0 and age_years > 0:
-            annual_dep = purchase_amount * (depreciation_percent / 100)
-            total_dep = annual_dep * age_years
-            current_value = max(0, purchase_amount - total_dep)
-        
-        asset['Purchase Amount'] = purchase_amount
-        asset['Age (Years)'] = round(age_years, 2)
-        asset['Depreciation %'] = depreciation_percent
-        asset['Annual Depreciation'] = round(annual_dep, 2)
-        asset['Total Depreciation'] = round(total_dep, 2)
-        asset['Current Value'] = round(current_value, 2)
-        
-        processed_assets.append(asset)
+    result = compute_depreciation(db.get_all('Assets'), db.get_all('AssetTypes'))
+    totals = result.totals()
     
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("Total Assets", len(processed_assets))
+        st.metric("Total Assets", len(result))
     with col2:
-        total_purchase = sum(a.get('Purchase Amount', 0) for a in processed_assets)
-        st.metric("Total Purchase Value", f"${total_purchase:,.2f}")
+        st.metric("Total Purchase Value", f"${totals['purchase_amount']:,.2f}")
     with col3:
-        total_dep = sum(a.get('Total Depreciation', 0) for a in processed_assets)
-        st.metric("Total Depreciation", f"${total_dep:,.2f}")
+        st.metric("Total Depreciation", f"${totals['total_depreciation']:,.2f}")
     with col4:
-        total_current = sum(a.get('Current Value', 0) for a in processed_assets)
-        st.metric("Current Book Value", f"${total_current:,.2f}")
+        st.metric("Current Book Value", f"${totals['current_value']:,.2f}")
+    
+    df = pd.DataFrame({header: result.column(header) for header in result.table.headers})
+    df['Purchase Amount'] = result.purchase_amount
+    df['Age (Years)'] = result.age_years.round(2)
+    df['Depreciation %'] = result.depreciation_percent
+    df['Annual Depreciation'] = result.annual_depreciation.round(2)
+    df['Total Depreciation'] = result.total_depreciation.round(2)
+    df['Current Value'] = result.current_value.round(2)
     
     # Display table
-    if processed_assets:
+    if len(df):
         display_cols = ['Asset Code', 'Item Name', 'Asset Category', 'Location', 
                        'Purchase Amount', 'Age (Years)', 'Depreciation %', 
                        'Annual Depreciation', 'Total Depreciation', 'Current Value']
-        df = pd.DataFrame(processed_assets)
         available_cols = [col for col in display_cols if col in df.columns]
         st.dataframe(df[available_cols], use_container_width=True, hide_index=True)
         
         # Export button
         if st.button("📥 Export to Excel"):
-            excel_buffer = create_excel_export(processed_assets)
-            st.download_button(
-                label="Download Excel File",
-                data=excel_buffer,
-                file_name=f"depreciation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            job_id = create_excel_export(df.to_dict('records'), {'as_of': result.as_of.isoformat()})
+            with st.spinner("Preparing export..."):
+                job = export_jobs.wait(job_id, timeout=EXPORT_WAIT)
+            if job and job['status'] == DONE:
+                with open(export_jobs.path(job_id), 'rb') as f:
+                    st.download_button(
+                        label="Download Excel File",
+                        data=f.read(),
+                        file_name=job['filename'],
+                        mime=job['mimetype']
+                    )
+            elif job and job['status'] == FAILED:
+                st.error(f"Export failed: {job['error']}")
+            else:
+                st.info("The export is still being prepared. Click Export again in a moment to download it.")
     else:
         st.info("No assets found for depreciation calculation.")
 
-def create_excel_export(assets):
-    """Create Excel export"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Depreciation Report"
-    
+def create_excel_export(assets, params):
+    """Queue an Excel export of the depreciation table; returns the job id"""
     headers = ['Asset Code', 'Item Name', 'Category', 'Location', 'Purchase Date',
                'Age (Years)', 'Purchase Amount', 'Depreciation %', 'Annual Depreciation',
                'Total Depreciation', 'Current Book Value', 'Status']
-    ws.append(headers)
     
-    for asset in assets:
-        row = [
+    def build(path):
+        rows = ([
             asset.get('Asset Code', ''),
             asset.get('Item Name', ''),
             asset.get('Asset Category', ''),
@@ -124,11 +87,8 @@ def create_excel_export(assets):
             asset.get('Total Depreciation', ''),
             asset.get('Current Value', ''),
             asset.get('Asset Status', '')
-        ]
-        ws.append(row)
+        ] for asset in assets)
+        write_xlsx(path, "Depreciation Report", headers, rows)
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
-
+    filename = f"depreciation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return export_jobs.submit('streamlit_depreciation_report', params, build, filename, XLSX_MIMETYPE)
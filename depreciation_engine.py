@@ -0,0 +1,355 @@
+"""Depreciation of the asset register, computed column by column"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from column_table import ColumnTable
+from db_backend import SHEET_HEADERS
+from local_store import data_path, write_atomic
+
+# Values added to each asset by DepreciationResult.records
+FIELDS = ['purchase_amount', 'depreciation_percent', 'age_years',
+          'annual_depreciation', 'total_depreciation', 'current_value']
+
+# Depreciation Method values of AssetTypes, by method code; blank means straight line
+METHODS = ['Straight Line', 'Declining Balance', 'Sum of Years Digits', 'Units of Production']
+STRAIGHT_LINE, DECLINING_BALANCE, SUM_OF_YEARS_DIGITS, UNITS_OF_PRODUCTION = range(len(METHODS))
+_METHOD_CODES = {name.lower(): code for code, name in enumerate(METHODS)}
+
+# Rows of the per-asset parameter array built from the asset's type
+METHOD, PERCENT, LIFE, TOTAL_UNITS, UNITS_PER_YEAR = range(5)
+
+# Columns of the rows depreciation_schedule produces
+SCHEDULE_COLUMNS = ['Asset Code', 'Period', 'Period Start', 'Opening Value', 'Depreciation', 'Closing Value']
+
+# Bump when the stored snapshot layout changes, so old files are ignored
+SNAPSHOT_FORMAT = 2
+
+# Snapshots for dates other than a month end are deleted once this many days old
+SNAPSHOT_RETENTION_DAYS = 7
+
+def as_table(records: Union[ColumnTable, List[Dict]], sheet_name: str) -> ColumnTable:
+    """Accept either a ColumnTable or the record list get_all returns"""
+    if isinstance(records, ColumnTable):
+        return records
+    return ColumnTable.from_records(records, SHEET_HEADERS.get(sheet_name, []))
+
+def _number(text: str) -> float:
+    """A parameter cell as a float; blank or invalid values count as 0"""
+    try:
+        return float(text) if text else 0.0
+    except ValueError:
+        return 0.0
+
+def type_parameters(asset_types: Union[ColumnTable, List[Dict]]) -> Dict[str, List[float]]:
+    """Depreciation parameters per Asset Type, indexed by METHOD, PERCENT, LIFE, ...
+
+    An unknown method counts as straight line. Without a Useful Life (Years),
+    sum of years digits uses the life implied by the Depreciation Value (%).
+    """
+    table = as_table(asset_types, 'AssetTypes')
+    parameters = {}
+    for name, method, percent, life, total_units, units_per_year in zip(
+            table.column('Asset Type'), table.column('Depreciation Method'),
+            table.column('Depreciation Value (%)'), table.column('Useful Life (Years)'),
+            table.column('Total Units'), table.column('Units Per Year')):
+        percent = _number(percent)
+        life = round(_number(life)) or (round(100 / percent) if percent > 0 else 0)
+        parameters[name] = [_METHOD_CODES.get(method.lower(), STRAIGHT_LINE), percent, life,
+                            _number(total_units), _number(units_per_year)]
+    return parameters
+
+class DepreciationResult:
+    """Depreciation of the selected assets as NumPy arrays, one entry per asset
+
+    ``positions`` are the selected rows of ``table``; every array in FIELDS is
+    aligned with it.
+    """
+    def __init__(self, table: ColumnTable, positions: np.ndarray, as_of: date, **values):
+        self.table = table
+        self.positions = positions
+        self.as_of = as_of
+        for field in FIELDS:
+            setattr(self, field, values[field])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def column(self, header: str) -> List[str]:
+        """Values of an asset column for the selected assets"""
+        column = self.table.column(header)
+        return [column[pos] for pos in self.positions.tolist()]
+
+    def totals(self) -> Dict[str, float]:
+        """Sum of the purchase amounts and depreciation values over the selected assets"""
+        return {field: float(getattr(self, field).sum())
+                for field in ['purchase_amount', 'annual_depreciation', 'total_depreciation', 'current_value']}
+
+    def records(self) -> List[Dict]:
+        """The selected assets as records, each with the FIELDS values added"""
+        columns = [getattr(self, field).tolist() for field in FIELDS]
+        records = []
+        for pos, values in zip(self.positions.tolist(), zip(*columns)):
+            record = self.table.row(pos)
+            for field, value in zip(FIELDS, values):
+                record[field] = value
+            records.append(record)
+        return records
+
+def _valid(parameters: np.ndarray) -> np.ndarray:
+    """Whether each asset's type has what its method needs to depreciate it"""
+    method, percent, life, total_units, units_per_year = parameters
+    return np.select([method == SUM_OF_YEARS_DIGITS, method == UNITS_OF_PRODUCTION],
+                     [life > 0, (total_units > 0) & (units_per_year > 0)], percent > 0)
+
+def _accumulated(amount: np.ndarray, parameters: np.ndarray, age: np.ndarray) -> np.ndarray:
+    """Depreciation accumulated ``age`` years after purchase, never more than ``amount``
+
+    The arguments broadcast against each other, so ``age`` can hold a row of
+    period boundaries per asset.
+    """
+    method, percent, life, total_units, units_per_year = parameters
+    rate = percent / 100
+    straight = amount * rate * age
+    declining = amount * (1 - np.power(np.clip(1 - rate, 0.0, 1.0), age))
+    # Year k of an n-year life takes (n - k + 1) / (n (n + 1) / 2) of the cost
+    years = np.minimum(age, life)
+    whole = np.floor(years)
+    digits = whole * life - whole * (whole - 1) / 2 + (years - whole) * (life - whole)
+    sum_of_years = amount * digits / np.maximum(life * (life + 1) / 2, 1)
+    units = amount * np.minimum(units_per_year * age, total_units) / np.maximum(total_units, 1e-9)
+    accumulated = np.select([method == DECLINING_BALANCE, method == SUM_OF_YEARS_DIGITS,
+                             method == UNITS_OF_PRODUCTION], [declining, sum_of_years, units], straight)
+    return np.where(_valid(parameters) & (amount > 0) & (age > 0), np.minimum(accumulated, amount), 0.0)
+
+def _depreciate(amount: np.ndarray, purchased: np.ndarray, parameters: np.ndarray,
+                as_of: date) -> np.ndarray:
+    """FIELDS values, one row per field, for assets with the given parsed inputs
+
+    Annual depreciation is the fixed yearly charge for straight line and the
+    charge over the year after ``as_of`` for the other methods.
+    """
+    amount = np.where(np.isnan(amount), 0.0, amount)
+    days = (np.datetime64(as_of, 'D') - purchased) / np.timedelta64(1, 'D')
+    age = np.where(np.isnat(purchased), 0.0, np.maximum(days, 0.0) / 365.25)
+    total = _accumulated(amount, parameters, age)
+    depreciates = _valid(parameters) & (amount > 0) & (age > 0)
+    straight = amount * (parameters[PERCENT] / 100)
+    annual = np.where(parameters[METHOD] == STRAIGHT_LINE, straight,
+                      _accumulated(amount, parameters, age + 1) - total)
+    annual = np.where(depreciates, annual, 0.0)
+    return np.array([amount, parameters[PERCENT], age, annual, total, amount - total])
+
+def _parameters(table: ColumnTable, asset_types: ColumnTable) -> np.ndarray:
+    """Depreciation parameters of every asset, one row per parameter
+
+    An asset's type is its Asset Type, or its Asset Category when that is blank.
+    """
+    by_type = type_parameters(asset_types)
+    unknown = [STRAIGHT_LINE, 0.0, 0.0, 0.0, 0.0]
+    return np.array([by_type.get(asset_type or category, unknown) for asset_type, category
+                     in zip(table.column('Asset Type'), table.column('Asset Category'))],
+                    dtype='float64').reshape(-1, 5).T
+
+def compute_depreciation(assets: Union[ColumnTable, List[Dict]],
+                         asset_types: Union[ColumnTable, List[Dict]],
+                         as_of: Optional[date] = None,
+                         filters: Optional[Dict[str, str]] = None) -> DepreciationResult:
+    """Depreciation of every asset as of ``as_of`` (default today)
+
+    ``filters`` maps asset columns to the value they must equal; empty values
+    are ignored. Each asset depreciates from its Amount, down to zero, by the
+    Depreciation Method of its type (see METHODS) since its Date of Purchase.
+    """
+    table = as_table(assets, 'Assets')
+    as_of = as_of or date.today()
+    positions = table.select(filters)
+    values = _depreciate(table.numbers('Amount')[positions],
+                         table.dates('Date of Purchase')[positions],
+                         _parameters(table, as_table(asset_types, 'AssetTypes'))[:, positions], as_of)
+    return DepreciationResult(table, positions, as_of, **dict(zip(FIELDS, values)))
+
+def depreciation_schedule(assets: Union[ColumnTable, List[Dict]],
+                          asset_types: Union[ColumnTable, List[Dict]],
+                          period: str = 'year', periods: Optional[int] = None,
+                          filters: Optional[Dict[str, str]] = None,
+                          chunk_size: int = 2000) -> Iterator[pd.DataFrame]:
+    """Per-period depreciation of every asset from its purchase, in DataFrame batches
+
+    ``period`` is 'year' or 'month' and ``periods`` the number of them per
+    asset (default ten years' worth). Assets without an Amount or a Date of
+    Purchase are left out. Each batch covers ``chunk_size`` assets and has
+    the SCHEDULE_COLUMNS, so a whole fleet can be streamed without holding
+    the schedule in memory.
+    """
+    if period not in ('year', 'month'):
+        raise ValueError(f"Unknown schedule period: {period}")
+    months = 12 if period == 'year' else 1
+    periods = periods or 120 // months
+    table = as_table(assets, 'Assets')
+    amount = table.numbers('Amount')
+    purchased = table.dates('Date of Purchase')
+    parameters = _parameters(table, as_table(asset_types, 'AssetTypes'))
+    codes = np.asarray(table.column('Asset Code'), dtype=object)
+    positions = table.select(filters)
+    positions = positions[~np.isnat(purchased[positions]) & (amount[positions] > 0)]
+    # Period boundaries in years since purchase, and period start offsets in months
+    ages = np.arange(periods + 1) * (months / 12)
+    offsets = (np.arange(periods) * months).astype('timedelta64[M]')
+    numbers = np.arange(1, periods + 1)
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start:start + chunk_size]
+        cost = amount[chunk, None]
+        accumulated = _accumulated(cost, parameters[:, chunk, None], ages[None, :])
+        # Periods start on the purchase day of the month, or the month's last day
+        month = purchased[chunk].astype('datetime64[M]')
+        day = purchased[chunk] - month.astype('datetime64[D]')
+        starts = (month[:, None] + offsets[None, :])
+        period_start = np.minimum(starts.astype('datetime64[D]') + day[:, None],
+                                  (starts + 1).astype('datetime64[D]') - 1)
+        yield pd.DataFrame({
+            'Asset Code': np.repeat(codes[chunk], periods),
+            'Period': np.tile(numbers, len(chunk)),
+            'Period Start': period_start.ravel(),
+            'Opening Value': (cost - accumulated[:, :-1]).ravel(),
+            'Depreciation': np.diff(accumulated, axis=1).ravel(),
+            'Closing Value': (cost - accumulated[:, 1:]).ravel(),
+        }, columns=SCHEDULE_COLUMNS)
+
+def schedule_csv(batches: Iterator[pd.DataFrame]) -> Iterator[str]:
+    """CSV text of depreciation_schedule batches, one string per batch after the header"""
+    yield ','.join(SCHEDULE_COLUMNS) + '\n'
+    for batch in batches:
+        batch['Period Start'] = np.datetime_as_string(batch['Period Start'].to_numpy().astype('datetime64[D]'))
+        for column in ['Opening Value', 'Depreciation', 'Closing Value']:
+            batch[column] = batch[column].round(2)
+        yield batch.to_csv(index=False, header=False)
+
+def _is_month_end(day: date) -> bool:
+    return (day + timedelta(days=1)).day == 1
+
+class DepreciationSnapshots:
+    """Materialized depreciation of every asset, one snapshot per as-of date
+
+    A snapshot holds each asset's inputs (Amount, Date of Purchase and the
+    depreciation parameters of its type) next to the FIELDS values computed
+    from them.
+    When the asset table changes, only assets whose inputs differ from the
+    snapshot's are recomputed; the rest are copied over. Snapshots are kept
+    in memory for the last ``cached`` dates and on local disk, where every
+    worker can reuse them. Month-end snapshots are kept indefinitely, others
+    for SNAPSHOT_RETENTION_DAYS.
+
+    Asking again for a date with the same asset and asset type tables
+    (by ColumnTable.version) is served straight from memory.
+    """
+    def __init__(self, cached: int = 8):
+        self.cached = cached
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, as_of: date) -> str:
+        return data_path('depreciation', f'{as_of.isoformat()}.v{SNAPSHOT_FORMAT}.pickle')
+
+    def _load(self, as_of: date):
+        """(versions, snapshot) for a date; versions is None for a snapshot read from disk"""
+        with self._lock:
+            if as_of in self._memory:
+                self._memory.move_to_end(as_of)
+                return self._memory[as_of]
+        try:
+            with open(self._path(as_of), 'rb') as f:
+                return None, pickle.load(f)
+        except Exception:
+            return None, None
+
+    def _remember(self, as_of: date, versions, snapshot: Dict):
+        with self._lock:
+            self._memory[as_of] = (versions, snapshot)
+            self._memory.move_to_end(as_of)
+            while len(self._memory) > self.cached:
+                self._memory.popitem(last=False)
+
+    def compute(self, assets: Union[ColumnTable, List[Dict]],
+                asset_types: Union[ColumnTable, List[Dict]],
+                as_of: Optional[date] = None,
+                filters: Optional[Dict[str, str]] = None) -> DepreciationResult:
+        """Same result as compute_depreciation, served from the snapshot for ``as_of``"""
+        table = as_table(assets, 'Assets')
+        types = as_table(asset_types, 'AssetTypes')
+        as_of = as_of or date.today()
+        versions = (table.version, types.version)
+        known_versions, snapshot = self._load(as_of)
+        if snapshot is None or known_versions != versions:
+            snapshot = self._refresh(snapshot, table, types, as_of)
+            self._remember(as_of, versions, snapshot)
+        positions = table.select(filters)
+        values = snapshot['values'][:, positions]
+        return DepreciationResult(table, positions, as_of, **dict(zip(FIELDS, values)))
+
+    def _refresh(self, previous: Optional[Dict], table: ColumnTable, types: ColumnTable,
+                 as_of: date) -> Dict:
+        """Snapshot of ``table``, reusing the values of ``previous`` where the inputs match"""
+        codes = table.column('Asset Code')
+        amounts = np.asarray(table.column('Amount'), dtype=object)
+        purchased = np.asarray(table.column('Date of Purchase'), dtype=object)
+        parameters = _parameters(table, types)
+        values = np.zeros((len(FIELDS), len(table)))
+        dirty = np.ones(len(table), dtype=bool)
+        if previous is not None:
+            index = previous['index']
+            old = np.array([index.get(code, -1) for code in codes], dtype=np.intp)
+            known = np.flatnonzero(old >= 0)
+            unchanged = ((previous['amounts'][old[known]] == amounts[known])
+                         & (previous['purchased'][old[known]] == purchased[known])
+                         & (previous['parameters'][:, old[known]] == parameters[:, known]).all(axis=0))
+            reused = known[unchanged]
+            values[:, reused] = previous['values'][:, old[reused]]
+            dirty[reused] = False
+        changed = np.flatnonzero(dirty)
+        if len(changed) == len(table):
+            # Nothing to reuse: the table's own parsed columns may already be cached
+            values = _depreciate(table.numbers('Amount'), table.dates('Date of Purchase'),
+                                 parameters, as_of)
+        elif len(changed):
+            inputs = ColumnTable(['Amount', 'Date of Purchase'],
+                                 {'Amount': amounts[changed].tolist(),
+                                  'Date of Purchase': purchased[changed].tolist()})
+            values[:, changed] = _depreciate(inputs.numbers('Amount'),
+                                             inputs.dates('Date of Purchase'),
+                                             parameters[:, changed], as_of)
+        snapshot = {
+            'index': {code: pos for pos, code in enumerate(codes)},
+            'amounts': amounts,
+            'purchased': purchased,
+            'parameters': parameters,
+            'values': values,
+        }
+        if previous is None or len(changed) or len(table) != len(previous['amounts']):
+            self._save(as_of, snapshot)
+        return snapshot
+
+    def _save(self, as_of: date, snapshot: Dict):
+        try:
+            write_atomic(self._path(as_of), pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL))
+            self._prune()
+        except OSError as e:
+            print(f"Error saving depreciation snapshot for {as_of}: {e}")
+
+    def _prune(self):
+        folder = os.path.dirname(self._path(date.today()))
+        cutoff = date.today() - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+        for name in os.listdir(folder):
+            try:
+                day = date.fromisoformat(name.split('.')[0])
+            except ValueError:
+                continue
+            if day < cutoff and not _is_month_end(day):
+                try:
+                    os.remove(os.path.join(folder, name))
+                except OSError:
+                    pass
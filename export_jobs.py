@@ -0,0 +1,163 @@
+"""Background export jobs with artifacts spooled on local disk"""
+import glob
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+from config import Config
+from local_store import data_path, file_lock, pid_alive, write_atomic
+from sheets_quota import BULK, request_priority
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+# Seconds between checks of a job's state file while waiting for it
+POLL_INTERVAL = 0.2
+
+def job_key(name: str, params: Dict) -> str:
+    """Job id of an export: equal for the same export with the same parameters"""
+    text = json.dumps([name, params], sort_keys=True, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:32]
+
+class ExportJobs:
+    """Builds export files on a thread pool and keeps them in a spool directory
+
+    ``submit`` returns a job id at once and the file is written by one of
+    ``workers`` threads; the job's state is kept in ``<job id>.json`` next to
+    the file, so any worker process on the host can report on it or serve it.
+    The id is derived from the export and its parameters, so submitting the
+    same export again returns the job already queued, running or finished
+    instead of building the file twice. Finished files are served for ``ttl``
+    seconds and then removed. Failed jobs, and jobs whose process died before
+    they finished, are built again on the next submit.
+    """
+    def __init__(self, workers: Optional[int] = None, ttl: Optional[float] = None):
+        self.workers = workers or Config.EXPORT_WORKERS
+        self.ttl = Config.EXPORT_TTL if ttl is None else ttl
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def _path(self, *parts: str) -> str:
+        return data_path('exports', *parts)
+
+    def _state_path(self, job_id: str) -> str:
+        return self._path(f'{job_id}.json')
+
+    def path(self, job_id: str) -> str:
+        """Where the finished file of a job is kept"""
+        return self._path(f'{job_id}.out')
+
+    def _pool(self) -> ThreadPoolExecutor:
+        """The thread pool of this process (a new one after a fork)"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='export-job')
+                self._pid = os.getpid()
+            return self._executor
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """State of a job (``status``, ``filename``, ``mimetype``, ``error``), or None if unknown"""
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, job: Dict):
+        write_atomic(self._state_path(job['job_id']), json.dumps(job).encode('utf-8'))
+
+    def _reusable(self, job: Dict, now: float) -> bool:
+        """Whether a job serves a new submit of the same export, instead of building it again"""
+        if job['status'] == DONE:
+            return now - job['finished_at'] <= self.ttl and os.path.exists(self.path(job['job_id']))
+        if job['status'] == FAILED:
+            return False
+        return pid_alive(job['pid'])
+
+    def _expired(self, job: Dict, now: float) -> bool:
+        if job['status'] in (DONE, FAILED):
+            return now - job['finished_at'] > self.ttl
+        # Queued or running in a process that has died
+        return not pid_alive(job['pid'])
+
+    def submit(self, name: str, params: Dict, build: Callable[[str], None],
+               filename: str, mimetype: str) -> str:
+        """Queue ``build(path)`` to write the export to ``path`` and return the job id
+
+        ``params`` must hold everything the export depends on. ``filename`` is
+        the name the file is downloaded as.
+        """
+        job_id = job_key(name, params)
+        now = time.time()
+        with file_lock(self._path('spool.lock')):
+            self._prune(now)
+            job = self.status(job_id)
+            if job is not None and self._reusable(job, now):
+                return job_id
+            job = {'job_id': job_id, 'name': name, 'status': QUEUED, 'filename': filename,
+                   'mimetype': mimetype, 'error': '', 'pid': os.getpid(),
+                   'created_at': now, 'finished_at': None}
+            self._save(job)
+        self._pool().submit(self._run, job, build)
+        return job_id
+
+    def _run(self, job: Dict, build: Callable[[str], None]):
+        job_id = job['job_id']
+        tmp_path = f"{self.path(job_id)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with file_lock(self._path('spool.lock')):
+            job['status'] = RUNNING
+            self._save(job)
+        try:
+            with request_priority(BULK):
+                build(tmp_path)
+            os.replace(tmp_path, self.path(job_id))
+            job['status'] = DONE
+        except Exception as e:
+            print(f"Error building export {job['name']}: {e}")
+            job['status'] = FAILED
+            job['error'] = str(e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        job['finished_at'] = time.time()
+        with file_lock(self._path('spool.lock')):
+            self._save(job)
+
+    def _prune(self, now: float):
+        """Remove expired jobs and their files; call with the spool lock held"""
+        for state_path in glob.glob(self._path('*.json')):
+            job_id = os.path.basename(state_path)[:-len('.json')]
+            job = self.status(job_id)
+            if job is not None and not self._expired(job, now):
+                continue
+            for path in (state_path, self.path(job_id)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        # Partial files of builds whose process died
+        for tmp_path in glob.glob(self._path('*.out.*.tmp')):
+            try:
+                pid = int(tmp_path.rsplit('.', 3)[1])
+            except ValueError:
+                continue
+            if not pid_alive(pid):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def wait(self, job_id: str, timeout: float) -> Optional[Dict]:
+        """Block until a job is done or failed, or ``timeout`` seconds pass; returns its latest state"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job is None or job['status'] in (DONE, FAILED) or time.monotonic() >= deadline:
+                return job
+            time.sleep(POLL_INTERVAL)
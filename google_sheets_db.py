@@ -1,277 +1,689 @@
 import gspread
+from gspread.utils import absolute_range_name, rowcol_to_a1
 from google.oauth2.service_account import Credentials
 from config import Config
-from typing import List, Dict, Optional
+from column_table import ColumnTable
+from db_backend import DatabaseBackend, SHEET_HEADERS, cell_text, key_field_for
+from id_sequence import IdSequence
+from local_store import data_path, write_atomic
+from snapshot_store import SharedSnapshotStore
+from sheets_quota import QuotaScheduler, is_rate_limited
+from typing import List, Dict, Optional, Tuple
+import bisect
+import hashlib
 import json
+import re
+import threading
+import time
 
-class GoogleSheetsDB:
+DRIVE_FILES_URL = 'https://www.googleapis.com/drive/v3/files'
+
+class TableSnapshot:
+    """Parsed copy of a worksheet held in the table cache
+    
+    ``table`` holds the records column by column (see ColumnTable), ``rows``
+    the sheet row number of each record and ``index`` maps the key column
+    value to the record position, so a key lookup resolves straight to the row
+    to write without scanning or re-reading the sheet.
+    """
+    def __init__(self, headers: List[str], table: ColumnTable, rows: List[int], key_field: str):
+        self.headers = headers
+        self.table = table
+        self.rows = rows
+        self.key_field = key_field
+        self.loaded_at = time.time()
+        self._reindex()
+
+    def _reindex(self):
+        self.index = {}
+        self.max_key = 0
+        for pos, key in enumerate(self.table.column(self.key_field)):
+            # Keep the first occurrence, matching the old linear scan
+            self.index.setdefault(key, pos)
+            self._track_max(key)
+    
+    def _track_max(self, key: str):
+        if key.isdigit():
+            self.max_key = max(self.max_key, int(key))
+
+    def is_fresh(self, ttl: int) -> bool:
+        return ttl > 0 and time.time() - self.loaded_at < ttl
+
+    def find(self, id_field: str, id_value) -> Optional[int]:
+        """Return the position of the first record whose id_field matches"""
+        if id_field == self.key_field:
+            return self.index.get(cell_text(id_value))
+        if id_field not in self.table.columns:
+            return None
+        id_value = str(id_value)
+        for i, value in enumerate(self.table.column(id_field)):
+            if value == id_value:
+                return i
+        return None
+
+    def append(self, record: Dict, row: int):
+        self.table.append(record)
+        self.rows.append(row)
+        key = record.get(self.key_field, '')
+        self.index.setdefault(key, len(self.table) - 1)
+        self._track_max(key)
+
+    def patch(self, pos: int, data: Dict):
+        old_key = self.table.value(pos, self.key_field)
+        for header, value in data.items():
+            self.table.set(pos, header, cell_text(value))
+        if self.table.value(pos, self.key_field) != old_key:
+            self._reindex()
+
+    def _pos_holding(self, row: int, id_field: str, id_value) -> Optional[int]:
+        """Position of the record at sheet row ``row``, if it still has the given id"""
+        # Rows stay in ascending order: appends land below the last row
+        pos = bisect.bisect_left(self.rows, row)
+        if pos < len(self.rows) and self.rows[pos] == row \
+                and self.table.value(pos, id_field) == cell_text(id_value):
+            return pos
+        return None
+    
+    def apply(self, op: str, args):
+        """Apply a completed write; does nothing if the snapshot already reflects it
+        
+        ``op`` is 'append' with [[record, row], ...], 'patch' with
+        [[row, id_field, id_value, data], ...] or 'remove' with
+        [row, id_field, id_value]. Checking the row's id before patching or
+        removing makes the operations safe to replay on a snapshot that was
+        read from the sheet after the write.
+        """
+        if op == 'append':
+            existing = set(self.rows)
+            for record, row in args:
+                if row not in existing and any(record.values()):
+                    self.append(record, row)
+        elif op == 'patch':
+            for row, id_field, id_value, data in args:
+                pos = self._pos_holding(row, id_field, id_value)
+                if pos is not None:
+                    self.patch(pos, data)
+        elif op == 'remove':
+            row, id_field, id_value = args
+            pos = self._pos_holding(row, id_field, id_value)
+            if pos is not None:
+                self.remove(pos)
+    
+    def remove(self, pos: int):
+        """Drop a record whose sheet row was deleted; rows below it move up one"""
+        deleted_row = self.rows[pos]
+        self.table.remove(pos)
+        del self.rows[pos]
+        self.rows = [row - 1 if row > deleted_row else row for row in self.rows]
+        self._reindex()
+
+def _row_ranges(row_idx: int, headers: List[str], data: Dict) -> List[Dict]:
+    """Group the changed cells of one row into contiguous A1 ranges for batch_update"""
+    cols = {}
+    for header, value in data.items():
+        if header in headers:
+            cols[headers.index(header) + 1] = value
+    ranges = []
+    for col_idx in sorted(cols):
+        if ranges and ranges[-1]['end'] == col_idx - 1:
+            ranges[-1]['end'] = col_idx
+            ranges[-1]['values'][0].append(cols[col_idx])
+        else:
+            ranges.append({'start': col_idx, 'end': col_idx, 'values': [[cols[col_idx]]]})
+    return [{
+        'range': f"{rowcol_to_a1(row_idx, r['start'])}:{rowcol_to_a1(row_idx, r['end'])}",
+        'values': r['values']
+    } for r in ranges]
+
+def _appended_row(response) -> Optional[int]:
+    """Sheet row number of the first row written by an append call"""
+    try:
+        updated_range = response['updates']['updatedRange']
+        return int(re.search(r'![A-Z$]*?\$?(\d+)', updated_range).group(1))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+def _read_stamp(path: str) -> Optional[str]:
+    """Schema version recorded by the last successful startup check, if any"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError):
+        return None
+
+class GoogleSheetsDB(DatabaseBackend):
     def __init__(self):
         self.config = Config()
         self.client = None
         self.sheet = None
+        # Per-sheet TableSnapshot cache, patched in place by insert/update/delete.
+        # The lock guards the cache and snapshot contents only and is never
+        # held across an API call, so a slow reload or write doesn't stall
+        # readers of sheets that are already cached.
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+        # One reload per sheet at a time; other readers keep the previous copy meanwhile
+        self._load_locks = {}
+        # Raw header row per sheet, so writes don't have to re-read row 1
+        self._headers = {}
+        # Worksheet handle per sheet; fetching one costs a metadata request
+        self._worksheets = {}
+        # Every API call below goes through the quota scheduler
+        self._quota = QuotaScheduler()
         self._connect()
+        self._sequence = IdSequence(self.config.GOOGLE_SHEET_ID)
+        # Copy of the cache shared with the other worker processes
+        self._shared = SharedSnapshotStore(self.config.GOOGLE_SHEET_ID)
     
     def _connect(self):
-        """Connect to Google Sheets"""
-        import time
-        max_retries = 3
-        retry_delay = 10  # seconds
+        """Connect to Google Sheets
         
-        for attempt in range(max_retries):
-            try:
-                scope = [
-                    'https://www.googleapis.com/auth/spreadsheets',
-                    'https://www.googleapis.com/auth/drive'
-                ]
-                creds = Credentials.from_service_account_file(
-                    self.config.GOOGLE_SHEETS_CREDENTIALS,
-                    scopes=scope
-                )
-                self.client = gspread.authorize(creds)
-                if self.config.GOOGLE_SHEET_ID:
-                    self.sheet = self.client.open_by_key(self.config.GOOGLE_SHEET_ID)
-                else:
-                    # Create a new sheet if no ID provided
-                    self.sheet = self.client.create('Teddybuddies Asset Database')
-                    self.config.GOOGLE_SHEET_ID = self.sheet.id
-                self._initialize_sheets()
-                return  # Success, exit the retry loop
-            except Exception as e:
-                error_str = str(e)
-                # Check if it's a rate limit error
-                if '429' in error_str or 'RATE_LIMIT_EXCEEDED' in error_str or 'Quota exceeded' in error_str:
-                    if attempt < max_retries - 1:
-                        print(f"Rate limit exceeded. Waiting {retry_delay} seconds before retry {attempt + 1}/{max_retries}...")
-                        time.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                        continue
-                    else:
-                        print(f"Rate limit exceeded after {max_retries} attempts. Please wait a minute and restart the server.")
-                        raise
-                else:
-                    # Not a rate limit error, raise immediately
-                    print(f"Error connecting to Google Sheets: {e}")
-                    raise
+        Rate-limited calls are retried by the quota scheduler, so any error
+        that reaches here is final.
+        """
+        try:
+            scope = [
+                'https://www.googleapis.com/auth/spreadsheets',
+                'https://www.googleapis.com/auth/drive'
+            ]
+            creds = Credentials.from_service_account_file(
+                self.config.GOOGLE_SHEETS_CREDENTIALS,
+                scopes=scope
+            )
+            self.client = gspread.authorize(creds)
+            if self.config.GOOGLE_SHEET_ID:
+                self.sheet = self._read(self.client.open_by_key, self.config.GOOGLE_SHEET_ID)
+            else:
+                # Create a new sheet if no ID provided
+                self.sheet = self._write(self.client.create, 'Teddybuddies Asset Database')
+                self.config.GOOGLE_SHEET_ID = self.sheet.id
+            self._initialize_sheets()
+        except Exception as e:
+            if is_rate_limited(e):
+                print("Rate limit exceeded. Please wait a minute and restart the server.")
+            else:
+                print(f"Error connecting to Google Sheets: {e}")
+            raise
     
-    def _initialize_sheets(self):
-        """Initialize all required sheets if they don't exist"""
-        sheet_names = ['Users', 'Locations', 'Categories', 'Subcategories', 
-                      'AssetTypes', 'Brands', 'Assets', 'AssetMovements', 'ActivityLogs']
-        
-        for sheet_name in sheet_names:
-            try:
-                worksheet = self.sheet.worksheet(sheet_name)
-                # Ensure headers are up-to-date for existing sheets
-                self._ensure_headers(sheet_name)
-            except gspread.WorksheetNotFound:
-                worksheet = self.sheet.add_worksheet(title=sheet_name, rows=1000, cols=20)
-                self._set_headers(sheet_name)
-    
-    def _set_headers(self, sheet_name: str):
-        """Set headers for each sheet"""
-        worksheet = self.sheet.worksheet(sheet_name)
-        
-        headers = {
-            'Users': ['Username', 'Email', 'Password', 'Role'],
-            'Locations': ['ID', 'Location Name'],
-            'Categories': ['ID', 'Category Name'],
-            'Subcategories': ['ID', 'Subcategory Name', 'Category ID'],
-            'AssetTypes': ['Asset Code', 'Asset Type', 'Depreciation Value (%)'],
-            'Brands': ['ID', 'Brand Name'],
-            'Assets': ['Asset Code', 'Item Name', 'Asset Category', 'Asset SubCategory', 
-                      'Brand', 'Asset Description', 'Amount', 'Location', 
-                      'Date of Purchase', 'Warranty', 'Department', 'Ownership',
-                      'Asset Status', 'Image Attachment', 'Document Attachment'],
-            'AssetMovements': ['ID', 'Asset Code', 'From Location', 'To Location', 
-                              'Movement Date', 'Moved By', 'Notes'],
-            'ActivityLogs': ['ID', 'Date & Time', 'Type', 'User', 'Action', 'Entity Type', 
-                           'Entity ID', 'Description', 'Details']
-        }
-        
-        if sheet_name in headers:
-            worksheet.append_row(headers[sheet_name])
+    def _read(self, func, *args, **kwargs):
+        return self._quota.call('read', func, *args, **kwargs)
     
-    def _ensure_headers(self, sheet_name: str):
-        """Ensure headers exist and are up-to-date for existing sheets"""
-        worksheet = self.sheet.worksheet(sheet_name)
-        
-        expected_headers = {
-            'Users': ['Username', 'Email', 'Password', 'Role'],
-            'Locations': ['ID', 'Location Name'],
-            'Categories': ['ID', 'Category Name'],
-            'Subcategories': ['ID', 'Subcategory Name', 'Category ID'],
-            'AssetTypes': ['Asset Code', 'Asset Type', 'Depreciation Value (%)'],
-            'Brands': ['ID', 'Brand Name'],
-            'Assets': ['Asset Code', 'Item Name', 'Asset Category', 'Asset SubCategory', 
-                      'Brand', 'Asset Description', 'Amount', 'Location', 
-                      'Date of Purchase', 'Warranty', 'Department', 'Ownership',
-                      'Asset Status', 'Image Attachment', 'Document Attachment'],
-            'AssetMovements': ['ID', 'Asset Code', 'From Location', 'To Location', 
-                              'Movement Date', 'Moved By', 'Notes'],
-            'ActivityLogs': ['ID', 'Date & Time', 'Type', 'User', 'Action', 'Entity Type', 
-                           'Entity ID', 'Description', 'Details']
-        }
+    def _write(self, func, *args, **kwargs):
+        return self._quota.call('write', func, *args, **kwargs)
+    
+    def _schema_stamp_path(self) -> str:
+        return data_path('schema', f'{self.sheet.id}.json')
+    
+    def _initialize_sheets(self, force: bool = False):
+        """Create missing sheets and add missing header columns
         
-        if sheet_name not in expected_headers:
+        The check costs one metadata request for the sheet list, one batched
+        read of every header row and at most one batched write for the fixes.
+        Once it passes, a local stamp of SHEET_HEADERS lets later starts skip
+        it entirely until the expected headers change.
+        """
+        version = hashlib.sha1(json.dumps(SHEET_HEADERS, sort_keys=True).encode('utf-8')).hexdigest()
+        stamp_path = self._schema_stamp_path()
+        if not force and _read_stamp(stamp_path) == version:
             return
         
-        # Get current headers
-        try:
-            current_headers = worksheet.row_values(1)
-        except:
-            current_headers = []
-        
-        # If no headers exist, set them
-        if not current_headers:
-            worksheet.append_row(expected_headers[sheet_name])
-            return
+        self._worksheets.update({ws.title: ws for ws in self._read(self.sheet.worksheets)})
+        for sheet_name in SHEET_HEADERS:
+            if sheet_name not in self._worksheets:
+                self._worksheets[sheet_name] = self._write(self.sheet.add_worksheet, title=sheet_name,
+                                                           rows=1000, cols=20)
         
-        # Check if we need to add missing headers
-        missing_headers = []
-        for header in expected_headers[sheet_name]:
-            if header not in current_headers:
-                missing_headers.append(header)
+        sheet_names = list(SHEET_HEADERS)
+        response = self._read(self.sheet.values_batch_get,
+                              [absolute_range_name(name, '1:1') for name in sheet_names])
+        fixes = []
+        for sheet_name, value_range in zip(sheet_names, response.get('valueRanges', [])):
+            rows = value_range.get('values', [])
+            current_headers = rows[0] if rows else []
+            # Add missing headers after the last existing column, or the whole row to an empty sheet
+            missing_headers = [h for h in SHEET_HEADERS[sheet_name] if h not in current_headers]
+            if not missing_headers:
+                self._headers[sheet_name] = current_headers
+                continue
+            start_col = len(current_headers) + 1
+            end_col = start_col + len(missing_headers) - 1
+            worksheet = self._worksheets[sheet_name]
+            if end_col > worksheet.col_count:
+                self._write(worksheet.add_cols, end_col - worksheet.col_count)
+            fixes.append({
+                'range': absolute_range_name(sheet_name, f'{rowcol_to_a1(1, start_col)}:{rowcol_to_a1(1, end_col)}'),
+                'values': [missing_headers]
+            })
+            self._headers[sheet_name] = current_headers + missing_headers
+        if fixes:
+            self._write(self.sheet.values_batch_update, body={'valueInputOption': 'RAW', 'data': fixes})
+        write_atomic(stamp_path, json.dumps({'version': version}).encode('utf-8'))
+    
+    def _worksheet(self, sheet_name: str):
+        """Return the worksheet handle for a sheet, fetching it from the API only once"""
+        worksheet = self._worksheets.get(sheet_name)
+        if worksheet is None:
+            # One metadata request returns the handles of every sheet
+            self._worksheets.update({ws.title: ws for ws in self._read(self.sheet.worksheets)})
+            worksheet = self._worksheets.get(sheet_name)
+        if worksheet is None:
+            if sheet_name not in SHEET_HEADERS:
+                raise gspread.WorksheetNotFound(sheet_name)
+            # The sheet was removed after the schema stamp was written
+            self._initialize_sheets(force=True)
+            worksheet = self._worksheets[sheet_name]
+        return worksheet
+    
+    def _forget_schema(self, sheet_name: str):
+        """Drop everything cached about a sheet after a failed call
         
-        # Add missing headers
-        if missing_headers:
-            # Get the last column index
-            last_col = len(current_headers)
-            # Add new headers starting from the next column
-            start_col = last_col + 1
-            for i, header in enumerate(missing_headers):
-                col_idx = start_col + i
-                worksheet.update_cell(1, col_idx, header)
+        The sheet may have been renamed, recreated or had its columns moved,
+        so the next call fetches a fresh handle, header row and snapshot.
+        """
+        self._worksheets.pop(sheet_name, None)
+        self._headers.pop(sheet_name, None)
+        self.invalidate(sheet_name)
     
-    def get_all(self, sheet_name: str) -> List[Dict]:
-        """Get all records from a sheet"""
+    def _load_snapshot(self, sheet_name: str) -> Optional[TableSnapshot]:
+        """Fetch a sheet from the API and parse it into a TableSnapshot"""
         try:
-            worksheet = self.sheet.worksheet(sheet_name)
+            worksheet = self._worksheet(sheet_name)
             # Get all values including empty rows
-            all_values = worksheet.get_all_values()
-            
-            if not all_values or len(all_values) < 2:
-                # No headers or no data rows
-                return []
-            
-            # Get headers from first row
-            headers = [str(h).strip() for h in all_values[0]]
-            
-            # Process data rows
-            records = []
-            for row in all_values[1:]:
-                # Skip completely empty rows
-                if not any(row):
-                    continue
-                
-                # Create a dictionary for this row
-                record = {}
-                for i, header in enumerate(headers):
-                    # Get value from row, or empty string if index is out of range
-                    value = row[i] if i < len(row) else ''
-                    record[header] = value.strip() if value else ''
-                
-                # Only add records that have at least one non-empty value
-                if any(record.values()):
-                    records.append(record)
-            
-            return records
+            all_values = self._read(worksheet.get_all_values)
         except Exception as e:
+            self._worksheets.pop(sheet_name, None)
             print(f"Error getting records from {sheet_name}: {e}")
             import traceback
             traceback.print_exc()
+            return None
+        return self._parse_snapshot(sheet_name, all_values)
+    
+    def _parse_snapshot(self, sheet_name: str, all_values: List[List[str]]) -> TableSnapshot:
+        """Turn the raw cell values of a sheet, starting at row 1, into a TableSnapshot"""
+        key_field = key_field_for(sheet_name)
+        if not all_values:
+            return TableSnapshot([], ColumnTable([]), [], key_field)
+        # Every reload refreshes the header row, so column changes made in the sheet are picked up
+        self._headers[sheet_name] = list(all_values[0])
+        
+        # Get headers from first row
+        headers = [str(h).strip() for h in all_values[0]]
+        width = len(headers)
+        
+        # Keep the data rows with at least one non-empty value, remembering
+        # the sheet row each record came from
+        values = []
+        rows = []
+        for row_number, row in enumerate(all_values[1:], start=2):
+            if any(value.strip() for value in row[:width] if value):
+                values.append(row)
+                rows.append(row_number)
+        
+        return TableSnapshot(headers, ColumnTable.from_values(headers, values), rows, key_field)
+    
+    def _cached(self, sheet_name: str) -> Optional[TableSnapshot]:
+        """Cached snapshot of a sheet, caught up with writes made by other workers
+        
+        Call with ``_cache_lock`` held.
+        """
+        snapshot = self._shared.refresh(sheet_name, self._cache.get(sheet_name))
+        if snapshot is None:
+            self._cache.pop(sheet_name, None)
+        else:
+            self._cache[sheet_name] = snapshot
+        return snapshot
+    
+    def _get_snapshot(self, sheet_name: str) -> Optional[TableSnapshot]:
+        """Return the cached snapshot for a sheet, reloading it once the TTL expires"""
+        requested_at = time.time()
+        with self._cache_lock:
+            snapshot = self._cached(sheet_name)
+            load_lock = self._load_locks.setdefault(sheet_name, threading.Lock())
+        if snapshot is not None and snapshot.is_fresh(self.config.CACHE_TTL):
+            return snapshot
+        if snapshot is not None and not load_lock.acquire(blocking=False):
+            # Another thread is already reloading this sheet
+            return snapshot
+        if snapshot is None:
+            load_lock.acquire()
+        try:
+            return self._store_snapshot(sheet_name, lambda: self._load_snapshot(sheet_name), requested_at)
+        finally:
+            load_lock.release()
+    
+    def _store_snapshot(self, sheet_name: str, load, requested_at: float) -> Optional[TableSnapshot]:
+        """Run ``load`` outside the cache lock, then cache and share the snapshot it returns
+        
+        Only one worker process reads a sheet at a time; the others wait and
+        take its copy, as long as it was read after ``requested_at``.
+        """
+        with self._shared.loading(sheet_name):
+            with self._cache_lock:
+                current = self._cached(sheet_name)
+                since = self._shared.marker(sheet_name)
+            if current is not None and current.loaded_at >= requested_at:
+                return current
+            snapshot = load()
+            if snapshot is None:
+                return None
+            with self._shared.lock(sheet_name):
+                with self._cache_lock:
+                    self._shared.publish(sheet_name, snapshot, since)
+                    self._cache[sheet_name] = snapshot
+            return snapshot
+    
+    def _apply_write(self, sheet_name: str, op: str, args):
+        """Patch the cached snapshot with a completed write and journal it for the other workers"""
+        with self._shared.lock(sheet_name):
+            with self._cache_lock:
+                snapshot = self._cached(sheet_name)
+                if snapshot is not None:
+                    snapshot.apply(op, args)
+                self._shared.append(sheet_name, op, args)
+    
+    def invalidate(self, sheet_name: Optional[str] = None):
+        """Drop the cached snapshot for one sheet, or for all sheets, in every worker"""
+        with self._cache_lock:
+            sheet_names = [sheet_name] if sheet_name else list(set(SHEET_HEADERS) | set(self._cache))
+        for name in sheet_names:
+            with self._shared.lock(name):
+                with self._cache_lock:
+                    self._shared.invalidate(name)
+                    self._cache.pop(name, None)
+    
+    def get_all(self, sheet_name: str) -> List[Dict]:
+        """Get all records from a sheet"""
+        snapshot = self._get_snapshot(sheet_name)
+        if snapshot is None:
             return []
+        with self._cache_lock:
+            # Callers annotate the records they get back; keys set on a row
+            # view stay on the view, so the cache is never touched
+            return snapshot.table.rows()
+    
+    def get_many(self, sheet_names: List[str], strict: bool = False) -> Dict[str, List[Dict]]:
+        """Get all records of several sheets, fetching the stale ones in one request
+        
+        With ``strict`` a failed request raises instead of falling back to
+        per-sheet reads, which return [] on error.
+        """
+        self._load_many(sheet_names, strict)
+        return {name: self.get_all(name) for name in sheet_names}
+    
+    def get_table(self, sheet_name: str) -> ColumnTable:
+        snapshot = self._get_snapshot(sheet_name)
+        if snapshot is None:
+            return ColumnTable(SHEET_HEADERS.get(sheet_name, []))
+        with self._cache_lock:
+            return snapshot.table.frozen()
+    
+    def get_tables(self, sheet_names: List[str]) -> Dict[str, ColumnTable]:
+        self._load_many(sheet_names)
+        return {name: self.get_table(name) for name in sheet_names}
+    
+    def _load_many(self, sheet_names: List[str], strict: bool = False):
+        """Read the sheets whose cached copy is stale in one request"""
+        stale = []
+        markers = {}
+        with self._cache_lock:
+            for name in sheet_names:
+                snapshot = self._cached(name)
+                if snapshot is None or not snapshot.is_fresh(self.config.CACHE_TTL):
+                    stale.append(name)
+                    markers[name] = self._shared.marker(name)
+        if stale:
+            try:
+                response = self._read(self.sheet.values_batch_get,
+                                      [absolute_range_name(name) for name in stale])
+                for name, value_range in zip(stale, response.get('valueRanges', [])):
+                    snapshot = self._parse_snapshot(name, value_range.get('values', []))
+                    with self._shared.lock(name):
+                        with self._cache_lock:
+                            self._shared.publish(name, snapshot, markers[name])
+                            self._cache[name] = snapshot
+            except Exception as e:
+                if strict:
+                    raise
+                # Fall back to one request per sheet when the records are read
+                print(f"Error getting records from {', '.join(stale)}: {e}")
     
     def get_by_id(self, sheet_name: str, id_field: str, id_value: str) -> Optional[Dict]:
         """Get a record by ID"""
-        records = self.get_all(sheet_name)
-        for record in records:
-            if str(record.get(id_field)) == str(id_value):
-                return record
-        return None
+        snapshot = self._get_snapshot(sheet_name)
+        if snapshot is None:
+            return None
+        with self._cache_lock:
+            pos = snapshot.find(id_field, id_value)
+            return dict(snapshot.table.row(pos)) if pos is not None else None
+    
+    def _get_headers(self, sheet_name: str, worksheet=None) -> List[str]:
+        """Return the header row of a sheet, reading it from the API only once"""
+        headers = self._headers.get(sheet_name)
+        if not headers:
+            # A snapshot taken over from another worker carries the header row too
+            with self._cache_lock:
+                snapshot = self._cached(sheet_name)
+                headers = list(snapshot.headers) if snapshot is not None else []
+        if not headers:
+            worksheet = worksheet or self._worksheet(sheet_name)
+            headers = self._read(worksheet.row_values, 1)
+            if headers:
+                self._headers[sheet_name] = headers
+        return headers
     
     def insert(self, sheet_name: str, data: Dict) -> bool:
         """Insert a new record"""
         try:
-            worksheet = self.sheet.worksheet(sheet_name)
-            headers = worksheet.row_values(1)
+            worksheet = self._worksheet(sheet_name)
+            headers = self._get_headers(sheet_name, worksheet)
             row = [data.get(header, '') for header in headers]
-            worksheet.append_row(row)
-            return True
+            response = self._write(worksheet.append_row, row)
         except Exception as e:
             print(f"Error inserting record into {sheet_name}: {e}")
+            self._forget_schema(sheet_name)
             return False
+        
+        # Patch the cached snapshot so the next read sees the new row
+        record = {str(h).strip(): cell_text(v) for h, v in zip(headers, row)}
+        row_number = _appended_row(response)
+        if row_number is None:
+            self.invalidate(sheet_name)
+        else:
+            self._apply_write(sheet_name, 'append', [[record, row_number]])
+        return True
     
-    def update(self, sheet_name: str, id_field: str, id_value: str, data: Dict) -> bool:
-        """Update a record"""
+    def insert_many(self, sheet_name: str, records: List[Dict], chunk_size: int = 500,
+                    max_retries: int = 3) -> List[Dict]:
+        """Insert many records with one append_rows call per chunk
+        
+        A chunk that fails with an error other than a rate limit (which the
+        quota scheduler retries) is sent again up to ``max_retries`` times.
+        Returns one report per chunk with keys ``chunk``, ``rows``,
+        ``success``, ``attempts`` and ``error``.
+        """
+        results = []
         try:
-            worksheet = self.sheet.worksheet(sheet_name)
-            records = worksheet.get_all_values()
-            headers = records[0] if records else []
-            
-            # Find the row index
-            row_idx = None
-            id_col_idx = headers.index(id_field) if id_field in headers else None
-            
-            if id_col_idx is None:
-                return False
-            
-            for i, row in enumerate(records[1:], start=2):
-                if len(row) > id_col_idx and str(row[id_col_idx]) == str(id_value):
-                    row_idx = i
+            worksheet = self._worksheet(sheet_name)
+            headers = self._get_headers(sheet_name, worksheet)
+        except Exception as e:
+            print(f"Error inserting records into {sheet_name}: {e}")
+            self._forget_schema(sheet_name)
+            return results
+        
+        for chunk_no, start in enumerate(range(0, len(records), chunk_size), start=1):
+            rows = [[data.get(header, '') for header in headers]
+                    for data in records[start:start + chunk_size]]
+            report = {'chunk': chunk_no, 'rows': len(rows), 'success': False,
+                      'attempts': 0, 'error': ''}
+            response = None
+            for attempt in range(1, max_retries + 1):
+                report['attempts'] = attempt
+                try:
+                    response = self._write(worksheet.append_rows, rows)
+                    report['success'] = True
+                    report['error'] = ''
                     break
+                except Exception as e:
+                    report['error'] = str(e)
+                    print(f"Error inserting chunk {chunk_no} into {sheet_name} "
+                          f"(attempt {attempt}/{max_retries}): {e}")
+                    if is_rate_limited(e):
+                        # The quota scheduler has already backed off and retried
+                        break
+            results.append(report)
+            if not report['success']:
+                self._forget_schema(sheet_name)
             
-            if row_idx is None:
+            first_row = _appended_row(response) if report['success'] else None
+            if first_row is None:
+                self.invalidate(sheet_name)
+                continue
+            self._apply_write(sheet_name, 'append', [
+                [{str(h).strip(): cell_text(v) for h, v in zip(headers, row)}, first_row + offset]
+                for offset, row in enumerate(rows)])
+        
+        return results
+    
+    def _locate(self, sheet_name: str, id_field: str,
+                id_values: List[str]) -> Tuple[Optional[TableSnapshot], Dict[str, int]]:
+        """Find the current sheet row of each id value before writing to it
+        
+        Cached row numbers go stale when another worker, the Streamlit app or
+        a person deletes rows, so the id cells of the target rows are read
+        back first. If any of them moved, the sheet is re-read and the rows
+        are looked up again. Ids that are not found are left out.
+        """
+        snapshot = self._get_snapshot(sheet_name)
+        if snapshot is None or id_field not in snapshot.headers:
+            return None, {}
+        rows = self._find_rows(snapshot, id_field, id_values)
+        if not rows or self._rows_hold(sheet_name, snapshot, id_field, rows):
+            return snapshot, rows
+        snapshot = self._store_snapshot(sheet_name, lambda: self._load_snapshot(sheet_name), time.time())
+        if snapshot is None or id_field not in snapshot.headers:
+            return None, {}
+        return snapshot, self._find_rows(snapshot, id_field, id_values)
+    
+    def _find_rows(self, snapshot: TableSnapshot, id_field: str, id_values: List[str]) -> Dict[str, int]:
+        rows = {}
+        with self._cache_lock:
+            for id_value in id_values:
+                pos = snapshot.find(id_field, id_value)
+                if pos is not None:
+                    rows[id_value] = snapshot.rows[pos]
+        return rows
+    
+    def _rows_hold(self, sheet_name: str, snapshot: TableSnapshot, id_field: str,
+                   rows: Dict[str, int]) -> bool:
+        """Whether each row still holds its id value in the sheet (one batched read)"""
+        col = snapshot.headers.index(id_field) + 1
+        try:
+            response = self._read(self.sheet.values_batch_get,
+                                  [absolute_range_name(sheet_name, rowcol_to_a1(row, col))
+                                   for row in rows.values()])
+        except Exception as e:
+            print(f"Error checking rows in {sheet_name}: {e}")
+            return False
+        value_ranges = response.get('valueRanges', [])
+        if len(value_ranges) != len(rows):
+            return False
+        for id_value, value_range in zip(rows, value_ranges):
+            values = value_range.get('values') or [[]]
+            if cell_text(values[0][0] if values[0] else '') != cell_text(id_value):
                 return False
-            
-            # Update the row
-            for header, value in data.items():
-                if header in headers:
-                    col_idx = headers.index(header) + 1
-                    worksheet.update_cell(row_idx, col_idx, value)
-            
-            return True
+        return True
+    
+    def update(self, sheet_name: str, id_field: str, id_value: str, data: Dict) -> bool:
+        """Update a record"""
+        snapshot, rows = self._locate(sheet_name, id_field, [id_value])
+        if not rows:
+            return False
+        row_number = rows[id_value]
+        
+        try:
+            worksheet = self._worksheet(sheet_name)
+            # Send every changed cell of the row in a single request
+            ranges = _row_ranges(row_number, snapshot.headers, data)
+            if ranges:
+                self._write(worksheet.batch_update, ranges, value_input_option='USER_ENTERED')
         except Exception as e:
             print(f"Error updating record in {sheet_name}: {e}")
+            self._forget_schema(sheet_name)
             return False
+        
+        self._apply_write(sheet_name, 'patch', [[row_number, id_field, id_value, data]])
+        return True
+    
+    def update_many(self, sheet_name: str, id_field: str, updates: Dict[str, Dict]) -> int:
+        """Update several records in one request
+        
+        ``updates`` maps each id value to the columns to change for that record.
+        Ids that are not found are skipped. Returns the number of records updated.
+        """
+        snapshot, rows = self._locate(sheet_name, id_field, list(updates))
+        if not rows:
+            return 0
+        
+        matched = [[row_number, id_field, id_value, updates[id_value]] for id_value, row_number in rows.items()]
+        ranges = []
+        for row_number, _, _, data in matched:
+            ranges.extend(_row_ranges(row_number, snapshot.headers, data))
+        
+        if ranges:
+            try:
+                worksheet = self._worksheet(sheet_name)
+                self._write(worksheet.batch_update, ranges, value_input_option='USER_ENTERED')
+            except Exception as e:
+                print(f"Error updating records in {sheet_name}: {e}")
+                self._forget_schema(sheet_name)
+                return 0
+        
+        self._apply_write(sheet_name, 'patch', matched)
+        return len(matched)
     
     def delete(self, sheet_name: str, id_field: str, id_value: str) -> bool:
         """Delete a record"""
-        try:
-            worksheet = self.sheet.worksheet(sheet_name)
-            records = worksheet.get_all_values()
-            headers = records[0] if records else []
-            
-            id_col_idx = headers.index(id_field) if id_field in headers else None
-            if id_col_idx is None:
-                return False
-            
-            row_idx = None
-            for i, row in enumerate(records[1:], start=2):
-                if len(row) > id_col_idx and str(row[id_col_idx]) == str(id_value):
-                    row_idx = i
-                    break
-            
-            if row_idx:
-                worksheet.delete_rows(row_idx)
-                return True
+        snapshot, rows = self._locate(sheet_name, id_field, [id_value])
+        if not rows:
             return False
+        row_number = rows[id_value]
+        
+        try:
+            worksheet = self._worksheet(sheet_name)
+            self._write(worksheet.delete_rows, row_number)
         except Exception as e:
             print(f"Error deleting record from {sheet_name}: {e}")
+            self._forget_schema(sheet_name)
             return False
+        
+        self._apply_write(sheet_name, 'remove', [row_number, id_field, id_value])
+        return True
+    
+    def get_modified_time(self) -> Optional[str]:
+        """Drive modifiedTime of the spreadsheet; changes on any edit to any sheet"""
+        response = self._read(self.client.request, 'get', f'{DRIVE_FILES_URL}/{self.sheet.id}',
+                              params={'fields': 'modifiedTime', 'supportsAllDrives': True})
+        return response.json().get('modifiedTime')
     
     def get_next_id(self, sheet_name: str, id_field: str = 'ID') -> int:
-        """Get the next available ID"""
-        records = self.get_all(sheet_name)
-        if not records:
-            return 1
-        ids = [int(record.get(id_field, 0)) for record in records if record.get(id_field)]
-        return max(ids) + 1 if ids else 1
-    
-    def generate_asset_code(self, asset_type: str) -> str:
-        """Generate asset code based on asset type"""
-        records = self.get_all('Assets')
-        # Count existing assets of this type
-        type_count = sum(1 for r in records if r.get('Asset Type', '') == asset_type)
-        # Format: TYPE-001, TYPE-002, etc.
-        return f"{asset_type.upper().replace(' ', '')[:4]}-{str(type_count + 1).zfill(4)}"
-
+        """Get the next available ID
+        
+        IDs come from a persistent per-sheet sequence, so the sheet is only
+        scanned once to seed it rather than on every insert.
+        """
+        def seed():
+            snapshot = self._get_snapshot(sheet_name)
+            if snapshot is None:
+                raise RuntimeError(f"Could not read {sheet_name} to seed its ID sequence")
+            with self._cache_lock:
+                if id_field == snapshot.key_field:
+                    return snapshot.max_key
+                ids = [int(value) for value in snapshot.table.column(id_field) if value.isdigit()]
+            return max(ids, default=0)
+        
+        floor = None
+        with self._cache_lock:
+            snapshot = self._cached(sheet_name)
+            if snapshot is not None and id_field == snapshot.key_field:
+                floor = snapshot.max_key
+        return self._sequence.next_id(f'{sheet_name}:{id_field}', seed, floor)
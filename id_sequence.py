@@ -0,0 +1,42 @@
+"""Per-sheet ID sequences persisted on local disk"""
+import json
+import os
+from typing import Callable, Optional
+from local_store import data_path, file_lock, write_atomic
+
+class IdSequence:
+    """Hands out increasing IDs for each sheet without reading the sheet
+    
+    The last issued ID per sheet is kept in a small JSON file guarded by a
+    file lock, so every gunicorn worker on the host draws from the same
+    sequence. A sheet is seeded from its largest existing ID the first time
+    an ID is requested for it.
+    """
+    def __init__(self, spreadsheet_id: str):
+        self.path = data_path('sequences', f'{spreadsheet_id}.json')
+        self.lock_path = f'{self.path}.lock'
+    
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def next_id(self, key: str, seed: Callable[[], int], floor: Optional[int] = None) -> int:
+        """Allocate the next ID for ``key``
+        
+        ``seed`` returns the largest ID currently in the sheet and is only
+        called when the sequence has no entry yet. ``floor``, when given, is
+        the largest ID this process has seen, so rows added by other clients
+        can never be handed out again.
+        """
+        with file_lock(self.lock_path):
+            state = self._read()
+            last = state.get(key)
+            if last is None:
+                last = seed()
+            if floor is not None:
+                last = max(last, floor)
+            state[key] = last + 1
+            write_atomic(self.path, json.dumps(state, indent=2).encode('utf-8'))
+            return state[key]
@@ -0,0 +1,56 @@
+"""Helpers for state kept on local disk next to the app (sequences, journals, caches)"""
+import os
+import threading
+from contextlib import contextmanager
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+def data_path(*parts: str) -> str:
+    """Path inside Config.LOCAL_DATA_DIR, creating the parent directory if needed"""
+    path = os.path.join(Config.LOCAL_DATA_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock held across threads and, where fcntl exists, across processes"""
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        with open(path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def write_atomic(path: str, data: bytes):
+    """Replace a file in one step so readers never see a partial write"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this id is running on the host"""
+    if os.name == 'nt':
+        # os.kill would terminate the process on Windows
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
@@ -1,9 +1,14 @@
 """Activity Logs page for Streamlit"""
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl import Workbook
 from datetime import datetime
+from export_jobs import DONE, FAILED, ExportJobs
+from xlsx_export import XLSX_MIMETYPE, write_xlsx
+
+# Exports are built in the background; seconds the page waits for one before asking to retry
+EXPORT_WAIT = 60
+
+export_jobs = ExportJobs()
 
 def show(db, role):
     """Display activity logs page"""
@@ -85,32 +90,31 @@ def show(db, role):
         
         # Export button
         if st.button("📥 Export to Excel"):
-            excel_buffer = create_excel_export(filtered_logs)
-            st.download_button(
-                label="Download Excel File",
-                data=excel_buffer,
-                file_name=f"activity_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            job_id = create_excel_export(filtered_logs, {'type': type_filter, 'user': user_filter, 'date_from': str(date_from or ''), 'date_to': str(date_to or '')})
+            with st.spinner("Preparing export..."):
+                job = export_jobs.wait(job_id, timeout=EXPORT_WAIT)
+            if job and job['status'] == DONE:
+                with open(export_jobs.path(job_id), 'rb') as f:
+                    st.download_button(
+                        label="Download Excel File",
+                        data=f.read(),
+                        file_name=job['filename'],
+                        mime=job['mimetype']
+                    )
+            elif job and job['status'] == FAILED:
+                st.error(f"Export failed: {job['error']}")
+            else:
+                st.info("The export is still being prepared. Click Export again in a moment to download it.")
     else:
         st.info("No log entries found.")
 
-def create_excel_export(logs):
-    """Create Excel export"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Activity Logs"
+def create_excel_export(logs, params):
+    """Queue an Excel export of the logs shown with these filters; returns the job id"""
+    headers = list(logs[0].keys()) if logs else []
     
-    if logs:
-        headers = list(logs[0].keys())
-        ws.append(headers)
-        
-        for log in logs:
-            row = [log.get(header, '') for header in headers]
-            ws.append(row)
+    def build(path):
+        rows = ([log.get(header, '') for header in headers] for log in logs)
+        write_xlsx(path, "Activity Logs", headers, rows)
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
-
+    filename = f"activity_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return export_jobs.submit('streamlit_activity_logs', params, build, filename, XLSX_MIMETYPE)
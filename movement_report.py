@@ -1,9 +1,18 @@
 """Movement Report page for Streamlit"""
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl import Workbook
 from datetime import datetime
+from column_table import ColumnTable
+from db_backend import SHEET_HEADERS
+from export_jobs import DONE, FAILED, ExportJobs
+from movement_store import MovementStore
+from xlsx_export import XLSX_MIMETYPE, write_xlsx
+
+# Exports are built in the background; seconds the page waits for one before asking to retry
+EXPORT_WAIT = 60
+
+export_jobs = ExportJobs()
+movement_store = MovementStore()
 
 def show(db, role):
     """Display movement report page"""
@@ -20,16 +29,14 @@ def show(db, role):
         
         user_filter = st.text_input("User", placeholder="Filter by user...")
     
-    # Get movements
-    movements = db.get_all('AssetMovements')
-    
-    # Filter
-    if date_from:
-        movements = [m for m in movements if m.get('Movement Date', '') >= date_from.strftime('%Y-%m-%d')]
-    if date_to:
-        movements = [m for m in movements if m.get('Movement Date', '') <= date_to.strftime('%Y-%m-%d')]
+    # Get movements in the date range, newest first
+    table = ColumnTable.from_records(db.get_all('AssetMovements'), SHEET_HEADERS['AssetMovements'])
+    positions = movement_store.query(table, date_from=date_from.strftime('%Y-%m-%d') if date_from else '',
+                                     date_to=date_to.strftime('%Y-%m-%d') if date_to else '')
     if user_filter:
-        movements = [m for m in movements if user_filter.lower() in m.get('Moved By', '').lower()]
+        movers = table.column('Moved By')
+        positions = [pos for pos in positions if user_filter.lower() in movers[pos].lower()]
+    movements = [table.row(pos).copy() for pos in positions]
     
     # Summary
     st.metric("Total Movements", len(movements))
@@ -41,32 +48,31 @@ def show(db, role):
         
         # Export button
         if st.button("📥 Export to Excel"):
-            excel_buffer = create_excel_export(movements)
-            st.download_button(
-                label="Download Excel File",
-                data=excel_buffer,
-                file_name=f"movement_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            )
+            job_id = create_excel_export(movements, {'date_from': str(date_from or ''), 'date_to': str(date_to or ''), 'user': user_filter})
+            with st.spinner("Preparing export..."):
+                job = export_jobs.wait(job_id, timeout=EXPORT_WAIT)
+            if job and job['status'] == DONE:
+                with open(export_jobs.path(job_id), 'rb') as f:
+                    st.download_button(
+                        label="Download Excel File",
+                        data=f.read(),
+                        file_name=job['filename'],
+                        mime=job['mimetype']
+                    )
+            elif job and job['status'] == FAILED:
+                st.error(f"Export failed: {job['error']}")
+            else:
+                st.info("The export is still being prepared. Click Export again in a moment to download it.")
     else:
         st.info("No movements found matching the filters.")
 
-def create_excel_export(movements):
-    """Create Excel export"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Movement Report"
+def create_excel_export(movements, params):
+    """Queue an Excel export of the movements shown with these filters; returns the job id"""
+    headers = list(movements[0].keys()) if movements else []
     
-    if movements:
-        headers = list(movements[0].keys())
-        ws.append(headers)
-        
-        for movement in movements:
-            row = [movement.get(header, '') for header in headers]
-            ws.append(row)
+    def build(path):
+        rows = ([movement.get(header, '') for header in headers] for movement in movements)
+        write_xlsx(path, "Movement Report", headers, rows)
     
-    output = BytesIO()
-    wb.save(output)
-    output.seek(0)
-    return output
-
+    filename = f"movement_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+    return export_jobs.submit('streamlit_movement_report', params, build, filename, XLSX_MIMETYPE)
@@ -0,0 +1,147 @@
+"""AssetMovements kept in date order, with indexes for the movement reports"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, List, Optional, Tuple
+from column_table import ColumnTable
+
+# Columns movements are filtered on by equality
+INDEXED_COLUMNS = ['Asset Code', 'From Location', 'To Location', 'Moved By']
+
+# Columns the store keeps a copy of, to notice changes and to filter on
+STORED_COLUMNS = ['Movement Date', 'ID'] + INDEXED_COLUMNS
+
+# A movement's place in the log: (Movement Date, ID, row position)
+Key = Tuple[str, str, int]
+
+def _date(key: Key) -> str:
+    return key[0]
+
+def end_of_day(timestamp: str) -> str:
+    """A bare YYYY-MM-DD date as its last second, so it covers that day's movements"""
+    return f'{timestamp} 23:59:59' if len(timestamp) == 10 else timestamp
+
+class MovementStore:
+    """The movements of an AssetMovements table sorted by Movement Date, then ID
+
+    Besides the full log, each value of the INDEXED_COLUMNS keeps its own
+    sorted list of movements, so a query bisects the shortest list that
+    applies to its date range and reads only the movements in it, newest
+    first without sorting. Dates compare as text, as Movement Date is
+    written (YYYY-MM-DD HH:MM:SS).
+
+    Each asset's list is its timeline, which ``location_at`` bisects to find
+    where the asset was at a moment; ``locations_as_of`` answers that for
+    every asset at once in one pass over the log.
+
+    ``sync`` follows a table through its versions. As AssetMovements only
+    grows, a table that kept every indexed row and added some at the end is
+    merged in row by row; any other change rebuilds the store.
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._columns: Dict[str, List[str]] = {}
+        self._log: List[Key] = []
+        self._by: Dict[str, Dict[str, List[Key]]] = {header: {} for header in INDEXED_COLUMNS}
+
+    def sync(self, table: ColumnTable):
+        """Bring the store up to date with ``table``"""
+        with self._lock:
+            if table.version == self._version:
+                return
+            count = len(self._log)
+            appended = count <= len(table) and all(
+                table.column(header)[:count] == self._columns.get(header, [])
+                for header in STORED_COLUMNS)
+            if not appended:
+                self._log = []
+                self._by = {header: {} for header in INDEXED_COLUMNS}
+                count = 0
+            self._columns = {header: list(table.column(header)) for header in STORED_COLUMNS}
+            dates, ids = self._columns['Movement Date'], self._columns['ID']
+            new_keys = [(dates[pos], ids[pos], pos) for pos in range(count, len(table))]
+            if count == 0:
+                self._log = sorted(new_keys)
+                for header in INDEXED_COLUMNS:
+                    values, lists = self._columns[header], self._by[header]
+                    for key in self._log:
+                        lists.setdefault(values[key[2]], []).append(key)
+            else:
+                # Usually the newest movements, so each lands at the end of its list
+                for key in new_keys:
+                    insort(self._log, key)
+                    for header in INDEXED_COLUMNS:
+                        insort(self._by[header].setdefault(self._columns[header][key[2]], []), key)
+            self._version = table.version
+
+    def query(self, table: ColumnTable, filters: Optional[Dict[str, str]] = None,
+              date_from: str = '', date_to: str = '', newest_first: bool = True) -> List[int]:
+        """Positions in ``table`` of the movements matching every filter, in date order
+
+        ``filters`` maps INDEXED_COLUMNS to the value they must equal (empty
+        values are ignored); ``date_from`` and ``date_to`` bound Movement Date,
+        inclusive.
+        """
+        with self._lock:
+            self.sync(table)
+            filters = {header: value for header, value in (filters or {}).items() if value}
+            candidates = [self._by[header].get(value, []) for header, value in filters.items()]
+            keys = min(candidates, key=len) if candidates else self._log
+            start = bisect_left(keys, date_from, key=_date) if date_from else 0
+            end = bisect_right(keys, date_to, key=_date) if date_to else len(keys)
+            positions = [key[2] for key in keys[start:end]]
+            columns = [(self._columns[header], value) for header, value in filters.items()]
+        if len(columns) > 1:
+            positions = [pos for pos in positions if all(column[pos] == value for column, value in columns)]
+        if newest_first:
+            positions.reverse()
+        return positions
+
+    def values(self, table: ColumnTable, header: str) -> List[str]:
+        """Sorted non-empty values of one of the INDEXED_COLUMNS"""
+        with self._lock:
+            self.sync(table)
+            return sorted(value for value in self._by[header] if value)
+
+    def timeline(self, table: ColumnTable, asset_code: str) -> List[int]:
+        """Positions in ``table`` of one asset's movements, oldest first"""
+        with self._lock:
+            self.sync(table)
+            return [key[2] for key in self._by['Asset Code'].get(asset_code, [])]
+
+    def location_at(self, table: ColumnTable, asset_code: str, timestamp: str) -> Optional[str]:
+        """Where an asset was at ``timestamp``, by its movements; None if it has none
+
+        That is the To Location of its last movement at or before
+        ``timestamp``, or the From Location of its first movement if they are
+        all later.
+        """
+        with self._lock:
+            self.sync(table)
+            keys = self._by['Asset Code'].get(asset_code)
+            if not keys:
+                return None
+            before = bisect_right(keys, timestamp, key=_date)
+            if before:
+                return self._columns['To Location'][keys[before - 1][2]]
+            return self._columns['From Location'][keys[0][2]]
+
+    def locations_as_of(self, table: ColumnTable, timestamp: str) -> Dict[str, Tuple[str, Optional[int]]]:
+        """location_at for every asset with movements, replaying the log once
+
+        Maps each Asset Code to its location and the position of the movement
+        that took it there, which is None for assets that were still where
+        their first, later, movement took them from.
+        """
+        with self._lock:
+            self.sync(table)
+            codes = self._columns['Asset Code']
+            to_locations, from_locations = self._columns['To Location'], self._columns['From Location']
+            end = bisect_right(self._log, timestamp, key=_date)
+            locations = {}
+            for _, _, pos in self._log[:end]:
+                locations[codes[pos]] = (to_locations[pos], pos)
+            for _, _, pos in self._log[end:]:
+                if codes[pos] not in locations:
+                    locations[codes[pos]] = (from_locations[pos], None)
+            return locations
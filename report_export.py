@@ -0,0 +1,85 @@
+"""Report exports as XLSX, CSV or Parquet from one column-by-column description"""
+import csv
+import io
+import itertools
+from typing import Dict, Iterator, List, Optional, Sequence
+import numpy as np
+from openpyxl.styles import Alignment
+from xlsx_export import XLSX_MIMETYPE, write_xlsx
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Mimetype of each export format, by the format's file extension
+FORMATS = {
+    'xlsx': XLSX_MIMETYPE,
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+# Rows formatted per chunk of a streamed CSV
+CSV_BATCH_ROWS = 1000
+
+class Report:
+    """The rows of an export, held column by column
+
+    ``columns`` hold the cell values under each header as written to XLSX
+    and CSV. ``typed`` maps some headers to a NumPy array (float64 or
+    datetime64, NaN and NaT for blanks) that replaces the column in Parquet;
+    the other Parquet columns are strings. ``footer`` is a totals row and is
+    only written to XLSX.
+    """
+    def __init__(self, title: str, headers: List[str], columns: List[Sequence],
+                 typed: Optional[Dict[str, np.ndarray]] = None, footer: Optional[List] = None,
+                 alignment: Optional[Alignment] = None):
+        self.title = title
+        self.headers = headers
+        self.columns = columns
+        self.typed = typed or {}
+        self.footer = footer
+        self.alignment = alignment
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def rows(self) -> Iterator[tuple]:
+        return zip(*self.columns)
+
+def csv_chunks(report: Report) -> Iterator[str]:
+    """CSV text of a report, in chunks of CSV_BATCH_ROWS rows after the header"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(report.headers)
+    rows = report.rows()
+    while True:
+        batch = list(itertools.islice(rows, CSV_BATCH_ROWS))
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        if len(batch) < CSV_BATCH_ROWS:
+            break
+        buffer.seek(0)
+        buffer.truncate()
+
+def write_parquet(path: str, report: Report):
+    """Write a report to a Parquet file, with its typed columns kept as numbers and dates"""
+    arrays = []
+    for header, column in zip(report.headers, report.columns):
+        typed = report.typed.get(header)
+        if typed is not None:
+            # from_pandas turns NaN and NaT into nulls
+            arrays.append(pa.array(typed, from_pandas=True))
+        else:
+            arrays.append(pa.array([value if isinstance(value, str) else str(value) for value in column],
+                                   type=pa.string()))
+    pq.write_table(pa.table(arrays, names=report.headers), path)
+
+def write_report(fmt: str, path: str, report: Report):
+    """Write a report to ``path`` as 'xlsx' or 'parquet'"""
+    if fmt == 'parquet':
+        write_parquet(path, report)
+    else:
+        write_xlsx(path, report.title, report.headers, report.rows(), report.footer, report.alignment)
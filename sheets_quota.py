@@ -0,0 +1,129 @@
+"""Rate limiting for Google Sheets API calls"""
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from config import Config
+
+# Request priorities, lowest value served first
+INTERACTIVE = 0
+BACKGROUND = 1
+BULK = 2
+
+_context = threading.local()
+
+@contextmanager
+def request_priority(priority: int):
+    """Run the Sheets calls made by this thread inside the block at ``priority``"""
+    previous = getattr(_context, 'priority', INTERACTIVE)
+    _context.priority = priority
+    try:
+        yield
+    finally:
+        _context.priority = previous
+
+def current_priority() -> int:
+    return getattr(_context, 'priority', INTERACTIVE)
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an API error is a 429 / quota exceeded response"""
+    response = getattr(error, 'response', None)
+    if getattr(response, 'status_code', None) == 429:
+        return True
+    error_str = str(error)
+    return '429' in error_str or 'RATE_LIMIT_EXCEEDED' in error_str or 'Quota exceeded' in error_str
+
+class TokenBucket:
+    """Allows ``per_minute`` calls per minute, refilled continuously, in bursts of up to a minute's worth"""
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def drain(self):
+        self.tokens = 0.0
+
+class QuotaScheduler:
+    """Paces Sheets API calls to the per-minute read and write quotas
+
+    Each call takes a token from the read or write bucket before it is sent.
+    When the bucket is empty, callers queue and are served by priority, then
+    arrival order, so a page load overtakes waiting exports and log flushes.
+    A 429 response empties the bucket, pauses every caller of that kind for
+    a jittered, exponentially growing delay and retries the call.
+
+    The buckets are per process; with several gunicorn workers, size
+    SHEETS_READS_PER_MINUTE and SHEETS_WRITES_PER_MINUTE as a share of the
+    project quota.
+    """
+    def __init__(self, reads_per_minute: int = None, writes_per_minute: int = None,
+                 max_retries: int = None):
+        self.buckets = {
+            'read': TokenBucket(reads_per_minute or Config.SHEETS_READS_PER_MINUTE),
+            'write': TokenBucket(writes_per_minute or Config.SHEETS_WRITES_PER_MINUTE),
+        }
+        self.max_retries = Config.SHEETS_MAX_RETRIES if max_retries is None else max_retries
+        self._cond = threading.Condition()
+        self._waiting = {kind: [] for kind in self.buckets}
+        self._paused_until = {kind: 0.0 for kind in self.buckets}
+        self._tickets = itertools.count()
+
+    def _acquire(self, kind: str, priority: int):
+        """Block until this caller is first in line for ``kind`` and a token is free"""
+        ticket = (priority, next(self._tickets))
+        waiting = self._waiting[kind]
+        bucket = self.buckets[kind]
+        with self._cond:
+            heapq.heappush(waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    if waiting[0] != ticket:
+                        self._cond.wait()
+                        continue
+                    delay = max(bucket.wait_time(now), self._paused_until[kind] - now)
+                    if delay <= 0:
+                        bucket.take()
+                        return
+                    self._cond.wait(delay)
+            finally:
+                waiting.remove(ticket)
+                heapq.heapify(waiting)
+                self._cond.notify_all()
+
+    def _back_off(self, kind: str, attempt: int) -> float:
+        delay = min(64.0, 2.0 ** attempt) * random.uniform(0.5, 1.5)
+        with self._cond:
+            self.buckets[kind].drain()
+            self._paused_until[kind] = max(self._paused_until[kind], time.monotonic() + delay)
+            self._cond.notify_all()
+        return delay
+
+    def call(self, kind: str, func, *args, **kwargs):
+        """Run ``func(*args, **kwargs)`` as a 'read' or 'write' request within quota"""
+        priority = current_priority()
+        for attempt in range(self.max_retries + 1):
+            self._acquire(kind, priority)
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                delay = self._back_off(kind, attempt)
+                print(f"Sheets {kind} quota exceeded, retrying in {delay:.1f}s "
+                      f"({attempt + 1}/{self.max_retries})")
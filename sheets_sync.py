@@ -0,0 +1,302 @@
+"""Incremental sync between Google Sheets and a local SQLite replica"""
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+from config import Config
+from db_backend import KEY_REFERENCES, SHEET_HEADERS, cell_text, key_field_for
+from local_store import data_path, file_lock
+from sheets_quota import BACKGROUND, request_priority
+from sqlite_db import SQLiteDB, _quote
+
+def row_checksum(sheet_name: str, record: Dict) -> str:
+    """Fingerprint of a record's values in header order"""
+    values = '\x1f'.join(cell_text(record.get(h, '')) for h in SHEET_HEADERS[sheet_name])
+    return hashlib.sha1(values.encode('utf-8')).hexdigest()
+
+class ReplicaDB(SQLiteDB):
+    """SQLite replica of the spreadsheet that remembers which records changed locally
+    
+    Every local write marks the record's key dirty in ``_sync_dirty``, in the
+    same transaction as the write. ``_sync_base`` holds the checksum of each
+    record as it was last seen in the sheet, which is how the sync engine tells
+    a remote edit from a local one.
+    """
+    tracks_changes = True
+    
+    def __init__(self, path: Optional[str] = None):
+        self._untracked = threading.local()
+        super().__init__(path or Config.SQLITE_PATH)
+        with self._transaction() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS _sync_dirty '
+                         '(sheet_name TEXT NOT NULL, row_key TEXT NOT NULL, PRIMARY KEY (sheet_name, row_key))')
+            conn.execute('CREATE TABLE IF NOT EXISTS _sync_base '
+                         '(sheet_name TEXT NOT NULL, row_key TEXT NOT NULL, checksum TEXT NOT NULL, '
+                         'PRIMARY KEY (sheet_name, row_key))')
+            conn.execute('CREATE TABLE IF NOT EXISTS _sync_state '
+                         '(name TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    
+    @contextmanager
+    def untracked(self):
+        """Apply writes coming from the sheet without marking them dirty"""
+        self._untracked.active = True
+        try:
+            yield
+        finally:
+            self._untracked.active = False
+    
+    def _record_change(self, conn, sheet_name: str, key: str):
+        if key and not getattr(self._untracked, 'active', False):
+            conn.execute('INSERT OR IGNORE INTO _sync_dirty (sheet_name, row_key) VALUES (?, ?)',
+                         (sheet_name, key))
+    
+    def dirty_keys(self, sheet_name: str) -> List[str]:
+        rows = self._conn().execute('SELECT row_key FROM _sync_dirty WHERE sheet_name = ?',
+                                    (sheet_name,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def base_checksums(self, sheet_name: str) -> Dict[str, str]:
+        rows = self._conn().execute('SELECT row_key, checksum FROM _sync_base WHERE sheet_name = ?',
+                                    (sheet_name,)).fetchall()
+        return dict(rows)
+    
+    def mark_synced(self, sheet_name: str, base: Dict[str, Optional[str]], clean: List[str]):
+        """Record the sheet's checksum per key (None = gone) and clear dirty keys"""
+        with self._transaction() as conn:
+            for key, checksum in base.items():
+                if checksum is None:
+                    conn.execute('DELETE FROM _sync_base WHERE sheet_name = ? AND row_key = ?',
+                                 (sheet_name, key))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO _sync_base (sheet_name, row_key, checksum) '
+                                 'VALUES (?, ?, ?)', (sheet_name, key, checksum))
+            conn.executemany('DELETE FROM _sync_dirty WHERE sheet_name = ? AND row_key = ?',
+                             [(sheet_name, key) for key in clean])
+    
+    def get_state(self, name: str) -> Optional[str]:
+        row = self._conn().execute('SELECT value FROM _sync_state WHERE name = ?', (name,)).fetchone()
+        return row[0] if row else None
+    
+    def set_state(self, name: str, value: str):
+        with self._transaction() as conn:
+            conn.execute('INSERT OR REPLACE INTO _sync_state (name, value) VALUES (?, ?)', (name, value))
+    
+    def reserve_ids(self, sheet_name: str, records: List[Dict]):
+        """Keep the ID sequence ahead of the IDs in ``records``"""
+        with self._transaction() as conn:
+            self._bump_sequence(conn, sheet_name, records)
+    
+    def rekey(self, sheet_name: str, old_key: str, new_key: str):
+        """Move a locally inserted record to a new ID, keeping it dirty
+        
+        Unsynced local records that refer to the old ID (see KEY_REFERENCES)
+        are pointed at the new one. Records pulled from the sheet keep the old
+        ID, since for them it names the sheet's record.
+        """
+        key_field = key_field_for(sheet_name)
+        with self._transaction() as conn:
+            conn.execute(f'UPDATE {_quote(sheet_name)} SET {_quote(key_field)} = ? '
+                         f'WHERE {_quote(key_field)} = ?', (new_key, old_key))
+            conn.execute('UPDATE _sync_dirty SET row_key = ? WHERE sheet_name = ? AND row_key = ?',
+                         (new_key, sheet_name, old_key))
+            for ref_table, ref_column in KEY_REFERENCES.get(sheet_name, []):
+                ref_key = _quote(key_field_for(ref_table))
+                conn.execute(f'UPDATE {_quote(ref_table)} SET {_quote(ref_column)} = ? '
+                             f'WHERE {_quote(ref_column)} = ? AND {ref_key} IN '
+                             f'(SELECT row_key FROM _sync_dirty WHERE sheet_name = ?)',
+                             (new_key, old_key, ref_table))
+
+class SheetsSync:
+    """Pulls sheet edits into a ReplicaDB and pushes local writes back in batches
+    
+    A pull first asks Drive for the spreadsheet's modifiedTime, so an idle
+    spreadsheet costs one metadata request per cycle. When it has changed, each
+    sheet is read once and only rows whose checksum differs from the last
+    synced version are written to the replica. After a push the new
+    modifiedTime is recorded, so the sync's own writes don't trigger a pull;
+    an edit made in the sheet during that push is picked up by the full pull
+    that runs every FULL_PULL_INTERVAL seconds regardless.
+    
+    Conflicts (a record changed both in the sheet and locally since the last
+    sync) follow Config.SYNC_CONFLICT_POLICY: 'sheet' keeps the spreadsheet
+    edit, 'local' keeps the replica's and pushes it over the sheet. Two records
+    inserted with the same ID on both sides are both kept; the local one moves
+    to a fresh ID.
+    """
+    FULL_PULL_INTERVAL = 600
+    
+    def __init__(self, replica: ReplicaDB, sheets, policy: Optional[str] = None):
+        self.replica = replica
+        self.sheets = sheets
+        self.policy = (policy or Config.SYNC_CONFLICT_POLICY).lower()
+        self.lock_path = data_path('sync.lock')
+        self._thread = None
+    
+    def _remote_modified_time(self) -> Optional[str]:
+        try:
+            return self.sheets.get_modified_time()
+        except Exception as e:
+            print(f"Could not read spreadsheet modifiedTime, pulling anyway: {e}")
+            return None
+    
+    def sync(self, force: bool = False) -> Dict[str, Dict]:
+        """Run one pull and push cycle; returns counts per sheet"""
+        summary = {}
+        # One worker at a time, so pushes are never sent twice
+        with file_lock(self.lock_path):
+            modified_time = self._remote_modified_time()
+            last_full_pull = float(self.replica.get_state('lastFullPull') or 0)
+            force = force or time.time() - last_full_pull >= self.FULL_PULL_INTERVAL
+            pull = force or modified_time is None or modified_time != self.replica.get_state('modifiedTime')
+            # Whether the replica holds every remote change up to modified_time
+            in_sync = not pull
+            remote_tables = {}
+            if pull:
+                # Read every sheet in one batch request; never mistake a failed read for an empty sheet
+                self.sheets.invalidate()
+                try:
+                    remote_tables = self.sheets.get_many(list(SHEET_HEADERS), strict=True)
+                    in_sync = modified_time is not None
+                except Exception as e:
+                    print(f"Error reading spreadsheet for sync: {e}")
+                    pull = False
+            for sheet_name in SHEET_HEADERS:
+                counts = {'pulled': 0, 'pushed': 0, 'conflicts': 0}
+                try:
+                    if pull:
+                        self._pull(sheet_name, remote_tables[sheet_name], counts)
+                    self._push(sheet_name, counts)
+                except Exception as e:
+                    print(f"Error syncing {sheet_name}: {e}")
+                    in_sync = False
+                summary[sheet_name] = counts
+            if pull and in_sync:
+                self.replica.set_state('lastFullPull', str(time.time()))
+            if in_sync and any(counts['pushed'] for counts in summary.values()):
+                # Our own pushes bump modifiedTime; record the new value so the
+                # next cycle doesn't read every sheet back to find them
+                modified_time = self._remote_modified_time()
+            if in_sync and modified_time:
+                self.replica.set_state('modifiedTime', modified_time)
+        return summary
+    
+    def _pull(self, sheet_name: str, records: List[Dict], counts: Dict):
+        key_field = key_field_for(sheet_name)
+        remote = {}
+        for record in records:
+            key = record.get(key_field, '')
+            if key:
+                remote.setdefault(key, record)
+        base = self.replica.base_checksums(sheet_name)
+        dirty = set(self.replica.dirty_keys(sheet_name))
+        
+        # Keep the local ID sequence ahead of IDs created in the sheet
+        self.replica.reserve_ids(sheet_name, list(remote.values()))
+        
+        new_base = {}
+        clean = []
+        to_apply = {}
+        to_delete = []
+        for key, record in remote.items():
+            checksum = row_checksum(sheet_name, record)
+            if base.get(key) == checksum:
+                continue
+            new_base[key] = checksum
+            if key not in dirty:
+                to_apply[key] = record
+                continue
+            local = self.replica.get_by_id(sheet_name, key_field, key)
+            if local is not None and row_checksum(sheet_name, local) == checksum:
+                clean.append(key)
+                continue
+            counts['conflicts'] += 1
+            if key not in base and local is not None and key_field == 'ID':
+                # Both sides inserted this ID: keep both records
+                self.replica.rekey(sheet_name, key, str(self.replica.get_next_id(sheet_name)))
+                to_apply[key] = record
+            elif self.policy == 'sheet':
+                to_apply[key] = record
+                clean.append(key)
+        
+        for key in base:
+            if key in remote:
+                continue
+            new_base[key] = None
+            if key not in dirty:
+                to_delete.append(key)
+                continue
+            counts['conflicts'] += 1
+            if self.policy == 'sheet':
+                to_delete.append(key)
+                clean.append(key)
+        
+        with self.replica.untracked():
+            existing = {key for key in to_apply
+                        if self.replica.get_by_id(sheet_name, key_field, key) is not None}
+            inserts = [record for key, record in to_apply.items() if key not in existing]
+            if inserts:
+                self.replica.insert_many(sheet_name, inserts)
+            updates = {key: record for key, record in to_apply.items() if key in existing}
+            if updates:
+                self.replica.update_many(sheet_name, key_field, updates)
+            for key in to_delete:
+                self.replica.delete(sheet_name, key_field, key)
+        self.replica.mark_synced(sheet_name, new_base, clean)
+        counts['pulled'] += len(to_apply) + len(to_delete)
+    
+    def _push(self, sheet_name: str, counts: Dict):
+        dirty = self.replica.dirty_keys(sheet_name)
+        if not dirty:
+            return
+        key_field = key_field_for(sheet_name)
+        base = self.replica.base_checksums(sheet_name)
+        
+        inserts = {}
+        updates = {}
+        deletes = []
+        for key in dirty:
+            local = self.replica.get_by_id(sheet_name, key_field, key)
+            if local is None:
+                if key in base:
+                    deletes.append(key)
+            elif key in base:
+                updates[key] = local
+            else:
+                inserts[key] = local
+        
+        new_base = {}
+        clean = [key for key in dirty if key not in inserts and key not in updates and key not in deletes]
+        if inserts:
+            results = self.sheets.insert_many(sheet_name, list(inserts.values()))
+            if results and all(result['success'] for result in results):
+                new_base.update({key: row_checksum(sheet_name, r) for key, r in inserts.items()})
+                clean.extend(inserts)
+        if updates:
+            # A key missing from the sheet stays dirty until the next pull resolves it
+            if self.sheets.update_many(sheet_name, key_field, updates) == len(updates):
+                new_base.update({key: row_checksum(sheet_name, r) for key, r in updates.items()})
+                clean.extend(updates)
+        for key in deletes:
+            if self.sheets.delete(sheet_name, key_field, key):
+                new_base[key] = None
+                clean.append(key)
+        self.replica.mark_synced(sheet_name, new_base, clean)
+        counts['pushed'] += len(new_base)
+    
+    def start(self, interval: Optional[float] = None):
+        """Run sync cycles every ``interval`` seconds on a daemon thread"""
+        interval = interval or Config.SYNC_INTERVAL
+        
+        def run():
+            # Sync traffic yields the API quota to page loads
+            with request_priority(BACKGROUND):
+                while True:
+                    time.sleep(interval)
+                    try:
+                        self.sync()
+                    except Exception as e:
+                        print(f"Error in sync cycle: {e}")
+        
+        self._thread = threading.Thread(target=run, name='sheets-sync', daemon=True)
+        self._thread.start()
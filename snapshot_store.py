@@ -0,0 +1,147 @@
+"""Parsed sheet snapshots shared by every worker process on the host"""
+import json
+import os
+import pickle
+import uuid
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from local_store import data_path, file_lock, write_atomic
+
+# Bump when the pickled snapshot class changes, so old files are ignored
+SNAPSHOT_FORMAT = 2
+
+class SharedSnapshotStore:
+    """File-backed copy of each cached sheet that every gunicorn worker reads
+
+    A sheet is stored as a pickled base snapshot plus a journal of the writes
+    applied since, both tagged with a generation id. The worker that reads a
+    sheet from the API publishes it as a new base; a worker that writes to the
+    sheet appends the change to the journal. Other workers stat the journal on
+    every access and replay only the lines they have not seen yet, so a write
+    in one worker reaches the rest without another API read, and all workers
+    share one read of each sheet per CACHE_TTL.
+
+    Journal operations must be safe to apply to a snapshot that already
+    contains them (see TableSnapshot.apply).
+    """
+    def __init__(self, spreadsheet_id: str):
+        self.spreadsheet_id = spreadsheet_id
+        # Per sheet: (generation, bytes of journal applied, journal size, journal mtime)
+        self._seen = {}
+
+    def _path(self, sheet_name: str, suffix: str) -> str:
+        return data_path('snapshots', self.spreadsheet_id, f'{sheet_name}.v{SNAPSHOT_FORMAT}.{suffix}')
+
+    @contextmanager
+    def lock(self, sheet_name: str):
+        """Held while publishing or journaling a sheet"""
+        with file_lock(self._path(sheet_name, 'lock')):
+            yield
+
+    @contextmanager
+    def loading(self, sheet_name: str):
+        """Held while a worker reads a sheet from the API, so the others wait and reuse its copy"""
+        with file_lock(self._path(sheet_name, 'load.lock')):
+            yield
+
+    def marker(self, sheet_name: str) -> Optional[Tuple[int, int]]:
+        """Identifies the journal's current state; changes whenever a write is journaled"""
+        try:
+            stat = os.stat(self._path(sheet_name, 'journal'))
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def refresh(self, sheet_name: str, snapshot):
+        """Catch ``snapshot`` up with the shared copy of a sheet
+
+        Returns ``snapshot`` with any new journal lines applied, the shared
+        base if it was replaced since, or None when the shared copy was
+        invalidated and the sheet has to be read from the API. When nothing
+        has been shared for the sheet, ``snapshot`` is returned unchanged.
+        """
+        marker = self.marker(sheet_name)
+        if marker is None:
+            return snapshot
+        seen = self._seen.get(sheet_name)
+        if seen is not None and snapshot is not None and seen[2:] == marker:
+            return snapshot
+        try:
+            with open(self._path(sheet_name, 'journal'), 'rb') as f:
+                generation = f.readline().decode('utf-8').strip()
+                if seen is not None and snapshot is not None and seen[0] == generation:
+                    f.seek(seen[1])
+                else:
+                    snapshot = self._load_base(sheet_name, generation)
+                    if snapshot is None:
+                        self._seen.pop(sheet_name, None)
+                        return None
+                offset = f.tell()
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # Half-written line; picked up on the next access
+                        break
+                    op, args = json.loads(line)
+                    snapshot.apply(op, args)
+                    offset += len(line)
+        except OSError:
+            return snapshot
+        self._seen[sheet_name] = (generation, offset) + marker
+        return snapshot
+
+    def _load_base(self, sheet_name: str, generation: str):
+        try:
+            with open(self._path(sheet_name, 'base'), 'rb') as f:
+                base_generation, snapshot = pickle.load(f)
+        except Exception:
+            return None
+        # A base from another generation was invalidated or is being replaced
+        return snapshot if base_generation == generation else None
+
+    def publish(self, sheet_name: str, snapshot, since: Optional[Tuple[int, int]]):
+        """Share a snapshot just read from the API as the sheet's new base
+
+        ``since`` is the journal marker taken before the read started; if a
+        write was journaled meanwhile the snapshot may predate it, so it is
+        shared as already expired and the next access reads the sheet again.
+        Call with ``lock`` held.
+        """
+        if self.marker(sheet_name) != since:
+            snapshot.loaded_at = 0
+        generation = uuid.uuid4().hex
+        write_atomic(self._path(sheet_name, 'base'),
+                     pickle.dumps((generation, snapshot), protocol=pickle.HIGHEST_PROTOCOL))
+        self._start_journal(sheet_name, generation)
+
+    def append(self, sheet_name: str, op: str, args):
+        """Journal a write for the other workers; call with ``lock`` held"""
+        path = self._path(sheet_name, 'journal')
+        if not os.path.exists(path):
+            # Nothing shared yet: start a generation without a base, so any
+            # snapshot loaded before this write is not trusted
+            self._start_journal(sheet_name, uuid.uuid4().hex)
+            return
+        line = (json.dumps([op, args], default=str) + '\n').encode('utf-8')
+        seen = self._seen.get(sheet_name)
+        caught_up = seen is not None and seen[2:] == self.marker(sheet_name)
+        with open(path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if caught_up:
+            # The caller has applied this write already; don't replay it
+            self._seen[sheet_name] = (seen[0], seen[1] + len(line)) + self.marker(sheet_name)
+
+    def invalidate(self, sheet_name: str):
+        """Make every worker drop its copy and re-read the sheet; call with ``lock`` held"""
+        try:
+            os.remove(self._path(sheet_name, 'base'))
+        except OSError:
+            pass
+        self._start_journal(sheet_name, uuid.uuid4().hex)
+
+    def _start_journal(self, sheet_name: str, generation: str):
+        path = self._path(sheet_name, 'journal')
+        write_atomic(path, f'{generation}\n'.encode('utf-8'))
+        stat = os.stat(path)
+        self._seen[sheet_name] = (generation, len(generation) + 1, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,438 @@
+"""SQLite storage backend with the same record API as GoogleSheetsDB"""
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Tuple
+from column_table import ColumnTable
+from config import Config
+from db_backend import (DatabaseBackend, Page, SHEET_HEADERS, cell_text, copy_tables, decode_cursor,
+                        encode_cursor, key_field_for)
+
+# Indexed columns besides each table's key column
+SECONDARY_INDEXES = {
+    'Assets': ['Location', 'Asset Category', 'Department', 'Asset Status', 'Brand'],
+    'AssetMovements': ['Movement Date', 'Asset Code'],
+}
+
+# Columns pages are read in order of (see get_page); each gets an index on (column, key column)
+PAGE_ORDERS = {
+    'AssetMovements': ['Movement Date'],
+    'ActivityLogs': ['Date & Time'],
+}
+
+def _index_name(*parts: str) -> str:
+    return re.sub(r'\W+', '_', '_'.join(parts)).lower()
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+class SQLiteDB(DatabaseBackend):
+    """Local database with one table per sheet and indexes on the lookup columns
+    
+    Every column is stored as text, exactly as the sheet returns it, and rows
+    keep their insertion order through SQLite's rowid. Each thread gets its own
+    connection; WAL mode lets gunicorn workers read while another one writes.
+    
+    ``get_table`` keeps the ColumnTable it built for each table along with the
+    table's write version, which triggers bump on every insert, update and
+    delete from any worker, and builds a new one only when that has changed.
+    """
+    # Subclasses that log local writes (see sheets_sync.ReplicaDB) set this and
+    # override _record_change, which runs inside the writing transaction
+    tracks_changes = False
+    
+    def __init__(self, path: Optional[str] = None):
+        self.config = Config()
+        self.path = path or self.config.SQLITE_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._columns = {}
+        self._tables: Dict[str, Tuple[int, ColumnTable]] = {}
+        self._tables_lock = threading.Lock()
+        self._initialize_tables()
+    
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+    
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+    
+    def _initialize_tables(self):
+        """Create missing tables, columns and indexes"""
+        with self._transaction() as conn:
+            for sheet_name, headers in SHEET_HEADERS.items():
+                columns = ', '.join(f"{_quote(h)} TEXT NOT NULL DEFAULT ''" for h in headers)
+                conn.execute(f'CREATE TABLE IF NOT EXISTS {_quote(sheet_name)} ({columns})')
+                existing = [row[1] for row in conn.execute(f'PRAGMA table_info({_quote(sheet_name)})')]
+                for header in headers:
+                    if header not in existing:
+                        conn.execute(f"ALTER TABLE {_quote(sheet_name)} ADD COLUMN {_quote(header)} TEXT NOT NULL DEFAULT ''")
+                        existing.append(header)
+                self._columns[sheet_name] = existing
+                
+                key_field = key_field_for(sheet_name)
+                for column in [key_field] + SECONDARY_INDEXES.get(sheet_name, []):
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {_index_name("idx", sheet_name, column)} '
+                                 f'ON {_quote(sheet_name)} ({_quote(column)})')
+                for column in PAGE_ORDERS.get(sheet_name, []):
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS {_index_name("idx", sheet_name, column, key_field)} '
+                                 f'ON {_quote(sheet_name)} ({_quote(column)}, {_quote(key_field)})')
+            conn.execute('CREATE TABLE IF NOT EXISTS _sequences '
+                         '(name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)')
+            # Row count of every table, kept by triggers so counting reads one row
+            conn.execute('CREATE TABLE IF NOT EXISTS _row_counts '
+                         '(name TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+            # Write version of every table, so get_table knows when its copy is stale
+            conn.execute('CREATE TABLE IF NOT EXISTS _table_versions '
+                         '(name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            for sheet_name in SHEET_HEADERS:
+                table = _quote(sheet_name)
+                name = "'" + sheet_name.replace("'", "''") + "'"
+                conn.execute(f'INSERT OR IGNORE INTO _row_counts (name, count) '
+                             f'SELECT {name}, COUNT(*) FROM {table}')
+                conn.execute(f'CREATE TRIGGER IF NOT EXISTS {_index_name("count", sheet_name, "insert")} '
+                             f'AFTER INSERT ON {table} BEGIN '
+                             f'UPDATE _row_counts SET count = count + 1 WHERE name = {name}; END')
+                conn.execute(f'CREATE TRIGGER IF NOT EXISTS {_index_name("count", sheet_name, "delete")} '
+                             f'AFTER DELETE ON {table} BEGIN '
+                             f'UPDATE _row_counts SET count = count - 1 WHERE name = {name}; END')
+                conn.execute(f'INSERT OR IGNORE INTO _table_versions (name, version) VALUES ({name}, 0)')
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    conn.execute(f'CREATE TRIGGER IF NOT EXISTS {_index_name("version", sheet_name, event)} '
+                                 f'AFTER {event} ON {table} BEGIN '
+                                 f'UPDATE _table_versions SET version = version + 1 WHERE name = {name}; END')
+    
+    def _table_columns(self, sheet_name: str) -> List[str]:
+        columns = self._columns.get(sheet_name)
+        if columns is None:
+            raise KeyError(f"Unknown table: {sheet_name}")
+        return columns
+    
+    def _select(self, sheet_name: str) -> str:
+        columns = self._table_columns(sheet_name)
+        return f"SELECT {', '.join(_quote(c) for c in columns)} FROM {_quote(sheet_name)}"
+    
+    def _first_rowid(self, conn, sheet_name: str, id_field: str, id_value) -> Optional[int]:
+        if id_field not in self._table_columns(sheet_name):
+            return None
+        row = conn.execute(f'SELECT rowid FROM {_quote(sheet_name)} WHERE {_quote(id_field)} = ? '
+                           f'ORDER BY rowid LIMIT 1', (cell_text(id_value),)).fetchone()
+        return row[0] if row else None
+    
+    def _key_at(self, conn, sheet_name: str, rowid: int) -> str:
+        row = conn.execute(f'SELECT {_quote(key_field_for(sheet_name))} FROM {_quote(sheet_name)} '
+                           f'WHERE rowid = ?', (rowid,)).fetchone()
+        return row[0] if row else ''
+    
+    def _record_change(self, conn, sheet_name: str, key: str):
+        """Called with the key of every record inserted, updated or deleted"""
+    
+    def _seed_sequence(self, conn, sheet_name: str, id_field: str) -> int:
+        """Return the sequence's last ID, seeding it from the table on first use"""
+        name = f'{sheet_name}:{id_field}'
+        row = conn.execute('SELECT last_id FROM _sequences WHERE name = ?', (name,)).fetchone()
+        if row is not None:
+            return row[0]
+        seed = conn.execute(
+            f"SELECT MAX(CAST({_quote(id_field)} AS INTEGER)) FROM {_quote(sheet_name)} "
+            f"WHERE {_quote(id_field)} GLOB '[0-9]*'").fetchone()[0] or 0
+        conn.execute('INSERT INTO _sequences (name, last_id) VALUES (?, ?)', (name, seed))
+        return seed
+    
+    def _bump_sequence(self, conn, sheet_name: str, records: List[Dict]):
+        """Keep the ID sequence ahead of IDs written by copies and syncs"""
+        ids = [int(cell_text(r.get('ID'))) for r in records if cell_text(r.get('ID')).isdigit()]
+        if ids and 'ID' in self._table_columns(sheet_name):
+            self._seed_sequence(conn, sheet_name, 'ID')
+            conn.execute('UPDATE _sequences SET last_id = MAX(last_id, ?) WHERE name = ?',
+                         (max(ids), f'{sheet_name}:ID'))
+    
+    def _read_all(self, conn, sheet_name: str) -> List[Dict]:
+        columns = self._table_columns(sheet_name)
+        rows = conn.execute(f'{self._select(sheet_name)} ORDER BY rowid').fetchall()
+        # Skip rows with no values, like the sheet backend does
+        return [dict(zip(columns, row)) for row in rows if any(row)]
+    
+    def get_all(self, sheet_name: str) -> List[Dict]:
+        """Get all records from a table"""
+        try:
+            return self._read_all(self._conn(), sheet_name)
+        except Exception as e:
+            print(f"Error getting records from {sheet_name}: {e}")
+            return []
+    
+    def get_table(self, sheet_name: str) -> ColumnTable:
+        """All records of a table column by column, rebuilt only after the table is written to"""
+        try:
+            conn = self._conn()
+            row = conn.execute('SELECT version FROM _table_versions WHERE name = ?', (sheet_name,)).fetchone()
+            version = row[0] if row else None
+            with self._tables_lock:
+                cached = self._tables.get(sheet_name)
+            if cached is not None and cached[0] == version:
+                return cached[1].frozen()
+            # The version is read before the rows, so a write in between leaves
+            # the copy looking stale rather than current
+            records = self._read_all(conn, sheet_name)
+        except Exception as e:
+            print(f"Error getting records from {sheet_name}: {e}")
+            return ColumnTable(SHEET_HEADERS.get(sheet_name, []))
+        table = ColumnTable.from_records(records, SHEET_HEADERS.get(sheet_name, []))
+        if version is not None:
+            with self._tables_lock:
+                self._tables[sheet_name] = (version, table)
+        return table.frozen()
+    
+    def invalidate(self, sheet_name: Optional[str] = None):
+        """Drop the ColumnTable kept for one table, or for all tables"""
+        with self._tables_lock:
+            if sheet_name:
+                self._tables.pop(sheet_name, None)
+            else:
+                self._tables.clear()
+    
+    def count(self, sheet_name: str) -> int:
+        """Number of records in a table, from the trigger-kept row count"""
+        try:
+            row = self._conn().execute('SELECT count FROM _row_counts WHERE name = ?', (sheet_name,)).fetchone()
+        except Exception as e:
+            print(f"Error counting records in {sheet_name}: {e}")
+            return 0
+        return row[0] if row else 0
+    
+    def _where(self, sheet_name: str, order_by: Optional[str], filters: Optional[Dict[str, str]],
+               low: Optional[str], high: Optional[str]):
+        """WHERE clauses and their parameters for a get_page query"""
+        columns = self._table_columns(sheet_name)
+        clauses, params = [], []
+        for column, value in (filters or {}).items():
+            if column not in columns:
+                raise KeyError(f"{sheet_name} has no column {column}")
+            clauses.append(f'{_quote(column)} = ?')
+            params.append(cell_text(value))
+        if low is not None:
+            clauses.append(f'{_quote(order_by)} >= ?')
+            params.append(low)
+        if high is not None:
+            clauses.append(f'{_quote(order_by)} <= ?')
+            params.append(high)
+        return clauses, params
+    
+    def get_page(self, sheet_name: str, order_by: str, limit: int, cursor: Optional[str] = None,
+                 offset: int = 0, descending: bool = False, filters: Optional[Dict[str, str]] = None,
+                 low: Optional[str] = None, high: Optional[str] = None) -> Page:
+        """Read a page with a keyset query on the (order_by, key) index"""
+        after = decode_cursor(cursor) if cursor else None
+        try:
+            columns = self._table_columns(sheet_name)
+            if order_by not in columns:
+                raise KeyError(f"{sheet_name} has no column {order_by}")
+            key_field = key_field_for(sheet_name)
+            clauses, params = self._where(sheet_name, order_by, filters, low, high)
+            conn = self._conn()
+            if clauses:
+                total = conn.execute(f'SELECT COUNT(*) FROM {_quote(sheet_name)} WHERE {" AND ".join(clauses)}',
+                                     params).fetchone()[0]
+            else:
+                total = self.count(sheet_name)
+            if after:
+                clauses.append(f'({_quote(order_by)}, {_quote(key_field)}) {"<" if descending else ">"} (?, ?)')
+                params.extend(after)
+            direction = 'DESC' if descending else 'ASC'
+            where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+            # One row past the page tells whether there is another page
+            rows = conn.execute(f'{self._select(sheet_name)}{where} '
+                                f'ORDER BY {_quote(order_by)} {direction}, {_quote(key_field)} {direction} '
+                                f'LIMIT ? OFFSET ?', params + [limit + 1, offset]).fetchall()
+        except Exception as e:
+            print(f"Error getting a page of {sheet_name}: {e}")
+            return Page([], 0)
+        records = [dict(zip(columns, row)) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and records:
+            next_cursor = encode_cursor(records[-1][order_by], records[-1][key_field])
+        return Page(records, total, next_cursor)
+    
+    def distinct(self, sheet_name: str, column: str, order_by: Optional[str] = None,
+                 filters: Optional[Dict[str, str]] = None, low: Optional[str] = None,
+                 high: Optional[str] = None) -> List[str]:
+        """Sorted distinct values of a column over the selected records"""
+        try:
+            if column not in self._table_columns(sheet_name):
+                return []
+            clauses, params = self._where(sheet_name, order_by, filters, low, high)
+            where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+            rows = self._conn().execute(f'SELECT DISTINCT {_quote(column)} FROM {_quote(sheet_name)}{where} '
+                                        f'ORDER BY {_quote(column)}', params).fetchall()
+        except Exception as e:
+            print(f"Error getting values of {column} from {sheet_name}: {e}")
+            return []
+        return [row[0] for row in rows]
+    
+    def get_by_id(self, sheet_name: str, id_field: str, id_value: str) -> Optional[Dict]:
+        """Get a record by ID"""
+        try:
+            columns = self._table_columns(sheet_name)
+            if id_field not in columns:
+                return None
+            row = self._conn().execute(f'{self._select(sheet_name)} WHERE {_quote(id_field)} = ? '
+                                       f'ORDER BY rowid LIMIT 1', (cell_text(id_value),)).fetchone()
+        except Exception as e:
+            print(f"Error getting record from {sheet_name}: {e}")
+            return None
+        return dict(zip(columns, row)) if row else None
+    
+    def _insert_rows(self, conn, sheet_name: str, records: List[Dict]):
+        columns = self._table_columns(sheet_name)
+        placeholders = ', '.join('?' for _ in columns)
+        conn.executemany(
+            f"INSERT INTO {_quote(sheet_name)} ({', '.join(_quote(c) for c in columns)}) "
+            f"VALUES ({placeholders})",
+            [[cell_text(data.get(c, '')) for c in columns] for data in records])
+        self._bump_sequence(conn, sheet_name, records)
+        if self.tracks_changes:
+            key_field = key_field_for(sheet_name)
+            for data in records:
+                self._record_change(conn, sheet_name, cell_text(data.get(key_field, '')))
+    
+    def insert(self, sheet_name: str, data: Dict) -> bool:
+        """Insert a new record"""
+        try:
+            with self._transaction() as conn:
+                self._insert_rows(conn, sheet_name, [data])
+            return True
+        except Exception as e:
+            print(f"Error inserting record into {sheet_name}: {e}")
+            return False
+    
+    def insert_many(self, sheet_name: str, records: List[Dict], chunk_size: int = 500,
+                    max_retries: int = 3) -> List[Dict]:
+        """Insert many records, one transaction per chunk"""
+        results = []
+        for chunk_no, start in enumerate(range(0, len(records), chunk_size), start=1):
+            chunk = records[start:start + chunk_size]
+            report = {'chunk': chunk_no, 'rows': len(chunk), 'success': False,
+                      'attempts': 0, 'error': ''}
+            for attempt in range(1, max_retries + 1):
+                report['attempts'] = attempt
+                try:
+                    with self._transaction() as conn:
+                        self._insert_rows(conn, sheet_name, chunk)
+                    report['success'] = True
+                    report['error'] = ''
+                    break
+                except sqlite3.OperationalError as e:
+                    # Database locked by another worker; try again shortly
+                    report['error'] = str(e)
+                    if attempt < max_retries:
+                        time.sleep(attempt)
+                except Exception as e:
+                    report['error'] = str(e)
+                    break
+            if not report['success']:
+                print(f"Error inserting chunk {chunk_no} into {sheet_name}: {report['error']}")
+            results.append(report)
+        return results
+    
+    def _update_row(self, conn, sheet_name: str, rowid: int, data: Dict):
+        columns = self._table_columns(sheet_name)
+        changes = [(h, cell_text(v)) for h, v in data.items() if h in columns]
+        if not changes:
+            return
+        if self.tracks_changes:
+            # A key change is a delete of the old key and an insert of the new one
+            self._record_change(conn, sheet_name, self._key_at(conn, sheet_name, rowid))
+        assignments = ', '.join(f'{_quote(h)} = ?' for h, _ in changes)
+        conn.execute(f'UPDATE {_quote(sheet_name)} SET {assignments} WHERE rowid = ?',
+                     [v for _, v in changes] + [rowid])
+        if self.tracks_changes:
+            self._record_change(conn, sheet_name, self._key_at(conn, sheet_name, rowid))
+    
+    def update(self, sheet_name: str, id_field: str, id_value: str, data: Dict) -> bool:
+        """Update a record"""
+        try:
+            with self._transaction() as conn:
+                rowid = self._first_rowid(conn, sheet_name, id_field, id_value)
+                if rowid is None:
+                    return False
+                self._update_row(conn, sheet_name, rowid, data)
+                self._bump_sequence(conn, sheet_name, [data])
+            return True
+        except Exception as e:
+            print(f"Error updating record in {sheet_name}: {e}")
+            return False
+    
+    def update_many(self, sheet_name: str, id_field: str, updates: Dict[str, Dict]) -> int:
+        """Update several records in one transaction"""
+        updated = 0
+        try:
+            with self._transaction() as conn:
+                for id_value, data in updates.items():
+                    rowid = self._first_rowid(conn, sheet_name, id_field, id_value)
+                    if rowid is None:
+                        continue
+                    self._update_row(conn, sheet_name, rowid, data)
+                    updated += 1
+                self._bump_sequence(conn, sheet_name, list(updates.values()))
+            return updated
+        except Exception as e:
+            print(f"Error updating records in {sheet_name}: {e}")
+            return 0
+    
+    def delete(self, sheet_name: str, id_field: str, id_value: str) -> bool:
+        """Delete a record"""
+        try:
+            with self._transaction() as conn:
+                rowid = self._first_rowid(conn, sheet_name, id_field, id_value)
+                if rowid is None:
+                    return False
+                if self.tracks_changes:
+                    self._record_change(conn, sheet_name, self._key_at(conn, sheet_name, rowid))
+                conn.execute(f'DELETE FROM {_quote(sheet_name)} WHERE rowid = ?', (rowid,))
+            return True
+        except Exception as e:
+            print(f"Error deleting record from {sheet_name}: {e}")
+            return False
+    
+    def get_next_id(self, sheet_name: str, id_field: str = 'ID') -> int:
+        """Get the next available ID from the table's sequence row"""
+        if id_field not in self._table_columns(sheet_name):
+            raise KeyError(f"{sheet_name} has no column {id_field}")
+        with self._transaction() as conn:
+            last_id = self._seed_sequence(conn, sheet_name, id_field)
+            conn.execute('UPDATE _sequences SET last_id = ? WHERE name = ?',
+                         (last_id + 1, f'{sheet_name}:{id_field}'))
+        return last_id + 1
+
+if __name__ == '__main__':
+    # python sqlite_db.py import  -> copy Google Sheets into the SQLite database
+    # python sqlite_db.py export  -> push the SQLite database back to Google Sheets
+    from google_sheets_db import GoogleSheetsDB
+    direction = sys.argv[1] if len(sys.argv) > 1 else ''
+    if direction not in ('import', 'export'):
+        print("Usage: python sqlite_db.py import|export")
+        sys.exit(1)
+    sheets_db = GoogleSheetsDB()
+    sqlite_db = SQLiteDB()
+    source, target = (sheets_db, sqlite_db) if direction == 'import' else (sqlite_db, sheets_db)
+    for sheet_name, counts in copy_tables(source, target).items():
+        print(f"{sheet_name}: {counts['inserted']} inserted, {counts['updated']} updated")
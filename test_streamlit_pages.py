@@ -0,0 +1,143 @@
+"""Tests driving the Streamlit pages with the Streamlit GoogleSheetsDB"""
+import sys
+from datetime import date
+from unittest import mock
+import pytest
+from db_backend import SHEET_HEADERS
+
+# Modules that import streamlit, re-imported by each test against the fake
+STREAMLIT_MODULES = ['app_streamlit', 'asset_report', 'assets', 'movement_report']
+
+ASSETS = [
+    {'ID': '1', 'Asset Code': 'LAP-0001', 'Item Name': 'Dell Latitude Laptop', 'Brand': 'Dell',
+     'Asset Category': 'IT', 'Location': 'Head Office', 'Asset Status': 'Active'},
+    {'ID': '2', 'Asset Code': 'LAP-0002', 'Item Name': 'Lenovo ThinkPad', 'Brand': 'Lenovo',
+     'Asset Category': 'IT', 'Location': 'Warehouse', 'Asset Status': 'Active'},
+    {'ID': '3', 'Asset Code': 'CHR-0001', 'Item Name': 'Office Chair', 'Brand': 'Herman Miller',
+     'Asset Category': 'Furniture', 'Location': 'Head Office', 'Asset Status': 'Inactive'},
+]
+
+class SessionState(dict):
+    """st.session_state: a dict whose keys are also attributes"""
+    def __getattr__(self, name):
+        return self.get(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+class FakeWorksheet:
+    def __init__(self, values):
+        self.values = values
+
+    def get_all_values(self):
+        return [list(row) for row in self.values]
+
+class FakeSpreadsheet:
+    def __init__(self, sheets):
+        self.sheets = sheets
+
+    def worksheet(self, name):
+        return FakeWorksheet(self.sheets.get(name, []))
+
+def sheet_values(sheet_name, records):
+    """A sheet's values as get_all_values returns them: the headers, then one row per record"""
+    headers = SHEET_HEADERS[sheet_name]
+    return [headers] + [[record.get(header, '') for header in headers] for record in records]
+
+@pytest.fixture
+def st(monkeypatch):
+    """A fake streamlit module; widgets return the values in ``st.inputs`` by label"""
+    st = mock.MagicMock()
+    st.inputs = {}
+    st.session_state = SessionState()
+    st.columns.side_effect = lambda spec, **kwargs: [
+        mock.MagicMock() for _ in range(spec if isinstance(spec, int) else len(spec))]
+    st.button.return_value = False
+    st.date_input.side_effect = lambda label, *args, **kwargs: st.inputs.get(label)
+    st.text_input.side_effect = lambda label, *args, **kwargs: st.inputs.get(label, '')
+    st.selectbox.side_effect = lambda label, options, *args, **kwargs: st.inputs.get(label, options[0])
+    monkeypatch.setitem(sys.modules, 'streamlit', st)
+    for module in STREAMLIT_MODULES:
+        monkeypatch.delitem(sys.modules, module, raising=False)
+    return st
+
+@pytest.fixture
+def make_db(st):
+    """Build the Streamlit app's GoogleSheetsDB over sheets of records, without connecting"""
+    import app_streamlit
+
+    def make_db(**sheets):
+        db = app_streamlit.GoogleSheetsDB.__new__(app_streamlit.GoogleSheetsDB)
+        db.client = None
+        db.sheet = FakeSpreadsheet({name: sheet_values(name, records) for name, records in sheets.items()})
+        return db
+    return make_db
+
+def shown_rows(st, column):
+    """Values of ``column`` in the table the page last passed to st.dataframe"""
+    df = st.dataframe.call_args[0][0]
+    return df[column].tolist()
+
+def test_asset_report_lists_all_assets(st, make_db):
+    import asset_report
+    asset_report.show(make_db(Assets=ASSETS), 'admin')
+    st.metric.assert_called_with("Total Assets", 3)
+    assert shown_rows(st, 'Asset Code') == ['LAP-0001', 'LAP-0002', 'CHR-0001']
+
+def test_asset_report_filters_and_searches(st, make_db):
+    import asset_report
+    db = make_db(Assets=ASSETS)
+    st.inputs.update({'Category': 'IT', 'Location': 'Head Office'})
+    asset_report.show(db, 'admin')
+    st.metric.assert_called_with("Total Assets", 1)
+    assert shown_rows(st, 'Asset Code') == ['LAP-0001']
+
+    st.inputs.clear()
+    st.inputs['Search'] = 'thinkpad'
+    asset_report.show(db, 'admin')
+    st.metric.assert_called_with("Total Assets", 1)
+    assert shown_rows(st, 'Asset Code') == ['LAP-0002']
+
+def test_assets_page_search(st, make_db):
+    import assets
+    db = make_db(Assets=ASSETS)
+    assets.show(db, 'admin')
+    assert shown_rows(st, 'Asset Code') == ['LAP-0001', 'LAP-0002', 'CHR-0001']
+
+    st.inputs['🔍 Search by Asset Code, Item Name or Brand'] = 'lap'
+    assets.show(db, 'admin')
+    assert shown_rows(st, 'Asset Code') == ['LAP-0001', 'LAP-0002']
+
+    st.inputs['🔍 Search by Asset Code, Item Name or Brand'] = 'lenovo'
+    assets.show(db, 'admin')
+    assert shown_rows(st, 'Asset Code') == ['LAP-0002']
+
+MOVEMENTS = [
+    {'ID': '1', 'Asset Code': 'LAP-0001', 'From Location': 'Warehouse', 'To Location': 'Head Office',
+     'Movement Date': '2026-01-05 09:00:00', 'Moved By': 'alice'},
+    {'ID': '2', 'Asset Code': 'LAP-0002', 'From Location': 'Head Office', 'To Location': 'Warehouse',
+     'Movement Date': '2026-02-10 14:30:00', 'Moved By': 'bob'},
+    {'ID': '3', 'Asset Code': 'LAP-0001', 'From Location': 'Head Office', 'To Location': 'Branch',
+     'Movement Date': '2026-03-01 08:15:00', 'Moved By': 'alice'},
+]
+
+def test_movement_report_dates_and_user(st, make_db):
+    import movement_report
+    db = make_db(AssetMovements=MOVEMENTS)
+    movement_report.show(db, 'admin')
+    st.metric.assert_called_with("Total Movements", 3)
+    assert shown_rows(st, 'ID') == ['3', '2', '1']
+
+    st.inputs['Date From'] = date(2026, 2, 1)
+    movement_report.show(db, 'admin')
+    assert shown_rows(st, 'ID') == ['3', '2']
+
+    st.inputs['Date To'] = date(2026, 2, 28)
+    movement_report.show(db, 'admin')
+    assert shown_rows(st, 'ID') == ['2']
+
+    del st.inputs['Date To']
+    st.inputs['User'] = 'ALI'
+    movement_report.show(db, 'admin')
+    st.metric.assert_called_with("Total Movements", 1)
+    assert shown_rows(st, 'ID') == ['3']
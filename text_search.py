@@ -0,0 +1,176 @@
+"""In-memory full-text index with prefix and typo-tolerant matching"""
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from column_table import ColumnTable
+
+# Columns searched for assets, with the weight of a match in each
+ASSET_SEARCH_FIELDS = {'Asset Code': 4.0, 'Item Name': 3.0, 'Brand': 2.0, 'Asset Description': 1.0}
+
+# Weight of a query term matching a token exactly, as a prefix, or with one typo
+EXACT, PREFIX, FUZZY = 1.0, 0.6, 0.3
+
+# Query terms shorter than this only match exactly or as a prefix
+MIN_FUZZY_LENGTH = 4
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case words and numbers of a text"""
+    return _TOKEN.findall(text.lower())
+
+def _deletions(token: str) -> Set[str]:
+    """Every string one character shorter than ``token``"""
+    return {token[:i] + token[i + 1:] for i in range(len(token))}
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """Whether ``b`` is ``a`` with one character inserted, deleted, replaced or swapped with the next"""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    if len(a) < len(b):
+        return a[i:] == b[i + 1:]
+    return a[i + 1:] == b[i + 1:] or (a[i + 1:i + 2] == b[i:i + 1] and a[i:i + 1] == b[i + 1:i + 2]
+                                      and a[i + 2:] == b[i + 2:])
+
+class TextIndex:
+    """Inverted token index over some text columns of a table, keyed by one column
+
+    Each record's ``fields`` are split into tokens, and every token keeps the
+    records it appears in with the weight of the heaviest field it is in.
+    ``search`` matches each query term against the tokens exactly, as a
+    prefix (for type-ahead) and, for terms of MIN_FUZZY_LENGTH or more
+    characters, with one typo, found through an index of each token with one
+    character deleted. A record must match every term; records are ranked by
+    the sum over the terms of their best match weight times field weight.
+
+    ``add`` and ``remove`` update the index one record at a time. ``sync``
+    brings it in line with a ColumnTable by re-indexing only the records
+    whose fields changed since the last sync.
+    """
+    def __init__(self, key_field: str, fields: Dict[str, float]):
+        self.key_field = key_field
+        self.fields = fields
+        self._lock = threading.RLock()
+        self._docs: Dict[str, Tuple[str, ...]] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._deleted: Dict[str, Set[str]] = {}
+        self._version = None
+
+    def _tokens(self, values: Iterable[str]) -> Dict[str, float]:
+        tokens = {}
+        for value, weight in zip(values, self.fields.values()):
+            for token in tokenize(value):
+                tokens[token] = max(tokens.get(token, 0.0), weight)
+        return tokens
+
+    def add(self, key: str, record: Dict):
+        """Index a record, replacing what was indexed under its key"""
+        self._add(key, tuple(record.get(field, '') for field in self.fields))
+
+    def _add(self, key: str, values: Tuple[str, ...]):
+        with self._lock:
+            if self._docs.get(key) == values:
+                return
+            self.remove(key)
+            self._docs[key] = values
+            for token, weight in self._tokens(values).items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    insort(self._vocabulary, token)
+                    for deleted in _deletions(token):
+                        self._deleted.setdefault(deleted, set()).add(token)
+                postings[key] = weight
+
+    def remove(self, key: str):
+        """Drop a record from the index; unknown keys are ignored"""
+        with self._lock:
+            values = self._docs.pop(key, None)
+            if values is None:
+                return
+            for token in self._tokens(values):
+                postings = self._postings[token]
+                del postings[key]
+                if postings:
+                    continue
+                del self._postings[token]
+                del self._vocabulary[bisect_left(self._vocabulary, token)]
+                for deleted in _deletions(token):
+                    tokens = self._deleted[deleted]
+                    tokens.discard(token)
+                    if not tokens:
+                        del self._deleted[deleted]
+
+    def sync(self, table: ColumnTable):
+        """Update the index to the records of ``table``, re-indexing only what changed"""
+        with self._lock:
+            if table.version == self._version:
+                return
+            current = {}
+            for key, *values in zip(table.column(self.key_field), *map(table.column, self.fields)):
+                if key:
+                    current[key] = tuple(values)
+            for key in [key for key in self._docs if key not in current]:
+                self.remove(key)
+            for key, values in current.items():
+                self._add(key, values)
+            self._version = table.version
+
+    def _matches(self, term: str) -> Dict[str, float]:
+        """Match weight of each token a query term matches"""
+        matches = {}
+        start = bisect_left(self._vocabulary, term)
+        for token in self._vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches[token] = EXACT if token == term else PREFIX
+        if len(term) >= MIN_FUZZY_LENGTH:
+            # Tokens one edit away share a string with one character deleted,
+            # or one of them is the other with a character deleted
+            candidates = set(self._deleted.get(term, ()))
+            for deleted in _deletions(term):
+                if deleted in self._postings:
+                    candidates.add(deleted)
+                candidates.update(self._deleted.get(deleted, ()))
+            for token in candidates:
+                if token not in matches and _one_edit_apart(term, token):
+                    matches[token] = FUZZY
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Keys of the records matching every term of ``query`` with their scores, best first"""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            for term in terms:
+                term_scores = {}
+                for token, quality in self._matches(term).items():
+                    for key, weight in self._postings[token].items():
+                        if scores is None or key in scores:
+                            term_scores[key] = max(term_scores.get(key, 0.0), quality * weight)
+                if scores is not None:
+                    term_scores = {key: score + scores[key] for key, score in term_scores.items()}
+                scores = term_scores
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit is not None else ranked
+
+    def search_table(self, table: ColumnTable, query: str, limit: Optional[int] = None) -> List[int]:
+        """Positions in ``table`` of the records matching ``query``, best first"""
+        self.sync(table)
+        keys = table.postings(self.key_field)
+        return [pos for key, _ in self.search(query, limit) if key in keys for pos in keys[key].tolist()]
+
+def asset_index() -> TextIndex:
+    """A TextIndex over the searchable asset columns, keyed by Asset Code"""
+    return TextIndex('Asset Code', ASSET_SEARCH_FIELDS)
@@ -0,0 +1,77 @@
+"""XLSX exports written row by row with openpyxl's write-only mode"""
+import itertools
+from typing import Iterable, List, Optional
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Rows read ahead to size the columns; write-only sheets need widths before any row
+WIDTH_SAMPLE_ROWS = 200
+MAX_COLUMN_WIDTH = 50
+
+HEADER_FILL = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+HEADER_FONT = Font(bold=True, color="FFFFFF", size=12)
+THIN_BORDER = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+def _styled(ws, **style):
+    """A style registered once on the workbook, to share between the cells of a column"""
+    cell = WriteOnlyCell(ws)
+    for name, value in style.items():
+        setattr(cell, name, value)
+    return cell._style
+
+def _cells(ws, values: List, styles: List) -> List:
+    cells = []
+    for value, style in zip(values, styles):
+        cell = WriteOnlyCell(ws, value)
+        # Write-only cells are serialized as soon as the row is appended, so
+        # every cell of a column can point at the same style array
+        cell._style = style
+        cells.append(cell)
+    return cells
+
+def _widths(headers: List[str], sample: List[List]) -> List[float]:
+    widths = []
+    for i, header in enumerate(headers):
+        longest = max([len(str(header))] + [len(str(row[i])) for row in sample if i < len(row)])
+        widths.append(min(longest + 2, MAX_COLUMN_WIDTH))
+    return widths
+
+def write_xlsx(target, title: str, headers: List[str], rows: Iterable[List],
+               footer: Optional[List] = None, alignment: Optional[Alignment] = None):
+    """Write ``rows`` under a styled header row to a one-sheet workbook
+
+    ``target`` is a path or a binary file object. Rows are consumed one at a
+    time and go straight to openpyxl's temporary file, so memory use does not
+    grow with the row count. Column widths are estimated from the first
+    WIDTH_SAMPLE_ROWS rows. ``footer`` is an optional bold totals row.
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, WIDTH_SAMPLE_ROWS))
+    for i, width in enumerate(_widths(headers, sample + ([footer] if footer else [])), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+    alignment = alignment or Alignment(vertical='top')
+    columns = range(len(headers))
+    header_styles = [_styled(ws, fill=HEADER_FILL, font=HEADER_FONT, border=THIN_BORDER,
+                             alignment=Alignment(horizontal='center', vertical='center')) for _ in columns]
+    data_styles = [_styled(ws, border=THIN_BORDER, alignment=alignment) for _ in columns]
+
+    ws.append(_cells(ws, headers, header_styles))
+    for row in itertools.chain(sample, rows):
+        ws.append(_cells(ws, row, data_styles))
+    if footer:
+        footer_styles = [_styled(ws, font=Font(bold=True), border=THIN_BORDER, alignment=alignment)
+                         for _ in columns]
+        ws.append(_cells(ws, footer, footer_styles))
+    wb.save(target)